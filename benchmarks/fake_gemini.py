@@ -0,0 +1,161 @@
+"""
+Local stand-in for the Gemini API, for benchmarks that must not spend quota.
+
+Serves generateContent and streamGenerateContent (SSE) for any model and
+"translates" by echoing the request text (JSON requests, i.e. DeepDive, get
+an empty array), after a configurable latency. A
+configurable fraction of requests fails with 500 or is throttled with 429
+(with a RetryInfo delay, like the real API). Point the genai SDK at it with
+GOOGLE_GEMINI_BASE_URL=<server.url>.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PATH_PATTERN = re.compile(r'^/v1(?:beta|alpha)?/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)')
+
+
+class FakeGeminiServer:
+    """
+    Args:
+        latency (float): Seconds before each response starts.
+        jitter (float): Extra uniformly random latency, in seconds.
+        seconds_per_1k_tokens (float): Additional latency per 1000 output tokens.
+        error_rate (float): Fraction of requests answered with 500.
+        throttle_rate (float): Fraction of requests answered with 429.
+        retry_delay (float): retryDelay hint sent with 429s, in seconds.
+        seed (int): Seed for the error/latency randomness.
+    """
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.1, seconds_per_1k_tokens: float = 0.0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, retry_delay: float = 1.0,
+                 seed: int = 0, host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.seconds_per_1k_tokens = seconds_per_1k_tokens
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_delay = retry_delay
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGeminiServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _draw(self):
+        """Picks the outcome and latency of one request."""
+        with self._lock:
+            self.stats["requests"] += 1
+            roll = self._random.random()
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            if roll < self.throttle_rate:
+                self.stats["throttled"] += 1
+                return 429, delay
+            if roll < self.throttle_rate + self.error_rate:
+                self.stats["errors"] += 1
+                return 500, delay
+            self.stats["ok"] += 1
+            return 200, delay
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                match = PATH_PATTERN.match(self.path)
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not match:
+                    return self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+                status, delay = server._draw()
+                if status == 429:
+                    time.sleep(delay)
+                    return self._send_json(429, {"error": {
+                        "code": 429, "message": "Resource has been exhausted (fake).", "status": "RESOURCE_EXHAUSTED",
+                        "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo",
+                                     "retryDelay": f"{server.retry_delay}s"}],
+                    }})
+                if status == 500:
+                    time.sleep(delay)
+                    return self._send_json(500, {"error": {"code": 500, "message": "Internal error (fake).", "status": "INTERNAL"}})
+
+                request = json.loads(body or b"{}")
+                text = "".join(part.get("text", "")
+                               for content in request.get("contents", [])
+                               for part in content.get("parts", []))
+                tokens = max(1, len(text) // 4)
+                if request.get("generationConfig", {}).get("responseMimeType") == "application/json":
+                    text = "[]"
+                output_tokens = max(1, len(text) // 4)
+                time.sleep(delay + output_tokens / 1000 * server.seconds_per_1k_tokens)
+
+                if match.group("method") == "streamGenerateContent":
+                    self._send_stream(text, tokens)
+                else:
+                    self._send_json(200, response_body(text, tokens, output_tokens))
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, text, tokens):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                pieces = [text[i:i + 2000] for i in range(0, len(text), 2000)] or [""]
+                for i, piece in enumerate(pieces):
+                    last = i == len(pieces) - 1
+                    payload = response_body(piece, tokens, tokens if last else 0, finished=last)
+                    self.wfile.write(f"data: {json.dumps(payload)}\r\n\r\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
+
+
+def response_body(text: str, prompt_tokens: int, output_tokens: int, finished: bool = True) -> dict:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if finished:
+        candidate["finishReason"] = "STOP"
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        },
+    }
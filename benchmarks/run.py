@@ -0,0 +1,193 @@
+"""
+Offline throughput benchmark of the full `arxiv-translator` pipeline.
+
+Generates synthetic e-prints into a temporary e-print mirror, then runs
+`arxiv-translator --batch` in a subprocess against the fake Gemini server
+(benchmarks/fake_gemini.py) and a fake `tectonic`. It reports makespan,
+papers/hour, peak RSS and request latencies. No network access or API quota
+is needed.
+
+    python -m benchmarks.run --papers 20 --latency 0.5 --throttle-rate 0.05
+    python -m benchmarks.run --variant "--concurrency 4" --variant "--concurrency 16"
+    python -m benchmarks.run --papers 5 --max-makespan 60 --json results.json   # CI
+"""
+import argparse
+import glob
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from arxiv_translator.downloader import EprintStore
+from arxiv_translator.metrics import percentile
+from .fake_gemini import FakeGeminiServer
+from .synthetic import make_project, write_eprint
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FAKE_TECTONIC = """#!{python}
+import os, sys, time
+time.sleep(float(os.environ.get("FAKE_TECTONIC_SECONDS", "0")))
+tex = [a for a in sys.argv[1:] if a.endswith(".tex")][-1]
+with open(os.path.splitext(tex)[0] + ".pdf", "wb") as f:
+    f.write(b"%PDF-1.5\\n% fake\\n")
+"""
+
+
+def prepare(root: str, papers: int, files: int, paragraphs: int, figure_kb: int) -> list:
+    """Writes the synthetic e-prints into the mirror under `root`/home. Returns their IDs."""
+    store = EprintStore(os.path.join(root, "home", ".arxiv-translator", "eprints"))
+    # Versioned IDs are served from the mirror without any request to arXiv
+    arxiv_ids = [f"9901.{i + 1:05d}v1" for i in range(papers)]
+    for i, arxiv_id in enumerate(arxiv_ids):
+        write_eprint(make_project(files, paragraphs, figure_kb, seed=i), store.path_for(arxiv_id))
+
+    bin_dir = os.path.join(root, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    tectonic = os.path.join(bin_dir, "tectonic")
+    with open(tectonic, "w", encoding="utf-8") as f:
+        f.write(FAKE_TECTONIC.format(python=sys.executable))
+    os.chmod(tectonic, 0o755)
+
+    with open(os.path.join(root, "ids.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(arxiv_ids) + "\n")
+    return arxiv_ids
+
+
+def run_pipeline(root: str, server_url: str, cli_args: list, tectonic_seconds: float):
+    """Runs the batch CLI once. Returns (exit code, makespan seconds, peak RSS in MB)."""
+    env = os.environ.copy()
+    env.update({
+        "HOME": os.path.join(root, "home"),
+        "GEMINI_API_KEY": "fake-key",
+        "GOOGLE_GEMINI_BASE_URL": server_url,
+        "ARXIV_TRANSLATOR_LOG_DIR": os.path.join(root, "logs"),
+        "FAKE_TECTONIC_SECONDS": str(tectonic_seconds),
+        "PATH": os.path.join(root, "bin") + os.pathsep + env.get("PATH", ""),
+        "PYTHONPATH": os.path.join(REPO_ROOT, "src") + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    work_dir = os.path.join(root, "run")
+    os.makedirs(work_dir, exist_ok=True)
+    cmd = [sys.executable, "-m", "arxiv_translator.main", "--batch", os.path.join(root, "ids.txt"),
+           "--output", os.path.join(root, "pdfs")] + cli_args
+
+    start = time.perf_counter()
+    with open(os.path.join(root, "pipeline.log"), "w", encoding="utf-8") as log:
+        process = subprocess.Popen(cmd, cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 gives the resource usage of this child (and what it waited for) alone
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    makespan = time.perf_counter() - start
+    return process.returncode, makespan, usage.ru_maxrss / 1024
+
+
+def collect_latencies(root: str) -> list:
+    latencies = []
+    for path in glob.glob(os.path.join(root, "run", "*.metrics.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            latencies.extend(r["latency"] for r in json.load(f)["requests"])
+    return latencies
+
+
+def run_benchmark(papers: int = 4, files: int = 6, paragraphs: int = 12, figure_kb: int = 64,
+                  latency: float = 0.2, jitter: float = 0.1, seconds_per_1k_tokens: float = 0.0,
+                  error_rate: float = 0.0, throttle_rate: float = 0.0, retry_delay: float = 1.0,
+                  tectonic_seconds: float = 0.5, cli_args=(), keep: bool = False) -> dict:
+    """Runs one benchmark in a fresh temporary directory and returns its results."""
+    root = tempfile.mkdtemp(prefix="arxiv-translator-bench-")
+    try:
+        arxiv_ids = prepare(root, papers, files, paragraphs, figure_kb)
+        with FakeGeminiServer(latency, jitter, seconds_per_1k_tokens, error_rate, throttle_rate, retry_delay) as server:
+            exit_code, makespan, peak_rss_mb = run_pipeline(root, server.url, list(cli_args), tectonic_seconds)
+            server_stats = dict(server.stats)
+
+        succeeded = len(glob.glob(os.path.join(root, "pdfs", "*.pdf")))
+        latencies = collect_latencies(root)
+        return {
+            "args": " ".join(cli_args),
+            "papers": len(arxiv_ids),
+            "succeeded": succeeded,
+            "exit_code": exit_code,
+            "makespan_s": round(makespan, 2),
+            "papers_per_hour": round(succeeded / makespan * 3600, 1) if makespan else None,
+            "peak_rss_mb": round(peak_rss_mb, 1),
+            "requests": server_stats["requests"],
+            "throttled": server_stats["throttled"],
+            "errors": server_stats["errors"],
+            "latency_p50_s": round(percentile(latencies, 50), 3) if latencies else None,
+            "latency_p95_s": round(percentile(latencies, 95), 3) if latencies else None,
+            "workdir": root if keep else None,
+        }
+    finally:
+        if not keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+def print_table(results: list):
+    columns = ["args", "succeeded", "makespan_s", "papers_per_hour", "peak_rss_mb",
+               "requests", "throttled", "errors", "latency_p50_s", "latency_p95_s"]
+    rows = [[str(r.get(c) if r.get(c) is not None else "-") for c in columns] for r in results]
+    for row, r in zip(rows, results):
+        row[0] = row[0] or "(defaults)"
+        row[1] = f"{r['succeeded']}/{r['papers']}"
+    widths = [max(len(c), *(len(row[i]) for row in rows)) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark with a fake Gemini server")
+    parser.add_argument("--papers", type=int, default=4, help="Synthetic papers in the batch (default: %(default)s)")
+    parser.add_argument("--files", type=int, default=6, help="Section files per paper (default: %(default)s)")
+    parser.add_argument("--paragraphs", type=int, default=12, help="Paragraphs per section file (default: %(default)s)")
+    parser.add_argument("--figure-kb", type=int, default=64, help="Figure size per section in KB (default: %(default)s)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake Gemini base latency in seconds (default: %(default)s)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Extra random latency in seconds (default: %(default)s)")
+    parser.add_argument("--seconds-per-1k-tokens", type=float, default=0.0, help="Extra latency per 1000 output tokens (default: %(default)s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 500 (default: %(default)s)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests throttled with 429 (default: %(default)s)")
+    parser.add_argument("--retry-delay", type=float, default=1.0, help="retryDelay sent with 429s (default: %(default)s)")
+    parser.add_argument("--tectonic-seconds", type=float, default=0.5, help="Duration of each fake compile (default: %(default)s)")
+    parser.add_argument("--variant", action="append", default=[], metavar="ARGS",
+                        help="arxiv-translator arguments to benchmark, e.g. \"--concurrency 4\" (repeatable)")
+    parser.add_argument("--json", metavar="PATH", help="Write the results as JSON")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary directories for inspection")
+    parser.add_argument("--max-makespan", type=float, help="Exit with status 1 if any variant takes longer (seconds)")
+    parser.add_argument("--min-papers-per-hour", type=float, help="Exit with status 1 if any variant is slower")
+    args = parser.parse_args()
+
+    results = []
+    for variant in args.variant or [""]:
+        results.append(run_benchmark(
+            papers=args.papers, files=args.files, paragraphs=args.paragraphs, figure_kb=args.figure_kb,
+            latency=args.latency, jitter=args.jitter, seconds_per_1k_tokens=args.seconds_per_1k_tokens,
+            error_rate=args.error_rate, throttle_rate=args.throttle_rate, retry_delay=args.retry_delay,
+            tectonic_seconds=args.tectonic_seconds, cli_args=shlex.split(variant), keep=args.keep,
+        ))
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    failed = False
+    for r in results:
+        if r["succeeded"] < r["papers"]:
+            print(f"FAIL: {r['args'] or '(defaults)'}: only {r['succeeded']}/{r['papers']} papers produced a PDF")
+            failed = True
+        if args.max_makespan is not None and r["makespan_s"] > args.max_makespan:
+            print(f"FAIL: {r['args'] or '(defaults)'}: makespan {r['makespan_s']}s > {args.max_makespan}s")
+            failed = True
+        if args.min_papers_per_hour is not None and (r["papers_per_hour"] or 0) < args.min_papers_per_hour:
+            print(f"FAIL: {r['args'] or '(defaults)'}: {r['papers_per_hour']} papers/hour < {args.min_papers_per_hour}")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
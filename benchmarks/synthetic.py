@@ -0,0 +1,91 @@
+"""
+Generator of synthetic arXiv-style LaTeX projects (main.tex including one file
+per section, with paragraphs, equations and a figure), packed as e-print
+tarballs.
+"""
+import io
+import os
+import random
+import tarfile
+
+WORDS = ("model training loss layer attention token method result dataset "
+         "benchmark accuracy gradient network parameter scaling inference "
+         "architecture experiment baseline performance sequence embedding").split()
+
+
+def paragraph(rng: random.Random, sentences: int = 5) -> str:
+    out = []
+    for _ in range(sentences):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 18))]
+        sentence = " ".join(words).capitalize()
+        if rng.random() < 0.3:
+            sentence += f" as shown in Eq.~\\eqref{{eq:{rng.randint(0, 999)}}}"
+        if rng.random() < 0.2:
+            sentence += f" \\cite{{ref{rng.randint(0, 99)}}}"
+        out.append(sentence + ".")
+    return " ".join(out)
+
+
+def section_file(rng: random.Random, index: int, paragraphs: int) -> str:
+    lines = [f"\\section{{Section {index + 1}: {rng.choice(WORDS).capitalize()}}}",
+             f"\\label{{sec:{index}}}", ""]
+    for p in range(paragraphs):
+        lines += ["% A comment the translator strips", paragraph(rng), ""]
+        if p % 4 == 3:
+            lines += ["\\begin{equation}",
+                      f"  \\mathcal{{L}}_{{{p}}} = \\sum_{{i=1}}^{{N}} \\log p(x_i \\mid x_{{<i}})",
+                      f"  \\label{{eq:{index * 100 + p}}}",
+                      "\\end{equation}", ""]
+    lines += ["\\begin{figure}[t]", "  \\centering",
+              f"  \\includegraphics[width=0.8\\linewidth]{{figures/fig{index}.png}}",
+              f"  \\caption{{{paragraph(rng, 1)}}}", "\\end{figure}", ""]
+    return "\n".join(lines)
+
+
+def make_project(files: int = 6, paragraphs: int = 12, figure_kb: int = 64, seed: int = 0) -> dict:
+    """
+    Builds a project in memory.
+
+    Args:
+        files (int): Section files included from main.tex.
+        paragraphs (int): Paragraphs per section file (~100 tokens each).
+        figure_kb (int): Size of the (random, incompressible) figure per section.
+
+    Returns:
+        dict: Relative path -> bytes.
+    """
+    rng = random.Random(seed)
+    project = {}
+    inputs = []
+    for i in range(files):
+        project[f"sections/sec{i}.tex"] = section_file(rng, i, paragraphs).encode("utf-8")
+        project[f"figures/fig{i}.png"] = rng.randbytes(figure_kb * 1024)
+        inputs.append(f"\\input{{sections/sec{i}}}")
+    main = "\n".join([
+        "\\documentclass{article}",
+        "\\usepackage{amsmath}",
+        "\\usepackage{graphicx}",
+        f"\\title{{A Synthetic Study of {rng.choice(WORDS).capitalize()}}}",
+        "\\begin{document}",
+        "\\maketitle",
+        "\\begin{abstract}",
+        paragraph(rng),
+        "\\end{abstract}",
+        "",
+        *inputs,
+        "",
+        "\\end{document}",
+        "",
+    ])
+    project["main.tex"] = main.encode("utf-8")
+    return project
+
+
+def write_eprint(project: dict, path: str):
+    """Packs `project` as a gzipped tarball, the format arXiv serves e-prints in."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with tarfile.open(path, "w:gz") as tar:
+        for name, data in sorted(project.items()):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
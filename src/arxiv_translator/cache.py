@@ -0,0 +1,169 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional, Dict
+from .logging_utils import logger
+
+# 512 MB of cached translations is plenty for several thousand papers
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Entries kept in memory in front of SQLite by long-running processes (serve mode)
+DEFAULT_HOT_ENTRIES = 4096
+# Eviction candidates read from SQLite at a time
+EVICTION_BATCH = 256
+
+class TranslationCache:
+    """
+    Disk-backed, content-addressed cache of Gemini responses.
+
+    Entries are keyed by a hash of everything that influences the output
+    (input text, model, system prompt, temperature) and stored in SQLite so
+    the cache is shared between runs and worker processes. When the total
+    size exceeds `max_bytes`, the least recently used entries are evicted.
+
+    With `hot_entries`, the most recently used entries are also kept in an
+    in-memory LRU, so repeated lookups do not touch SQLite at all.
+
+    All methods block on SQLite; async code calls them through
+    asyncio.to_thread (as GeminiTranslator does). `clock` stamps the last
+    access of entries for eviction.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES, hot_entries: int = 0,
+                 clock: Callable[[], float] = time.time):
+        if db_path:
+            self.db_path = Path(db_path)
+        else:
+            # Default to ~/.arxiv-translator/cache.db (next to config.json)
+            self.db_path = Path.home() / ".arxiv-translator" / "cache.db"
+        self.max_bytes = max_bytes
+        self.hot_entries = hot_entries
+        self._clock = clock
+        self._hot: "OrderedDict[str, str]" = OrderedDict()
+        self._hot_hits = 0
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON entries(last_access)")
+            # Counters live in the database so hits from worker processes add up
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            # Running total of entries.size, so writes need not sum the table
+            # (computed once for databases created without it)
+            self._conn.execute(
+                "INSERT OR IGNORE INTO counters (name, value) SELECT 'bytes', COALESCE(SUM(size), 0) FROM entries"
+            )
+
+    @staticmethod
+    def make_key(text: str, model_name: str, system_prompt: str, temperature: float) -> str:
+        """Returns the content address for a request."""
+        h = hashlib.sha256()
+        for part in (model_name, system_prompt, repr(float(temperature)), text):
+            data = part.encode("utf-8")
+            # Length-prefix each part so different splits never collide
+            h.update(len(data).to_bytes(8, "big"))
+            h.update(data)
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached value for `key`, or None on a miss."""
+        with self._lock:
+            if key in self._hot:
+                # Served from memory; the entry's last_access on disk is refreshed when it falls out
+                self._hot.move_to_end(key)
+                self._hot_hits += 1
+                return self._hot[key]
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._bump("misses")
+                return None
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (self._clock(), key))
+            self._bump("hits")
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, key: str, value: str):
+        """Stores `value` under `key` and evicts old entries if over budget."""
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, self._clock())
+            )
+            self._bump("bytes", size - (row[0] if row else 0))
+            self._evict()
+            self._remember(key, value)
+
+    def _remember(self, key: str, value: str):
+        if not self.hot_entries:
+            return
+        self._hot[key] = value
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.hot_entries:
+            cold, _ = self._hot.popitem(last=False)
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (self._clock(), cold))
+
+    def _evict(self):
+        total = self._conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Oldest first, a batch at a time, until enough is freed
+        victims = []
+        freed = 0
+        cursor = self._conn.execute("SELECT key, size FROM entries ORDER BY last_access ASC")
+        while total - freed > self.max_bytes:
+            rows = cursor.fetchmany(EVICTION_BATCH)
+            if not rows:
+                break
+            for key, size in rows:
+                if total - freed <= self.max_bytes:
+                    break
+                victims.append((key,))
+                freed += size
+        cursor.close()
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self._bump("bytes", -freed)
+        self._bump("evictions", len(victims))
+        logger.debug(f"Translation cache evicted {len(victims)} entries.")
+
+    def _bump(self, name: str, amount: int = 1):
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit/miss/eviction counters and the current size of the cache."""
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        size = counters.get("bytes", 0)
+        return {
+            "hits": counters.get("hits", 0) + self._hot_hits,
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
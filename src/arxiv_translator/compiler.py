@@ -1,36 +1,172 @@
+import hashlib
+import json
+import re
 import subprocess
 import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional, Sequence
 from .logging_utils import logger
 
-def compile_pdf(source_dir: str, main_tex_file: str):
+# Bumped whenever the compile command or the fingerprint changes, so old fingerprints stop matching
+COMPILE_CACHE_VERSION = "2"
+FINGERPRINT_FILE = "fingerprint.json"
+# Tectonic's stdout/stderr of the last run, kept next to the PDF (<stem>.tectonic.log)
+TECTONIC_LOG_SUFFIX = ".tectonic.log"
+
+# Intermediates Tectonic leaves with --keep-intermediates that are worth
+# carrying over to the next build of the same paper
+INTERMEDIATE_SUFFIXES = (".aux", ".bbl", ".blg", ".toc", ".lof", ".lot", ".out", ".nav", ".snm")
+
+# Everything a build may (re)write next to the sources: the above, the outputs
+# and the auxiliary files of beamer, makeidx, biblatex, glossaries, ...
+BUILD_OUTPUT_SUFFIXES = INTERMEDIATE_SUFFIXES + (
+    ".pdf", ".log", ".synctex.gz", ".xdv", TECTONIC_LOG_SUFFIX, ".vrb", ".idx", ".ind", ".ilg",
+    ".bcf", ".run.xml", ".glo", ".gls", ".glg", ".ist", ".loa", ".brf", ".fls", ".fdb_latexmk",
+)
+
+# Files whose content is hashed; other inputs (figures, data) are fingerprinted
+# by size and mtime, which hardlinked workspaces preserve
+TEXT_SUFFIXES = (".tex", ".bib", ".sty", ".cls", ".bst", ".cfg", ".def", ".clo")
+
+# Preamble of the documents we produce, compiled once by warm_tectonic_cache
+WARMUP_DOCUMENT = r"""\documentclass{article}
+\usepackage[fontset=fandol]{ctex}
+\usepackage{xspace}
+\usepackage{amsmath,amssymb,amsthm}
+\usepackage{graphicx}
+\usepackage{booktabs}
+\usepackage{xcolor}
+\usepackage{hyperref}
+\begin{document}
+预热 Warm-up $x^2$.
+\end{document}
+"""
+
+def _tectonic_env(cache_dir: Optional[str]):
+    if not cache_dir:
+        return None
+    os.makedirs(cache_dir, exist_ok=True)
+    env = os.environ.copy()
+    env["TECTONIC_CACHE_DIR"] = os.path.abspath(cache_dir)
+    return env
+
+def compute_fingerprint(source_dir: str, main_tex_file: str) -> str:
+    """
+    Hash of everything a build depends on: the compile command, the main file
+    name and every input file under `source_dir`. Build outputs and the
+    intermediates Tectonic writes (or a previous round left behind) are not
+    inputs, so repair rounds and later runs see the same fingerprint for the
+    same sources. A .bbl is an input only when no .bib could have produced it
+    (arXiv sources often ship just the .bbl).
+    """
+    stem = os.path.splitext(os.path.basename(main_tex_file))[0]
+    outputs = {stem + ".pdf", stem + ".log", stem + ".synctex.gz", stem + TECTONIC_LOG_SUFFIX}
+    outputs.update(stem + suffix for suffix in INTERMEDIATE_SUFFIXES if suffix != ".bbl")
+
+    tree = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        tree.extend(os.path.join(root, file) for file in sorted(files))
+    if any(path.endswith(".bib") for path in tree):
+        outputs.add(stem + ".bbl")
+
+    digest = hashlib.sha256()
+    digest.update(f"{COMPILE_CACHE_VERSION}\0{stem}\0".encode("utf-8"))
+    for path in tree:
+        file = os.path.basename(path)
+        rel_path = os.path.relpath(path, source_dir)
+        if rel_path in outputs or file.endswith(TECTONIC_LOG_SUFFIX):
+            continue
+        digest.update(rel_path.encode("utf-8") + b"\0")
+        if file.endswith(TEXT_SUFFIXES):
+            with open(path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        else:
+            st = os.stat(path)
+            digest.update(f"{st.st_size}:{st.st_mtime_ns}".encode("ascii"))
+    return digest.hexdigest()
+
+def _restore_state(state_dir: str, source_dir: str):
+    for name in os.listdir(state_dir):
+        target = os.path.join(source_dir, name)
+        # Never replace a shipped .bbl with one built from an older version
+        if name.endswith(INTERMEDIATE_SUFFIXES) and not os.path.exists(target):
+            shutil.copy2(os.path.join(state_dir, name), target)
+
+def _save_state(state_dir: str, source_dir: str, stem: str, fingerprint: str):
+    os.makedirs(state_dir, exist_ok=True)
+    for name in os.listdir(source_dir):
+        if name.startswith(stem + ".") and name.endswith(INTERMEDIATE_SUFFIXES + (".pdf",)):
+            shutil.copy2(os.path.join(source_dir, name), os.path.join(state_dir, name))
+    with open(os.path.join(state_dir, FINGERPRINT_FILE), "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint}, f)
+
+def _cached_fingerprint(state_dir: str) -> Optional[str]:
+    try:
+        with open(os.path.join(state_dir, FINGERPRINT_FILE), "r", encoding="utf-8") as f:
+            return json.load(f).get("fingerprint")
+    except (OSError, ValueError):
+        return None
+
+def compile_pdf(source_dir: str, main_tex_file: str, state_dir: Optional[str] = None,
+                tectonic_cache_dir: Optional[str] = None):
     """
     Compiles the LaTeX project to PDF using latexmk.
-    
+
+    The Tectonic output is written to `<stem>.tectonic.log` in `source_dir`
+    (see triage.parse_compile_errors).
+
     Args:
         source_dir (str): The directory containing the source files.
         main_tex_file (str): The path to the main .tex file.
+        state_dir (str, optional): Where to keep the fingerprint, PDF and
+            intermediates (.aux/.bbl) of the last successful build. If the inputs are
+            unchanged, the kept PDF is reused without running Tectonic;
+            otherwise the intermediates seed the new build.
+        tectonic_cache_dir (str, optional): Persistent Tectonic bundle cache
+            (TECTONIC_CACHE_DIR); defaults to Tectonic's own location.
     """
-    # Ensure we are in the source dir
-    cwd = os.getcwd()
-    os.chdir(source_dir)
-    
+    # Run inside the source dir without os.chdir, so concurrent compiles
+    # (batch mode) do not fight over the process-wide working directory.
     # main_tex_file might be absolute, we need relative for latexmk usually
     rel_tex_file = os.path.basename(main_tex_file)
-    
+    stem = os.path.splitext(rel_tex_file)[0]
+    log_path = os.path.join(source_dir, stem + TECTONIC_LOG_SUFFIX)
+    if os.path.exists(log_path):
+        os.remove(log_path)
+
+    fingerprint = None
+    if state_dir:
+        fingerprint = compute_fingerprint(source_dir, main_tex_file)
+        cached_pdf = os.path.join(state_dir, stem + ".pdf")
+        if _cached_fingerprint(state_dir) == fingerprint and os.path.exists(cached_pdf):
+            shutil.copy2(cached_pdf, os.path.join(source_dir, stem + ".pdf"))
+            logger.info(f"Sources unchanged since the last build, reusing {stem}.pdf.")
+            return True
+        if os.path.isdir(state_dir):
+            _restore_state(state_dir, source_dir)
+
     logger.info(f"Compiling {rel_tex_file} in {source_dir}...")
-    
+
     try:
         # Tectonic automatically handles dependencies and multiple passes.
         # -Z shell-escape is needed for minted (pygments)
         cmd = ['tectonic', '-X', 'compile', '--keep-intermediates', '-Z', 'shell-escape', rel_tex_file]
-        
+
         result = subprocess.run(
             cmd,
+            cwd=source_dir,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True
+            text=True,
+            env=_tectonic_env(tectonic_cache_dir)
         )
-        
+        with open(log_path, "w", encoding="utf-8") as f:
+            f.write(result.stdout or "")
+            f.write(result.stderr or "")
+
         if result.returncode != 0:
             logger.warning(f"Compilation finished with return code {result.returncode}")
             logger.warning("Compilation had warnings/errors.")
@@ -39,10 +175,67 @@ def compile_pdf(source_dir: str, main_tex_file: str):
             # return False # We tolerate warnings
         else:
             logger.info("Compilation successful.")
-            
+
+        # Only a clean build is worth reusing; a failed one's PDF and .aux are not
+        if state_dir and result.returncode == 0 and os.path.exists(os.path.join(source_dir, stem + ".pdf")):
+            _save_state(state_dir, source_dir, stem, fingerprint)
+
         return True
     except Exception as e:
         logger.error(f"Compiler error: {e}")
         return False
-    finally:
-        os.chdir(cwd)
+
+def _loads_package(preamble: str, package: str) -> bool:
+    pattern = r'\\(?:usepackage|RequirePackage)\s*(?:\[[^\]]*\])?\s*\{[^}]*\b' + re.escape(package) + r'\b'
+    return re.search(pattern, preamble) is not None
+
+def compile_preflight(main_tex_file: str, packages: Sequence[str] = ()) -> bool:
+    """
+    Checks that only need the translated main file, so they can run while
+    other files are still being translated or analyzed: Tectonic is
+    installed, and `packages` needed by generated content (e.g. tcolorbox for
+    DeepDive boxes) are loaded, adding them before \\begin{document} if not.
+
+    Returns False if Tectonic is missing.
+    """
+    ok = shutil.which("tectonic") is not None
+    if not ok:
+        logger.error("Tectonic not found on PATH; the PDF cannot be compiled (see README: Install Tectonic).")
+    if packages:
+        with open(main_tex_file, "r", encoding="utf-8") as f:
+            content = f.read()
+        head, marker, body = content.partition("\\begin{document}")
+        missing = [p for p in packages if marker and not _loads_package(head, p)]
+        if missing:
+            lines = "".join(f"\\usepackage{{{p}}}\n" for p in missing)
+            with open(main_tex_file, "w", encoding="utf-8") as f:
+                f.write(head + lines + marker + body)
+            logger.info(f"Preflight: added {', '.join(missing)} to {os.path.basename(main_tex_file)}")
+    return ok
+
+def warm_tectonic_cache(tectonic_cache_dir: Optional[str] = None) -> bool:
+    """
+    Compiles a small ctex document so Tectonic downloads the fonts and
+    packages every translation needs into its cache (e.g. while building a
+    container image). Returns True on success.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        Path(tmp_dir, "warmup.tex").write_text(WARMUP_DOCUMENT, encoding="utf-8")
+        logger.info(f"Warming Tectonic cache{' in ' + tectonic_cache_dir if tectonic_cache_dir else ''}...")
+        try:
+            result = subprocess.run(
+                ['tectonic', '-X', 'compile', 'warmup.tex'],
+                cwd=tmp_dir,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                env=_tectonic_env(tectonic_cache_dir)
+            )
+        except OSError as e:
+            logger.error(f"Could not run Tectonic: {e}")
+            return False
+    if result.returncode != 0:
+        logger.error(f"Tectonic warm-up failed: {result.stderr}")
+        return False
+    logger.info("Tectonic cache is warm.")
+    return True
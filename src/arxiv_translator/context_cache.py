@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import re
+import time
+import weakref
+from typing import Dict, Optional, Set, Tuple
+from .segmenter import estimate_tokens
+from .ratelimit import error_code, retry_delay
+from .logging_utils import logger
+
+# Handles live this long unless extended; an abandoned handle (crashed run)
+# stops costing storage soon after
+DEFAULT_TTL_SECONDS = 900
+# Extend a handle that is still in use when it has less than this left
+REFRESH_MARGIN_SECONDS = 120
+
+# Explicit caches below the model's minimum input size are rejected by the API,
+# so smaller instructions are sent inline (where implicit caching may still apply)
+MIN_CACHE_TOKENS = {
+    "gemini-3-pro": 4096,
+    "gemini-2.5-pro": 4096,
+}
+DEFAULT_MIN_CACHE_TOKENS = 1024
+
+# A request referencing an expired or deleted handle fails with one of these
+STALE_HANDLE_CODES = {403, 404}
+
+# How the API says a model cannot cache content at all ("... is not supported
+# for createCachedContent"), as opposed to rejecting one request
+UNSUPPORTED_PATTERN = re.compile(r'not supported for (?:create)?CachedContent|does not support (?:context )?caching',
+                                 re.IGNORECASE)
+
+
+def min_cache_tokens(model: str) -> int:
+    for prefix, tokens in MIN_CACHE_TOKENS.items():
+        if model.startswith(prefix):
+            return tokens
+    return DEFAULT_MIN_CACHE_TOKENS
+
+
+class ContextCache:
+    """
+    Gemini cached-content handles for system instructions, created once per
+    (model, instruction) and referenced by every later request, instead of
+    resending the instruction with each chunk.
+
+    Handles are created with a TTL, extended while in use and deleted by
+    `close()`. When the model does not support caching (or creation fails),
+    `get()` returns None and callers send the instruction inline. Only an error
+    saying the model cannot cache stops caching for the whole model.
+    """
+
+    def __init__(self, client, ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        # key -> (cache name, expiry as time.time())
+        self._handles: Dict[str, Tuple[str, float]] = {}
+        # Per event loop: the sync wrappers run each call on a fresh loop (asyncio.run)
+        self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Lock]]" = \
+            weakref.WeakKeyDictionary()
+        # Models that cannot cache, and instructions the API refused to cache
+        self._unsupported: Set[str] = set()
+        self._rejected: Set[str] = set()
+        self.created = 0
+
+    @staticmethod
+    def make_key(model: str, instruction: str) -> str:
+        return hashlib.sha256(f"{model}\0{instruction}".encode('utf-8')).hexdigest()
+
+    def _ttl(self) -> str:
+        return f"{self.ttl_seconds}s"
+
+    async def get(self, model: str, instruction: str) -> Optional[str]:
+        """Returns the cached-content name for `instruction`, or None to send it inline."""
+        if model in self._unsupported or estimate_tokens(instruction) < min_cache_tokens(model):
+            return None
+        # The SDK is already loaded by the client; not importing it at module
+        # level keeps the CLI's light commands fast
+        from google.genai import types
+
+        key = self.make_key(model, instruction)
+        if key in self._rejected:
+            return None
+        locks = self._locks.setdefault(asyncio.get_running_loop(), {})
+        lock = locks.setdefault(key, asyncio.Lock())
+        # Concurrent chunks of one paper wait for a single creation
+        async with lock:
+            handle = self._handles.get(key)
+            now = time.time()
+            if handle is not None:
+                name, expires_at = handle
+                if expires_at - now > REFRESH_MARGIN_SECONDS:
+                    return name
+                if expires_at > now:
+                    try:
+                        await self.client.aio.caches.update(
+                            name=name, config=types.UpdateCachedContentConfig(ttl=self._ttl())
+                        )
+                        self._handles[key] = (name, now + self.ttl_seconds)
+                        return name
+                    except Exception as e:
+                        logger.debug(f"Could not extend context cache {name}: {e}")
+                self._handles.pop(key, None)
+
+            try:
+                cached = await self.client.aio.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=instruction,
+                        ttl=self._ttl(),
+                        display_name="arxiv-translator",
+                    )
+                )
+            except Exception as e:
+                if UNSUPPORTED_PATTERN.search(str(e)):
+                    # The model cannot cache at all; stop trying for it
+                    self._unsupported.add(model)
+                    logger.warning(f"Context caching unavailable for {model}, sending the instruction with each request: {e}")
+                elif retry_delay(e, 0) is None:
+                    # Not transient (e.g. the instruction is too small): stop trying for this instruction only
+                    self._rejected.add(key)
+                    logger.warning(f"Could not cache an instruction for {model}, sending it with each request: {e}")
+                else:
+                    logger.debug(f"Context cache creation failed for {model}: {e}")
+                return None
+
+            self._handles[key] = (cached.name, now + self.ttl_seconds)
+            self.created += 1
+            logger.debug(f"Created context cache {cached.name} for {model} (~{estimate_tokens(instruction)} tokens)")
+            return cached.name
+
+    def invalidate(self, name: str, exc: Exception) -> bool:
+        """
+        Forgets handle `name` if `exc` (raised by a request using it) means the
+        API no longer accepts it, so the next get() recreates it. Returns True
+        if it did.
+        """
+        if error_code(exc) not in STALE_HANDLE_CODES:
+            return False
+        for key, (handle_name, _) in list(self._handles.items()):
+            if handle_name == name:
+                del self._handles[key]
+        return True
+
+    async def close(self):
+        """Deletes every handle created by this instance."""
+        handles = list(self._handles.values())
+        self._handles.clear()
+        for name, _ in handles:
+            try:
+                await self.client.aio.caches.delete(name=name)
+            except Exception as e:
+                logger.debug(f"Could not delete context cache {name}: {e}")
@@ -1,16 +1,74 @@
 from google import genai
 from google.genai import types
+import asyncio
+import json
 import os
 import re
-import time
+from typing import Dict, List, Optional, Set, Tuple
+from .segmenter import estimate_tokens, pack_ranges, split_segments
+from .density import DEFAULT_MIN_SCORE, select_sections
+from .ratelimit import AdaptiveRateLimiter, get_rate_limiter, retry_delay
+from .metrics import MetricsRecorder, get_metrics
+from .context_cache import ContextCache
+from .glossary import current_glossary
 from .logging_utils import logger
 
+# One request per section of about this size (latency stays bounded on large files)
+DEEPDIVE_CHUNK_TOKENS = 6000
+# Sections of one file analyzed at the same time
+DEFAULT_DEEPDIVE_CONCURRENCY = 4
+
+JSON_FENCE_PATTERN = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.DOTALL)
+
+BOX_TEMPLATE = (
+    "\\begin{{tcolorbox}}[colback=blue!5!white,colframe=blue!75!black,title=AI DeepDive Insight]\n"
+    "\\textbf{{Core Concept}}: {concept} \\\\\n"
+    "\\textbf{{Explanation}}: {explanation} \\\\\n"
+    "\\textbf{{Why it matters}}: {why}\n"
+    "\\end{{tcolorbox}}"
+)
+
+# LaTeX packages the boxes need in the main file's preamble
+DEEPDIVE_PACKAGES = ("tcolorbox",)
+
+def render_box(concept: str, explanation: str, why: str) -> str:
+    return BOX_TEMPLATE.format(concept=concept, explanation=explanation, why=why)
+
+def _eligible_segments(segments: List[str]) -> Set[int]:
+    """Segments a box may follow: inside the document body and with some text."""
+    eligible = set()
+    in_body = not any("\\begin{document}" in segment for segment in segments)
+    for i, segment in enumerate(segments):
+        if not in_body:
+            in_body = "\\begin{document}" in segment
+            continue
+        if "\\end{document}" in segment:
+            break
+        if segment.strip():
+            eligible.add(i)
+    return eligible
+
 class DeepDiveAnalyzer:
-    def __init__(self, api_key: str, model_name: str = "gemini-3.0-pro-exp"):
+    def __init__(self, api_key: str, model_name: str = "gemini-3.0-pro-exp", client: Optional[genai.Client] = None,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None, metrics: Optional[MetricsRecorder] = None,
+                 context_cache: Optional[ContextCache] = None,
+                 chunk_tokens: int = DEEPDIVE_CHUNK_TOKENS,
+                 chunk_concurrency: int = DEFAULT_DEEPDIVE_CONCURRENCY,
+                 min_score: float = DEFAULT_MIN_SCORE):
         self.api_key = api_key
         # Use Pro model as requested for deeper reasoning, or default if not specified
         self.model_name = model_name
-        self.client = genai.Client(api_key=self.api_key, http_options={'api_version': 'v1beta', 'timeout': 600000})
+        # Shares the per-model limiter with GeminiTranslator when both use the same model
+        self.rate_limiter = rate_limiter or get_rate_limiter(model_name)
+        self.metrics = metrics or get_metrics()
+        # Shared with GeminiTranslator: the (long) DeepDive prompt is cached once per run
+        self.context_cache = context_cache
+        # Section size and sections in flight per file
+        self.chunk_tokens = chunk_tokens
+        self.chunk_concurrency = chunk_concurrency
+        # Technical-density score a section needs to be analyzed
+        self.min_score = min_score
+        self.client = client or genai.Client(api_key=self.api_key, http_options={'api_version': 'v1beta', 'timeout': 600000})
         
         # Load Prompt
         prompt_path = os.path.join(os.path.dirname(__file__), "prompts", "deepdive_prompt.txt")
@@ -19,58 +77,154 @@ class DeepDiveAnalyzer:
                 self.system_prompt = f.read()
         else:
             # Fallback simple prompt
-            self.system_prompt = "Analyze the technical content and insert explanation boxes in Chinese using tcolorbox for DeepDive."
+            self.system_prompt = ("Explain the most technical numbered paragraphs in Chinese. Output a JSON array of "
+                                  "{\"after\": paragraph number, \"concept\", \"explanation\", \"why\"}.")
 
     def analyze_latex(self, latex_content: str, filename: str) -> str:
         """
-        Analyzes the LaTeX content and injects DeepDive reading blocks.
+        Synchronous wrapper around analyze_latex_async for one-off use.
         """
-        # Heuristic filtering: Only process files that likely contain technical depth
-        # Skip standard boilerplate files
+        return asyncio.run(self.analyze_latex_async(latex_content, filename))
+
+    def _sections(self, segments: List[str], filename: str) -> List[List[int]]:
+        """Segment indices of each section a box may be added to."""
+        # Heuristic filtering: Skip standard boilerplate files
         if filename in ["main.tex", "references.tex", "appendix.tex", "math_commands.tex"]:
             # main.tex might have content, but often just includes. 
             # If it's short, skip.
-            if len(latex_content) < 500: 
-                return latex_content
+            if sum(len(segment) + 1 for segment in segments) < 500:
+                return []
+        eligible = _eligible_segments(segments)
+        sections = []
+        for start, end in pack_ranges(segments, self.chunk_tokens):
+            indices = [i for i in range(start, end) if i in eligible]
+            if indices:
+                sections.append(indices)
+        return sections
 
-        # Simple keyword check to avoid wasting tokens on non-technical files
-        # Keywords: method, algorithm, equation, theorem, proof, architecture, layer, loss
-        keywords = ["method", "algorithm", "equation", "theorem", "proof", "architecture", "layer", "loss", "model", "training"]
-        if not any(k in latex_content.lower() for k in keywords):
-            return latex_content
+    def plan(self, latex_content: str, filename: str) -> Dict[int, str]:
+        """Text of each section of the file that could be analyzed, by section number (see density.py)."""
+        segments = split_segments(latex_content)
+        return {number: '\n'.join(segments[i] for i in indices)
+                for number, indices in enumerate(self._sections(segments, filename))}
 
-        # Chunking: Pro model is slower, so we limit context size.
-        # Currently processing the entire file if within token limits.
-        
-        # Limit file size to avoid timeout/cost issues
-        if len(latex_content) > 131072:
-            logger.info(f"Skipping {filename} (File too large for single-pass analysis).")
-            return latex_content
+    async def analyze_latex_async(self, latex_content: str, filename: str,
+                                  selected: Optional[Set[int]] = None) -> str:
+        """
+        Analyzes the LaTeX content and injects DeepDive reading blocks.
 
-        try:
-            # logger.debug(f"Analyzing technical content in {filename}...") # Verbose logging removed for cleaner CLI output
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                config=types.GenerateContentConfig(
-                    system_instruction=self.system_prompt,
-                    temperature=0.2, 
-                ),
-                contents=[latex_content]
+        The file is split into sections (chunks of at most `chunk_tokens`)
+        that are analyzed concurrently. The model only returns the
+        explanations and the number of the paragraph each belongs to; the
+        boxes are inserted here, so the file is never echoed back.
+
+        Only the section numbers in `selected` (see plan) are analyzed; by
+        default, those whose technical-density score reaches `min_score`.
+        """
+        segments = split_segments(latex_content)
+        sections = self._sections(segments, filename)
+        if selected is None:
+            selected, _ = select_sections(
+                {number: '\n'.join(segments[i] for i in indices) for number, indices in enumerate(sections)},
+                self.min_score
             )
-            
-            if response.text:
-                return self._clean_output(response.text)
-            
+        chunks = [indices for number, indices in enumerate(sections) if number in selected]
+        if not chunks:
             return latex_content
 
-        except Exception as e:
-            logger.error(f"DeepDive analysis failed for {filename}: {e}")
+        semaphore = asyncio.Semaphore(max(1, self.chunk_concurrency))
+
+        async def run(indices):
+            async with semaphore:
+                return await self._analyze_chunk(segments, indices, filename)
+
+        results = await asyncio.gather(*(run(indices) for indices in chunks))
+        boxes: Dict[int, List[str]] = {}
+        for insights in results:
+            for index, box in insights:
+                boxes.setdefault(index, []).append(box)
+        if not boxes:
             return latex_content
 
-    def _clean_output(self, text: str) -> str:
-        # Remove markdown code fences if present
-        pattern = r"^```(?:latex)?\s*(.*?)\s*```$"
-        match = re.search(pattern, text, re.DOTALL)
-        if match:
-            return match.group(1)
-        return text
+        output = []
+        for i, segment in enumerate(segments):
+            if i in boxes:
+                # Box right after the paragraph, before the blank line that ends it
+                body = segment.rstrip('\n')
+                trailing = segment[len(body):]
+                segment = body + '\n' + '\n'.join(boxes[i]) + (trailing or '\n')
+            output.append(segment)
+        logger.debug(f"DeepDive: {sum(len(b) for b in boxes.values())} insights in {filename} "
+                     f"({len(chunks)} sections analyzed)")
+        return '\n'.join(output)
+
+    async def _analyze_chunk(self, segments: List[str], indices: List[int], filename: str,
+                             max_retries: int = 3) -> List[Tuple[int, str]]:
+        """Returns (segment index, box) pairs for one section; [] if the request fails."""
+        # Paragraph numbers are global to the file, so anchors cannot point into another section
+        text = '\n'.join(f"[P{i + 1}]\n{segments[i].rstrip()}\n" for i in indices)
+
+        for attempt in range(max_retries):
+            config = None
+            try:
+                config = await self._config()
+                async with self.rate_limiter.slot(estimate_tokens(text)):
+                    with self.metrics.measure(self.model_name) as record:
+                        response = await self.client.aio.models.generate_content(
+                            model=self.model_name,
+                            config=config,
+                            contents=[text]
+                        )
+                        record(response)
+                return self._parse_insights(response.text or "", set(indices))
+
+            except Exception as e:
+                delay = retry_delay(e, attempt)
+                if config is not None and config.cached_content and self.context_cache.invalidate(config.cached_content, e):
+                    # Expired or deleted handle: retry with a fresh one
+                    delay = 0
+                if delay is None or attempt == max_retries - 1:
+                    logger.error(f"DeepDive analysis failed for a section of {filename}: {e}")
+                    return []
+                logger.warning(f"DeepDive attempt {attempt+1} failed for {filename}: {e}")
+                self.metrics.count("retry", self.model_name)
+                await asyncio.sleep(delay)
+
+        return []
+
+    def _parse_insights(self, text: str, allowed: Set[int]) -> List[Tuple[int, str]]:
+        try:
+            match = JSON_FENCE_PATTERN.search(text)
+            items = json.loads((match.group(1) if match else text).strip() or "[]")
+        except ValueError:
+            logger.warning("DeepDive returned invalid JSON, skipping section.")
+            return []
+        if isinstance(items, dict):
+            items = [items]
+        insights = []
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get("after")) - 1
+            except (TypeError, ValueError):
+                continue
+            explanation = str(item.get("explanation") or "").strip()
+            if index not in allowed or not explanation:
+                continue
+            insights.append((index, render_box(str(item.get("concept") or "").strip(), explanation,
+                                               str(item.get("why") or "").strip())))
+        return insights
+
+    async def _config(self) -> types.GenerateContentConfig:
+        instruction = self.system_prompt + current_glossary.get()
+        if self.context_cache is not None:
+            cached_content = await self.context_cache.get(self.model_name, instruction)
+            if cached_content is not None:
+                return types.GenerateContentConfig(cached_content=cached_content, temperature=0.2,
+                                                   response_mime_type="application/json")
+        return types.GenerateContentConfig(
+            system_instruction=instruction,
+            temperature=0.2, 
+            response_mime_type="application/json",
+        )
@@ -0,0 +1,83 @@
+import re
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+from .segmenter import estimate_tokens
+
+# Sections below this score are not worth a DeepDive request
+DEFAULT_MIN_SCORE = 10.0
+# Short sections are scored as if they had this many tokens, so one formula
+# in a two-line section does not outrank a whole derivation
+MIN_SCORED_TOKENS = 200
+
+DISPLAY_MATH_PATTERN = re.compile(r'\\begin\{(?:equation|align|gather|multline|eqnarray|flalign)\*?\}|\\\[|\$\$')
+INLINE_MATH_PATTERN = re.compile(r'(?<![\\$])\$(?!\$)[^$]+?\$')
+FORMAL_ENV_PATTERN = re.compile(r'\\begin\{(?:theorem|lemma|proposition|corollary|definition|proof|algorithm|algorithmic|algorithm2e)\*?\}')
+MATH_SYMBOL_PATTERN = re.compile(
+    r'\\(?:frac|sum|prod|int|partial|nabla|mathbb|mathcal|mathbf|boldsymbol|log|exp|arg(?:min|max)|'
+    r'alpha|beta|gamma|delta|epsilon|theta|lambda|mu|sigma|phi|psi|omega|cdot|times|leq|geq|sim|propto)'
+    r'(?![a-zA-Z])|[_^]'
+)
+# DeepDive runs on the translated files, so keywords are matched in both languages
+KEYWORD_WEIGHTS = {
+    "we propose": 2.0, "我们提出": 2.0,
+    "derive": 1.5, "推导": 1.5,
+    "objective": 1.0, "目标函数": 1.0,
+    "loss": 1.0, "损失": 1.0,
+    "gradient": 1.0, "梯度": 1.0,
+    "converge": 1.0, "收敛": 1.0,
+    "complexity": 1.0, "复杂度": 1.0,
+    "theorem": 1.0, "定理": 1.0,
+    "algorithm": 1.0, "算法": 1.0,
+    "architecture": 1.0, "架构": 1.0,
+    "optimiz": 1.0, "优化": 1.0,
+    "attention": 0.5, "注意力": 0.5,
+}
+# Sections readers rarely need explained (see the DeepDive prompt)
+LOW_VALUE_HEADING_PATTERN = re.compile(
+    r'\\section\*?\{[^}]*(?:abstract|introduction|related work|conclusion|acknowledg|limitation|broader impact|'
+    r'摘要|引言|介绍|相关工作|结论|致谢|局限)',
+    re.IGNORECASE
+)
+LOW_VALUE_FACTOR = 0.2
+
+
+def score_section(text: str) -> float:
+    """
+    Cheap technical-density score of a LaTeX section: display equations,
+    theorem/algorithm environments, math symbols, inline math and weighted
+    keywords, per 1000 tokens.
+    """
+    lowered = text.lower()
+    raw = (3.0 * len(DISPLAY_MATH_PATTERN.findall(text))
+           + 5.0 * len(FORMAL_ENV_PATTERN.findall(text))
+           + 0.5 * len(INLINE_MATH_PATTERN.findall(text))
+           + 0.2 * len(MATH_SYMBOL_PATTERN.findall(text))
+           + sum(weight * lowered.count(keyword) for keyword, weight in KEYWORD_WEIGHTS.items()))
+    score = raw * 1000 / max(estimate_tokens(text), MIN_SCORED_TOKENS)
+    if LOW_VALUE_HEADING_PATTERN.search(text):
+        score *= LOW_VALUE_FACTOR
+    return score
+
+
+def select_sections(sections: Dict[Hashable, str], min_score: float = DEFAULT_MIN_SCORE,
+                    budget_tokens: Optional[int] = None) -> Tuple[Set[Hashable], List[Tuple[Hashable, float]]]:
+    """
+    Picks the sections to analyze: those scoring at least `min_score`, densest
+    first, until `budget_tokens` (estimated input tokens) would be exceeded.
+
+    Returns:
+        The selected keys, and (key, score) of every section, densest first.
+    """
+    scored = sorted(((key, score_section(text)) for key, text in sections.items()),
+                    key=lambda item: item[1], reverse=True)
+    selected = set()
+    spent = 0
+    for key, score in scored:
+        if score < min_score:
+            break
+        tokens = estimate_tokens(sections[key])
+        if budget_tokens is not None and spent + tokens > budget_tokens:
+            # A smaller section further down may still fit
+            continue
+        selected.add(key)
+        spent += tokens
+    return selected, scored
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import re
+from collections import deque
+from typing import Dict, List, Optional, Set
+from .logging_utils import logger
+
+GRAPH_FILE = "dependency_graph.json"
+GRAPH_VERSION = 1
+
+# \input{f}, \include{f}, \subfile{f}, \subfileinclude{f} (starred forms too)
+INCLUDE_PATTERN = re.compile(r'\\(input|include|subfile|subfileinclude)\*?\s*\{([^{}]*)\}')
+# \import{dir/}{f}, \subimport{dir/}{f}, \includefrom / \subincludefrom (import package)
+IMPORT_PATTERN = re.compile(r'\\(import|subimport|includefrom|subincludefrom|inputfrom|subinputfrom)\*?\s*\{([^{}]*)\}\s*\{([^{}]*)\}')
+# Plain-TeX form: \input sections/intro
+BARE_INPUT_PATTERN = re.compile(r'\\input\s+([^\s{}\\%]+)')
+# An unescaped % starts a comment
+COMMENT_PATTERN = re.compile(r'(?<!\\)%.*')
+
+
+def _strip_comments(text: str) -> str:
+    return COMMENT_PATTERN.sub('', text)
+
+
+class DependencyGraph:
+    """
+    Which files of a LaTeX project include which, starting from the main file.
+    Paths are relative to the project root, with '/' separators.
+
+    `unresolved` lists include targets that could not be mapped to a file;
+    targets built from macros (e.g. \\input{\\figdir/plot}) make the graph
+    incomplete, see `is_complete`.
+    """
+
+    def __init__(self, main: str, edges: Optional[Dict[str, List[str]]] = None,
+                 unresolved: Optional[List[str]] = None):
+        self.main = main
+        self.edges = edges or {}
+        self.unresolved = unresolved or []
+
+    @property
+    def is_complete(self) -> bool:
+        return not any('\\' in target or '#' in target for target in self.unresolved)
+
+    def reachable(self) -> Set[str]:
+        seen = {self.main}
+        queue = deque([self.main])
+        while queue:
+            for child in self.edges.get(queue.popleft(), []):
+                if child not in seen:
+                    seen.add(child)
+                    queue.append(child)
+        return seen
+
+    @classmethod
+    def build(cls, root: str, main_tex: str) -> "DependencyGraph":
+        main = os.path.relpath(main_tex, root).replace(os.sep, '/')
+        graph = cls(main)
+        queue = deque([main])
+        visited = set()
+        while queue:
+            rel_path = queue.popleft()
+            if rel_path in visited:
+                continue
+            visited.add(rel_path)
+            children = []
+            for target, base in _includes(root, rel_path):
+                resolved = _resolve(root, target, base)
+                if resolved is None:
+                    graph.unresolved.append(target)
+                    continue
+                children.append(resolved)
+                if resolved.endswith('.tex'):
+                    queue.append(resolved)
+            graph.edges[rel_path] = children
+        return graph
+
+    def to_dict(self) -> dict:
+        return {"main": self.main, "edges": self.edges, "unresolved": self.unresolved}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DependencyGraph":
+        return cls(data["main"], data.get("edges"), data.get("unresolved"))
+
+
+def _includes(root: str, rel_path: str):
+    """Yields (target, base_dir) for every include in the file; base_dir is relative to root."""
+    try:
+        with open(os.path.join(root, rel_path), 'r', encoding='utf-8', errors='ignore') as f:
+            text = _strip_comments(f.read())
+    except OSError:
+        return
+    current_dir = os.path.dirname(rel_path)
+    for match in INCLUDE_PATTERN.finditer(text):
+        # \input paths are relative to the project root (TeX's working directory)
+        yield match.group(2).strip(), ''
+    for match in BARE_INPUT_PATTERN.finditer(text):
+        yield match.group(1).strip(), ''
+    for match in IMPORT_PATTERN.finditer(text):
+        command, directory, name = match.groups()
+        # \subimport and friends are relative to the including file
+        base = current_dir if command.startswith('sub') else ''
+        yield os.path.join(directory.strip(), name.strip()), base
+
+
+def _resolve(root: str, target: str, base: str) -> Optional[str]:
+    if not target or '\\' in target or '#' in target:
+        return None
+    for directory in dict.fromkeys([base, '']):
+        path = os.path.normpath(os.path.join(directory, target))
+        for candidate in (path + '.tex', path):
+            full_path = os.path.join(root, candidate)
+            if os.path.isfile(full_path) and not candidate.startswith('..'):
+                return candidate.replace(os.sep, '/')
+    return None
+
+
+def _tree_signature(root: str, main_tex: str) -> str:
+    """Cheap signature of the project's .tex files (names, sizes, mtimes)."""
+    digest = hashlib.sha256(f"{GRAPH_VERSION}\0{os.path.relpath(main_tex, root)}".encode('utf-8'))
+    for dirpath, dirs, files in os.walk(root):
+        dirs.sort()
+        for file in sorted(files):
+            if file.endswith('.tex'):
+                path = os.path.join(dirpath, file)
+                st = os.stat(path)
+                digest.update(f"\0{os.path.relpath(path, root)}:{st.st_size}:{st.st_mtime_ns}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_dependency_graph(root: str, main_tex: str, cache_path: Optional[str] = None) -> DependencyGraph:
+    """
+    Returns the dependency graph of the project at `root`, reusing the copy
+    cached at `cache_path` if the .tex files have not changed since.
+    """
+    signature = _tree_signature(root, main_tex)
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get("signature") == signature:
+                return DependencyGraph.from_dict(cached["graph"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+    graph = DependencyGraph.build(root, main_tex)
+    if cache_path:
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({"signature": signature, "graph": graph.to_dict()}, f)
+    if graph.unresolved:
+        logger.debug(f"Unresolved includes: {graph.unresolved}")
+    return graph
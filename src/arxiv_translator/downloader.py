@@ -1,34 +1,338 @@
+import contextlib
+import io
 import requests
+import json
 import os
+import re
 import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from requests.adapters import HTTPAdapter
+from .extractor import extract_source, extract_stream
 from .logging_utils import logger
 
-def download_source(arxiv_id: str, output_dir: str) -> str:
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+CHUNK_SIZE = 64 * 1024
+# (connect, read) timeouts in seconds; the read timeout applies per chunk
+DOWNLOAD_TIMEOUT = (10, 120)
+MAX_ATTEMPTS = 3
+
+VERSIONED_ID_PATTERN = re.compile(r'v\d+$')
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Returns a process-wide requests.Session with a connection pool sized for batch fetches."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["User-Agent"] = "arxiv-translator (https://github.com/ZeyuChen/arxiv-translator)"
+            _session = session
+        return _session
+
+def _load_meta(meta_path: str) -> dict:
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_meta(meta_path: str, meta: dict):
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+def fetch_url(url: str, output_path: str, session: Optional[requests.Session] = None,
+              revalidate: bool = True) -> bool:
+    """
+    Downloads `url` to `output_path`, with the validators kept in a sidecar
+    `<output_path>.json`.
+
+    - If a complete copy exists, it is revalidated with If-None-Match /
+      If-Modified-Since (or trusted as-is when `revalidate` is False).
+    - Data is streamed into `<output_path>.part`; an interrupted download is
+      resumed with an HTTP Range request guarded by If-Range.
+
+    Returns:
+        bool: True if new content was downloaded, False if the copy was current.
+    """
+    session = session or get_session()
+    meta_path = output_path + ".json"
+    part_path = output_path + ".part"
+    meta = _load_meta(meta_path)
+
+    if os.path.exists(output_path) and not revalidate:
+        return False
+
+    for attempt in range(MAX_ATTEMPTS):
+        headers = {}
+        if os.path.exists(output_path):
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        part_validator = meta.get("part_etag") or meta.get("part_last_modified")
+        if offset and part_validator:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = part_validator
+        else:
+            offset = 0
+
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                if response.status_code == 304:
+                    logger.info(f"{os.path.basename(output_path)} is up to date (not modified).")
+                    return False
+                if response.status_code == 416:
+                    # Our partial file does not match the server's any more
+                    os.remove(part_path)
+                    continue
+                response.raise_for_status()
+
+                resumed = response.status_code == 206 and offset > 0
+                if resumed:
+                    logger.info(f"Resuming download at byte {offset}.")
+                meta["part_etag"] = response.headers.get("ETag")
+                meta["part_last_modified"] = response.headers.get("Last-Modified")
+                _save_meta(meta_path, meta)
+
+                with open(part_path, "ab" if resumed else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            logger.warning(f"Download interrupted ({e}); retrying with resume...")
+            continue
+
+        os.replace(part_path, output_path)
+        meta = {
+            "url": url,
+            "etag": meta.get("part_etag"),
+            "last_modified": meta.get("part_last_modified"),
+            "size": os.path.getsize(output_path),
+        }
+        _save_meta(meta_path, meta)
+        return True
+
+    raise RuntimeError(f"Could not download {url}")
+
+
+class EprintStore:
+    """
+    Shared on-disk mirror of arXiv e-prints (~/.arxiv-translator/eprints/ by
+    default), so new workspaces of the same paper do not fetch it again.
+
+    Versioned IDs (2602.04705v2) are immutable on arXiv and never re-fetched;
+    unversioned IDs are revalidated with a conditional request.
+
+    Fetches of the same e-print are serialized (see lock), across threads and
+    processes sharing the mirror.
+    """
+
+    def __init__(self, root: Optional[str] = None, session: Optional[requests.Session] = None):
+        if root:
+            self.root = Path(root)
+        else:
+            self.root = Path.home() / ".arxiv-translator" / "eprints"
+        self.session = session
+        self._locks: Dict[str, threading.RLock] = {}
+        self._depth: Dict[str, int] = {}
+        self._locks_lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def lock(self, arxiv_id: str):
+        """
+        Holds the e-print's lock: a per-ID thread lock plus an fcntl lock on
+        `<archive>.lock` for other processes. Reentrant within a thread.
+        """
+        path = self.path_for(arxiv_id)
+        with self._locks_lock:
+            thread_lock = self._locks.setdefault(path, threading.RLock())
+        with thread_lock:
+            depth = self._depth.get(path, 0)
+            self._depth[path] = depth + 1
+            lock_file = None
+            try:
+                if depth == 0 and fcntl is not None:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    lock_file = open(path + ".lock", "a")
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                yield
+            finally:
+                if lock_file is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                    lock_file.close()
+                self._depth[path] = depth
+
+    def path_for(self, arxiv_id: str) -> str:
+        # Old-style IDs (hep-th/9901001) contain a slash
+        safe_id = arxiv_id.replace("/", "_")
+        base = VERSIONED_ID_PATTERN.sub("", safe_id)
+        return str(self.root / base / f"{safe_id}.tar.gz")
+
+    def fetch(self, arxiv_id: str) -> str:
+        """Returns the local path of the e-print, downloading or revalidating it if needed."""
+        path = self.path_for(arxiv_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        versioned = VERSIONED_ID_PATTERN.search(arxiv_id) is not None
+        url = f"https://arxiv.org/e-print/{arxiv_id}"
+        with self.lock(arxiv_id):
+            fetched = fetch_url(url, path, self.session, revalidate=not versioned)
+        if fetched:
+            logger.info(f"Stored {arxiv_id} in e-print mirror {path}")
+        else:
+            logger.info(f"Using mirrored e-print for {arxiv_id}.")
+        return path
+
+
+def download_source(arxiv_id: str, output_dir: str, store: Optional[EprintStore] = None) -> str:
     """
     Downloads the source files for a given arXiv ID.
-    
+
     Args:
         arxiv_id (str): The arXiv ID (e.g., '2602.04705').
         output_dir (str): The directory to save the downloaded file.
-        
+        store (EprintStore, optional): Shared mirror to fetch through; the
+            workspace copy is then a hardlink into it.
+
     Returns:
         str: The path to the downloaded file.
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
-        
+
     url = f"https://arxiv.org/e-print/{arxiv_id}"
     filename = f"{arxiv_id}.tar.gz" # arXiv source is usually a tarball
     output_path = os.path.join(output_dir, filename)
-    
+
     logger.info(f"Downloading source based on {arxiv_id} from {url}...")
-    
-    response = requests.get(url, stream=True)
-    response.raise_for_status()
-    
-    with open(output_path, 'wb') as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            f.write(chunk)
-            
+
+    if store is None:
+        fetch_url(url, output_path)
+    else:
+        mirrored = store.fetch(arxiv_id)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        try:
+            os.link(mirrored, output_path)
+        except OSError:
+            # Different filesystem (or no hardlink support)
+            shutil.copy2(mirrored, output_path)
+
     logger.info(f"Downloaded to {output_path}")
     return output_path
+
+
+class _TeeStream(io.RawIOBase):
+    """Readable view of a response body that also writes every byte to `sink`."""
+
+    def __init__(self, chunks, sink):
+        self._chunks = chunks
+        self._sink = sink
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._sink.write(chunk)
+            self._pending = chunk
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def drain(self):
+        """Copies whatever the extractor did not consume (tar padding) to the sink."""
+        for chunk in self._chunks:
+            self._sink.write(chunk)
+
+
+def download_and_extract_source(arxiv_id: str, output_dir: str, extract_to: str,
+                                store: Optional[EprintStore] = None) -> str:
+    """
+    Downloads the e-print and extracts it in the same pass, reading the tar
+    stream straight off the response body. The archive is still written (to
+    the workspace, or to `store` and hardlinked) so later runs can reuse it.
+
+    If `store` already holds the archive, it is extracted from there instead.
+    The streamed request is not retried or resumed: if it fails, the partial
+    archive and extraction are removed and the source is fetched with
+    download_source (which does both) and extracted afterwards.
+
+    Returns:
+        str: The path to the downloaded archive.
+    """
+    if store is None:
+        return _download_and_extract_source(arxiv_id, output_dir, extract_to)
+    # The mirror's .part file is written here as well
+    with store.lock(arxiv_id):
+        return _download_and_extract_source(arxiv_id, output_dir, extract_to, store)
+
+def _download_and_extract_source(arxiv_id: str, output_dir: str, extract_to: str,
+                                 store: Optional[EprintStore] = None) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{arxiv_id}.tar.gz")
+    archive_path = store.path_for(arxiv_id) if store is not None else output_path
+    if store is not None and os.path.exists(archive_path):
+        path = download_source(arxiv_id, output_dir, store=store)
+        with open(path, "rb") as f:
+            extract_stream(f, extract_to)
+        return path
+
+    url = f"https://arxiv.org/e-print/{arxiv_id}"
+    session = (store.session if store is not None else None) or get_session()
+    os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+    part_path = archive_path + ".part"
+
+    logger.info(f"Streaming source of {arxiv_id} from {url}...")
+    try:
+        with session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            with open(part_path, "wb") as part:
+                body = _TeeStream(iter(response.iter_content(chunk_size=CHUNK_SIZE)), part)
+                extract_stream(body, extract_to)
+                body.drain()
+            os.replace(part_path, archive_path)
+            _save_meta(archive_path + ".json", {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "size": os.path.getsize(archive_path),
+            })
+    except Exception as e:
+        logger.warning(f"Streaming extraction of {arxiv_id} failed ({e}); downloading the archive first.")
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        shutil.rmtree(extract_to, ignore_errors=True)
+        path = download_source(arxiv_id, output_dir, store=store)
+        extract_source(path, extract_to)
+        return path
+
+    if archive_path != output_path:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        try:
+            os.link(archive_path, output_path)
+        except OSError:
+            shutil.copy2(archive_path, output_path)
+
+    logger.info(f"Downloaded to {output_path} and extracted to {extract_to}")
+    return output_path
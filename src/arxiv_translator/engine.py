@@ -0,0 +1,342 @@
+import asyncio
+import functools
+import os
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Set
+from .density import select_sections
+from .incremental import TranslationManifest, translate_incrementally
+from .memory import TranslationMemory, translate_with_memory
+from .metrics import metrics_context, track_fallbacks
+from .postprocess import postprocess
+from .scheduler import DEFAULT_MAX_UNIT_FRACTION, plan_translation
+from .taskgraph import TaskGraph
+from .segmenter import estimate_tokens
+from .logging_utils import logger, log_ipc
+
+if TYPE_CHECKING:
+    # Only for annotations: importing the Gemini SDK costs most of the CLI's startup time
+    from .translator import GeminiTranslator
+    from .deepdive import DeepDiveAnalyzer
+
+# Number of files translated concurrently. Requests are network-bound,
+# so this can be raised well above the CPU count (limited by API quota).
+DEFAULT_CONCURRENCY = 12
+
+def strip_latex_comments(content: str) -> str:
+    """
+    Removes lines that are strictly LaTeX comments (starting with %).
+    Retains structure but reduces token count.
+    """
+    lines = content.splitlines()
+    # Keep lines that do NOT start with % (ignoring leading whitespace)
+    # We do not remove inline comments (e.g. "x = 1 % comment") to avoid breaking code with \%
+    cleaned_lines = [line for line in lines if not line.strip().startswith('%')]
+    return '\n'.join(cleaned_lines)
+
+def postprocess_translation(translated: str, file_path: str, main_tex_path: str) -> str:
+    """Applies the LaTeX fix-ups needed to compile a translated file with ctex (see postprocess.py)."""
+    is_main = os.path.abspath(file_path) == os.path.abspath(main_tex_path)
+    return postprocess(translated, is_main=is_main, file_name=os.path.basename(file_path))
+
+def read_text(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def write_text(path: str, text: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def read_source(file_path: str) -> str:
+    """Reads a .tex file for translation, without its comment lines (to save tokens)."""
+    return strip_latex_comments(read_text(file_path))
+
+def write_translation(translated: str, file_path: str, main_tex_path: str):
+    """Post-processes a raw translation (see postprocess_translation) and writes it to `file_path`."""
+    write_text(file_path, postprocess_translation(translated, file_path, main_tex_path))
+
+class StreamingFileWriter:
+    """
+    Sink for GeminiTranslator.translate_latex_stream: appends translated text
+    to `<file>.partial` as it arrives and reports progress through `on_progress`
+    roughly every 10% of the expected output size.
+    """
+
+    def __init__(self, path: str, expected_chars: int, on_progress: Optional[Callable[[int, int], None]] = None):
+        self.path = path
+        self.expected_chars = max(1, expected_chars)
+        self.on_progress = on_progress
+        self.received = 0
+        self._next_report = self.expected_chars // 10
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, text: str):
+        self._file.write(text)
+        self._file.flush()
+        self.received += len(text)
+        if self.on_progress is not None and self.received >= self._next_report:
+            self.on_progress(self.received, self.expected_chars)
+            self._next_report = self.received + self.expected_chars // 10
+
+    def reset(self, text: str):
+        """Replaces everything written so far with `text` (after a broken stream)."""
+        self._file.seek(0)
+        self._file.truncate()
+        self.received = 0
+        # Report the rewound position right away
+        self._next_report = 0
+        self.write(text)
+
+    def close(self, remove: bool = True):
+        self._file.close()
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
+
+async def translate_file(translator: "GeminiTranslator", file_path: str, main_tex_path: str,
+                         source_root: Optional[str] = None,
+                         manifest: Optional[TranslationManifest] = None,
+                         previous: Optional[TranslationManifest] = None,
+                         stream: bool = False,
+                         on_progress: Optional[Callable[[int, int], None]] = None,
+                         split_tokens: Optional[int] = None,
+                         memory: Optional[TranslationMemory] = None):
+    """
+    Translates one .tex file in place.
+
+    If `previous` (the manifest of an earlier version of the paper) has this
+    file, only the segments that changed are sent to Gemini. The source and raw
+    translation are recorded in `manifest` for the next version, unless some
+    request failed and left its part of the file in English.
+
+    With `stream`, the response is streamed into `<file>.partial` while it is
+    generated and `on_progress(received_chars, expected_chars)` is called as it grows.
+
+    With `split_tokens`, the file is translated as concurrent chunks of about
+    that many tokens (used by translate_files for files that would dominate
+    the makespan).
+
+    With `memory`, segments seen in other papers (or near-duplicates of them)
+    reuse or edit their earlier translation, and the new segment pairs are
+    added to it.
+    """
+    # File I/O and the regex passes run in a worker thread, so a large file
+    # does not stall the other requests in flight on the event loop
+    content = await asyncio.to_thread(read_source, file_path)
+
+    rel_path = os.path.relpath(file_path, source_root) if source_root else os.path.basename(file_path)
+    earlier = previous.get(rel_path) if previous else None
+
+    with metrics_context(stage="translate", file=rel_path), track_fallbacks() as fallbacks:
+        translated = None
+        if earlier is not None:
+            if earlier["source"] == content:
+                logger.info(f"{rel_path} unchanged since previous version, reusing translation.")
+                translated = earlier["translation"]
+            else:
+                translated = await translate_incrementally(
+                    translator, earlier["source"], earlier["translation"], content
+                )
+                if translated is None:
+                    logger.info(f"Previous translation of {rel_path} does not align with its source, translating in full.")
+        if translated is None and memory is not None:
+            translated = await translate_with_memory(translator, memory, content, split_tokens=split_tokens)
+        if translated is None and stream:
+            writer = StreamingFileWriter(file_path + ".partial", len(content), on_progress)
+            try:
+                translated = await translator.translate_latex_stream(content, sink=writer)
+            finally:
+                writer.close()
+        if translated is None and split_tokens:
+            translated = await translator.translate_latex_chunked(content, split_tokens)
+        if translated is None:
+            translated = await translator.translate_latex_async(content)
+
+    # Requests that failed left (part of) the English in place; never hand
+    # that to the next version or to other papers as a translation.
+    if fallbacks:
+        logger.warning(f"{len(fallbacks)} request(s) for {rel_path} fell back to the source; "
+                       "not recording its translation for reuse.")
+    elif translated != content:
+        if manifest is not None:
+            manifest.record(rel_path, content, translated)
+        if memory is not None:
+            await asyncio.to_thread(memory.record, content, translated)
+
+    await asyncio.to_thread(write_translation, translated, file_path, main_tex_path)
+
+async def translate_files(translator: "GeminiTranslator", files: List[str], main_tex_path: str,
+                          concurrency: int = DEFAULT_CONCURRENCY,
+                          source_root: Optional[str] = None,
+                          manifest: Optional[TranslationManifest] = None,
+                          previous: Optional[TranslationManifest] = None,
+                          stream: bool = False,
+                          max_unit_fraction: float = DEFAULT_MAX_UNIT_FRACTION,
+                          memory: Optional[TranslationMemory] = None) -> Dict[str, bool]:
+    """
+    Translates `files` concurrently on a single event loop, with at most
+    `concurrency` files in flight. Emits a PROGRESS:TRANSLATING event per file
+    (and per ~10% of each streamed file with `stream`).
+    See translate_file for `manifest`, `previous`, `stream` and `memory`.
+
+    Files are started largest first (by estimated tokens), and files above
+    `max_unit_fraction` of the paper's tokens are split into concurrent chunks
+    (see scheduler.py), so a big file submitted last does not hold up the paper.
+
+    Returns:
+        Dict[str, bool]: Success flag per file path.
+    """
+    return await process_files(translator, None, files, main_tex_path, concurrency=concurrency,
+                               source_root=source_root, manifest=manifest, previous=previous, stream=stream,
+                               max_unit_fraction=max_unit_fraction, memory=memory)
+
+async def process_files(translator: "GeminiTranslator", analyzer: Optional["DeepDiveAnalyzer"], files: List[str],
+                        main_tex_path: str,
+                        concurrency: int = DEFAULT_CONCURRENCY,
+                        source_root: Optional[str] = None,
+                        manifest: Optional[TranslationManifest] = None,
+                        previous: Optional[TranslationManifest] = None,
+                        stream: bool = False,
+                        max_unit_fraction: float = DEFAULT_MAX_UNIT_FRACTION,
+                        memory: Optional[TranslationMemory] = None,
+                        deepdive_budget: Optional[int] = None,
+                        main_ready: Optional[Callable[[str], Awaitable[Any]]] = None) -> Dict[str, bool]:
+    """
+    Translates `files` (see translate_files) and, with `analyzer`, runs
+    DeepDive on them, as one task graph: a file's analysis starts as soon as
+    that file is translated, while the others are still being translated.
+    Both stages have their own `concurrency` limit.
+
+    With `deepdive_budget`, the sections to analyze are chosen across the whole
+    paper (see select_deepdive_sections), so analysis waits for every
+    translation; otherwise each file is scored on its own.
+
+    `main_ready(main_tex_path)` runs once the main file is translated (and
+    before its own analysis), e.g. compile preflight checks.
+
+    Returns:
+        Dict[str, bool]: Translation success flag per file path.
+    """
+    translate_slots = asyncio.Semaphore(max(1, concurrency))
+    analyze_slots = asyncio.Semaphore(max(1, concurrency))
+    total_files = len(files)
+    plan = plan_translation(files, concurrency, chunk_tokens=translator.chunk_tokens,
+                            chunk_concurrency=translator.chunk_concurrency, max_unit_fraction=max_unit_fraction)
+    started = time.perf_counter()
+
+    results = {}
+    selected: Dict[str, Set[int]] = {}
+    progress = {"translated": 0, "analyzed": 0}
+
+    def progress_reporter(file_name):
+        def report(received, expected):
+            percent = min(99, received * 100 // expected)
+            log_ipc(f"PROGRESS:TRANSLATING:{progress['translated']}:{total_files}:Streaming {file_name} ({received} chars, ~{percent}%)")
+        return report
+
+    async def translate(file_path):
+        file_name = os.path.basename(file_path)
+        async with translate_slots:
+            try:
+                await translate_file(translator, file_path, main_tex_path, source_root, manifest, previous,
+                                     stream=stream, on_progress=progress_reporter(file_name),
+                                     split_tokens=plan.split_tokens if file_path in plan.split else None,
+                                     memory=memory)
+                results[file_path] = True
+            except Exception as e:
+                results[file_path] = False
+                logger.error(f"Generated an exception for {file_name}: {e}", exc_info=e)
+        progress["translated"] += 1
+        status = "Translated" if results[file_path] else "Failed"
+        log_ipc(f"PROGRESS:TRANSLATING:{progress['translated']}:{total_files}:{status} {file_name}")
+        if progress["translated"] == total_files:
+            logger.info(f"Translated {total_files} files in {time.perf_counter() - started:.1f}s "
+                        f"(predicted ~{plan.predicted_makespan:.0f}s).")
+
+    async def select():
+        # Reads and segments every translated file; keep that off the event loop
+        selected.update(await asyncio.to_thread(
+            select_deepdive_sections, analyzer, [f for f in files if results.get(f)], deepdive_budget
+        ))
+
+    async def analyze(file_path):
+        file_name = os.path.basename(file_path)
+        changed = False
+        if results.get(file_path):
+            async with analyze_slots:
+                try:
+                    changed = await analyze_file(analyzer, file_path,
+                                                 selected.get(file_path, set()) if deepdive_budget is not None else None)
+                except Exception as e:
+                    logger.error(f"Analysis failed for {file_name}: {e}", exc_info=e)
+        progress["analyzed"] += 1
+        log_ipc(f"PROGRESS:ANALYZING:{progress['analyzed']}:{total_files}:{'Analyzed' if changed else 'Skipped'} {file_name}")
+
+    graph = TaskGraph()
+    # Jobs start in the order they are added and the semaphore admits waiters
+    # FIFO, so files are picked up in plan order
+    for file_path in plan.order:
+        graph.add(("translate", file_path), functools.partial(translate, file_path))
+    main_deps = []
+    if main_ready is not None:
+        main_deps = [("translate", main_tex_path)] if main_tex_path in plan.order else []
+        graph.add("main_ready", functools.partial(main_ready, main_tex_path), main_deps)
+    if analyzer is not None:
+        if deepdive_budget is not None:
+            graph.add("select", select, [("translate", f) for f in plan.order])
+        for file_path in plan.order:
+            deps = [("translate", file_path)]
+            if deepdive_budget is not None:
+                deps.append("select")
+            if main_ready is not None and file_path == main_tex_path:
+                deps.append("main_ready")
+            graph.add(("analyze", file_path), functools.partial(analyze, file_path), deps)
+
+    _, errors = await graph.run()
+    for name, exc in errors.items():
+        logger.error(f"{name} failed: {exc}", exc_info=exc)
+    return results
+
+async def analyze_file(analyzer: "DeepDiveAnalyzer", file_path: str, selected: Optional[Set[int]] = None) -> bool:
+    """
+    Runs DeepDive on one translated file in place (only on the `selected`
+    sections, if given). Returns True if it changed.
+    """
+    file_name = os.path.basename(file_path)
+    content = await asyncio.to_thread(read_text, file_path)
+
+    with metrics_context(stage="deepdive", file=file_name):
+        analyzed = await analyzer.analyze_latex_async(content, file_name, selected)
+
+    if analyzed != content:
+        await asyncio.to_thread(write_text, file_path, analyzed)
+        return True
+    return False
+
+def select_deepdive_sections(analyzer: "DeepDiveAnalyzer", files: List[str],
+                             budget_tokens: Optional[int] = None) -> Dict[str, Set[int]]:
+    """
+    Scores every section of the paper's files for technical density and picks
+    the ones DeepDive analyzes, densest first within `budget_tokens` (see
+    density.py). Returns the selected section numbers per file.
+    """
+    sections = {}
+    for file_path in files:
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                content = f.read()
+        except OSError:
+            continue
+        for number, text in analyzer.plan(content, os.path.basename(file_path)).items():
+            sections[(file_path, number)] = text
+
+    selected, scored = select_sections(sections, analyzer.min_score, budget_tokens)
+    tokens = sum(estimate_tokens(sections[key]) for key in selected)
+    logger.info(f"DeepDive: analyzing {len(selected)} of {len(sections)} sections (~{tokens} tokens"
+                + (f", budget {budget_tokens})" if budget_tokens is not None else ")"))
+    for (file_path, number), score in scored[:10]:
+        logger.debug(f"DeepDive score {score:.1f}: {os.path.basename(file_path)} section {number + 1}"
+                     + ("" if (file_path, number) in selected else " (skipped)"))
+
+    by_file = {file_path: set() for file_path in files}
+    for file_path, number in selected:
+        by_file[file_path].add(number)
+    return by_file
@@ -1,8 +1,55 @@
+import gzip
+import io
 import tarfile
 import os
 import shutil
+from typing import BinaryIO
 from .logging_utils import logger
 
+GZIP_MAGIC = b"\x1f\x8b"
+# Name used for single-file e-prints (a gzipped .tex without a tarball)
+SINGLE_FILE_NAME = "main.tex"
+
+def _is_tar_header(block: bytes) -> bool:
+    # POSIX/GNU tar headers carry "ustar" at offset 257
+    return len(block) >= 262 and block[257:262] == b"ustar"
+
+class _PrefixedStream(io.RawIOBase):
+    """Replays already-read `prefix` bytes before the rest of `stream`."""
+
+    def __init__(self, prefix: bytes, stream: BinaryIO):
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._prefix:
+            n = min(len(buffer), len(self._prefix))
+            buffer[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+def _peek(stream: BinaryIO, size: int):
+    """Reads up to `size` bytes without losing them: returns (head, equivalent_stream)."""
+    head = b""
+    while len(head) < size:
+        data = stream.read(size - len(head))
+        if not data:
+            break
+        head += data
+    return head, io.BufferedReader(_PrefixedStream(head, stream), buffer_size=64 * 1024)
+
+def _write_single_file(stream: BinaryIO, extract_to: str):
+    target = os.path.join(extract_to, SINGLE_FILE_NAME)
+    with open(target, "wb") as f:
+        shutil.copyfileobj(stream, f)
+    logger.info(f"Single-file e-print extracted as {target}")
+
 def extract_source(file_path: str, extract_to: str):
     """
     Extracts the downloaded arXiv source file.
@@ -22,15 +69,45 @@ def extract_source(file_path: str, extract_to: str):
                 # Security check: avoid zip slip, though low risk from arxiv
                 tar.extractall(path=extract_to, filter='data')
         else:
-            # Sometimes single file or pdf? But e-print should be source.
-            # If it's a gzip file but not tar?
-            raise ValueError(f"File {file_path} is not a valid tar archive.")
+            # Not a tarball: old or single-file papers are a gzipped .tex
+            with open(file_path, "rb") as f:
+                extract_stream(f, extract_to)
     except Exception as e:
         logger.error(f"Extraction failed: {e}")
-        # Identify if it's just a .tex file (rare but possible for old papers)
-        # TODO: Handle single .tex file case if needed.
         raise e
 
+def extract_stream(stream: BinaryIO, extract_to: str):
+    """
+    Extracts an e-print from a non-seekable byte stream (e.g. an HTTP response
+    body) in a single pass, without writing the archive to disk first.
+
+    Handles gzipped tarballs, plain tarballs and single gzipped .tex files,
+    with the same filter='data' safety as extract_source.
+    """
+    os.makedirs(extract_to, exist_ok=True)
+
+    head, content = _peek(stream, 512)
+    if head[:2] == GZIP_MAGIC:
+        head, content = _peek(gzip.GzipFile(fileobj=content, mode="rb"), 512)
+
+    if _is_tar_header(head):
+        # 'r|' reads members sequentially and never seeks
+        with tarfile.open(fileobj=content, mode="r|") as tar:
+            tar.extractall(path=extract_to, filter='data')
+    elif not head.startswith(b"%PDF") and b"\x00" not in head:
+        # Text that is not a tarball: a single-file LaTeX e-print
+        _write_single_file(content, extract_to)
+    else:
+        raise ValueError("E-print is neither a tar archive nor a LaTeX file (PDF-only submission?).")
+
+def _has_documentclass(path: str) -> bool:
+    """Reads `path` line by line until a (non-comment) \\documentclass shows up."""
+    with open(path, 'r', encoding='utf-8', errors='ignore') as content:
+        for line in content:
+            if '\\documentclass' in line and not line.lstrip().startswith('%'):
+                return True
+    return False
+
 def find_main_tex(source_dir: str) -> str:
     r"""
     Attempts to identify the main .tex file in the directory.
@@ -45,13 +122,7 @@ def find_main_tex(source_dir: str) -> str:
         return os.path.join(source_dir, tex_files[0])
         
     # Heuristics
-    candidates = []
-    for f in tex_files:
-        path = os.path.join(source_dir, f)
-        with open(path, 'r', encoding='utf-8', errors='ignore') as content:
-            text = content.read()
-            if '\\documentclass' in text:
-                candidates.append(f)
+    candidates = [f for f in tex_files if _has_documentclass(os.path.join(source_dir, f))]
                 
     if len(candidates) == 1:
         return os.path.join(source_dir, candidates[0])
@@ -0,0 +1,73 @@
+import contextvars
+import re
+from typing import Dict, List
+from .logging_utils import logger
+
+# Glossary of the paper being processed, appended to the system instruction of
+# every request made in its task (set per paper, like the IPC tag)
+current_glossary = contextvars.ContextVar("paper_glossary", default="")
+
+MAX_GLOSSARY_TERMS = 200
+
+# "Large Language Models (LLMs)", "mixture-of-experts (MoE)"
+DEFINITION_PATTERN = re.compile(r'([^.;:,()\[\]$]{3,120})\s*\(\s*([A-Z][A-Za-z0-9-]*[A-Z][A-Za-z0-9-]*)\s*\)')
+WORD_PATTERN = re.compile(r'[A-Za-z][A-Za-z-]*')
+COMMENT_PATTERN = re.compile(r'(?<!\\)%.*')
+
+
+def _expansion(text: str, acronym: str) -> str:
+    """The words before the parenthesis that the acronym stands for, or '' if unclear."""
+    letters = [c for c in acronym.rstrip('s') if c.isupper()]
+    words = WORD_PATTERN.findall(text)
+    if not letters or not words:
+        return ""
+    # Try a window of about one word per capital letter, ending right before "("
+    for size in sorted(range(max(1, len(letters) - 1), len(letters) + 3), key=lambda n: abs(n - len(letters))):
+        if size > len(words):
+            continue
+        candidate = words[-size:]
+        initials = ''.join(part[0] for word in candidate for part in word.split('-') if part).upper()
+        if candidate[0][0].upper() == letters[0] and all(letter in initials for letter in letters):
+            return ' '.join(candidate)
+    return ""
+
+
+def extract_glossary(texts: List[str]) -> Dict[str, str]:
+    """
+    Collects the acronyms a paper defines ("Large Language Models (LLMs)"),
+    mapping each acronym to its first expansion.
+    """
+    terms: Dict[str, str] = {}
+    for text in texts:
+        text = COMMENT_PATTERN.sub('', text)
+        for match in DEFINITION_PATTERN.finditer(text):
+            acronym = match.group(2)
+            if acronym in terms or len(terms) >= MAX_GLOSSARY_TERMS:
+                continue
+            expansion = _expansion(match.group(1), acronym)
+            if expansion:
+                terms[acronym] = expansion
+    return terms
+
+
+def format_glossary(terms: Dict[str, str]) -> str:
+    if not terms:
+        return ""
+    lines = [f"- {acronym}: {expansion}" for acronym, expansion in sorted(terms.items())]
+    return ("\nPAPER GLOSSARY (terms defined in this paper): keep the acronyms in English "
+            "and translate each term the same way everywhere.\n" + "\n".join(lines) + "\n")
+
+
+def build_glossary(files: List[str]) -> str:
+    """Reads the paper's .tex files and returns the glossary text ('' if none)."""
+    texts = []
+    for path in files:
+        try:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                texts.append(f.read())
+        except OSError:
+            continue
+    terms = extract_glossary(texts)
+    if terms:
+        logger.info(f"Glossary: {len(terms)} terms defined in the paper.")
+    return format_glossary(terms)
@@ -0,0 +1,124 @@
+import asyncio
+import difflib
+import glob
+import json
+import os
+import re
+from typing import Dict, Optional, Tuple
+from .segmenter import markup_signature, split_segments
+from .logging_utils import logger
+
+MANIFEST_NAME = "translation_manifest.json"
+
+VERSION_PATTERN = re.compile(r'^(.*?)(?:v(\d+))?$')
+
+def split_version(arxiv_id: str) -> Tuple[str, Optional[int]]:
+    """'2602.04705v2' -> ('2602.04705', 2); '2602.04705' -> ('2602.04705', None)."""
+    match = VERSION_PATTERN.match(arxiv_id)
+    base, version = match.group(1), match.group(2)
+    return base, int(version) if version else None
+
+
+class TranslationManifest:
+    """
+    Per-workspace record of what was sent to Gemini and what came back, per
+    file: the comment-stripped English source and the raw translation (before
+    post-processing and DeepDive). A later version of the same paper diffs
+    against it to re-translate only what changed.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Dict[str, str]]] = None):
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls, path: str) -> "TranslationManifest":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f).get("files", {}))
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def record(self, rel_path: str, source: str, translation: str):
+        self.entries[rel_path] = {"source": source, "translation": translation}
+
+    def get(self, rel_path: str) -> Optional[Dict[str, str]]:
+        return self.entries.get(rel_path)
+
+
+def find_previous_manifest(arxiv_id: str, root: str = ".") -> Optional[str]:
+    """
+    Looks for a translated workspace of another version of the same paper
+    (workspace_<base>[vN]) and returns the path of its manifest. Prefers the
+    newest version older than `arxiv_id`; if `arxiv_id` has no version, any
+    other version qualifies.
+    """
+    base, version = split_version(arxiv_id)
+    candidates = []
+    for work_dir in glob.glob(os.path.join(root, f"workspace_{glob.escape(base)}*")):
+        other_id = os.path.basename(work_dir)[len("workspace_"):]
+        other_base, other_version = split_version(other_id)
+        if other_base != base or other_id == arxiv_id:
+            continue
+        if version is not None and other_version is not None and other_version >= version:
+            continue
+        manifest_path = os.path.join(work_dir, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            candidates.append((other_version or 0, os.path.getmtime(manifest_path), manifest_path))
+    if not candidates:
+        return None
+    return max(candidates)[2]
+
+
+async def translate_incrementally(translator, old_source: str, old_translation: str, new_source: str) -> Optional[str]:
+    """
+    Re-translates only the segments of `new_source` that differ from
+    `old_source`, reusing `old_translation` for the rest.
+
+    Segments of the old source and its translation are aligned by position,
+    which holds as long as the model preserved the paragraph/section structure.
+    Returns None when they do not line up (different counts, or a pair whose
+    markup differs, see markup_signature), so the caller can translate in full.
+    """
+    old_segments = split_segments(old_source)
+    old_translated = split_segments(old_translation)
+    if len(old_segments) != len(old_translated):
+        return None
+    if any(markup_signature(source) != markup_signature(translated)
+           for source, translated in zip(old_segments, old_translated)):
+        return None
+
+    new_segments = split_segments(new_source)
+    matcher = difflib.SequenceMatcher(None, old_segments, new_segments, autojunk=False)
+
+    pieces = []
+    pending = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            pieces.extend(old_translated[i1:i2])
+        elif tag in ("replace", "insert"):
+            changed = '\n'.join(new_segments[j1:j2])
+            pending.append((len(pieces), changed))
+            pieces.append(None)
+        # "delete": the segments are gone in the new version
+
+    # Requests of one file in flight at once, as for chunked files
+    semaphore = asyncio.Semaphore(max(1, translator.chunk_concurrency))
+
+    async def translate(changed):
+        async with semaphore:
+            translated = await translator.translate_latex_async(changed)
+        # Keep the blank line that separates the block from what follows
+        trailing = changed[len(changed.rstrip('\n')):]
+        return translated.rstrip('\n') + trailing
+
+    results = await asyncio.gather(*(translate(changed) for _, changed in pending))
+    for (index, _), translated in zip(pending, results):
+        pieces[index] = translated
+
+    reused = sum(i2 - i1 for tag, i1, i2, _, _ in matcher.get_opcodes() if tag == "equal")
+    logger.info(f"Incremental translation: reused {reused}/{len(new_segments)} segments, "
+                f"re-translated {len(pending)} changed block(s).")
+    return '\n'.join(pieces)
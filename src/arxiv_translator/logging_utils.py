@@ -1,3 +1,4 @@
+import contextvars
 import logging
 import logging.handlers
 import os
@@ -5,16 +6,29 @@ import sys
 
 # Define log directory from environment or default to local logs
 LOG_DIR = os.getenv("ARXIV_TRANSLATOR_LOG_DIR", os.path.join(os.getcwd(), "logs"))
-if not os.path.exists(LOG_DIR):
-    try:
-        os.makedirs(LOG_DIR)
-    except OSError:
-        # Fallback to tmp if permission denied or other issue
-        LOG_DIR = "/tmp/arxiv_translator_logs"
-        os.makedirs(LOG_DIR, exist_ok=True)
+FALLBACK_LOG_DIR = "/tmp/arxiv_translator_logs"
 
 LOG_FILE = os.path.join(LOG_DIR, "translator.log")
 
+class LazyRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotating file handler that creates the log directory and opens the file
+    on the first record instead of at import, so commands that log nothing
+    (--help) touch no files.
+    """
+
+    def __init__(self, filename: str, **kwargs):
+        super().__init__(filename, delay=True, **kwargs)
+
+    def _open(self):
+        try:
+            os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        except OSError:
+            # Fallback to tmp if permission denied or other issue
+            os.makedirs(FALLBACK_LOG_DIR, exist_ok=True)
+            self.baseFilename = os.path.join(FALLBACK_LOG_DIR, os.path.basename(self.baseFilename))
+        return super()._open()
+
 def setup_logger(name: str) -> logging.Logger:
     """
     Sets up a logger with a rotating file handler and a console handler.
@@ -34,7 +48,7 @@ def setup_logger(name: str) -> logging.Logger:
 
     # 1. Rotating File Handler (10MB per file, keep last 5)
     try:
-        file_handler = logging.handlers.RotatingFileHandler(
+        file_handler = LazyRotatingFileHandler(
             LOG_FILE, maxBytes=10*1024*1024, backupCount=5, encoding="utf-8"
         )
         file_handler.setFormatter(formatter)
@@ -55,10 +69,21 @@ def setup_logger(name: str) -> logging.Logger:
 # Create a default logger
 logger = setup_logger("arxiv_translator")
 
+# Set per paper in batch mode; IPC messages are then prefixed with "[<tag>] "
+ipc_tag = contextvars.ContextVar("ipc_tag", default=None)
+# Set per job in serve mode; receives every (untagged) IPC message of the job
+ipc_sink = contextvars.ContextVar("ipc_sink", default=None)
+
 def log_ipc(message: str):
     """
     Logs an IPC message to STDOUT.
     This is used for communicating progress to the calling process (Backend).
     """
+    sink = ipc_sink.get()
+    if sink is not None:
+        sink(message)
+    tag = ipc_tag.get()
+    if tag:
+        message = f"[{tag}] {message}"
     print(message, flush=True)
 
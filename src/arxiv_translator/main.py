@@ -1,14 +1,26 @@
 import argparse
+import asyncio
+import contextlib
 import os
 import shutil
 import sys
-from .downloader import download_source
 from .extractor import extract_source, find_main_tex
-from .translator import GeminiTranslator
-from .compiler import compile_pdf
+from .depgraph import GRAPH_FILE, load_dependency_graph
+from .cache import DEFAULT_HOT_ENTRIES, TranslationCache
+from .context_cache import DEFAULT_TTL_SECONDS, ContextCache
+from .glossary import build_glossary, current_glossary
+from .memory import DEFAULT_EDIT_THRESHOLD, TranslationMemory
+from .segmenter import DEFAULT_CHUNK_CONCURRENCY, DEFAULT_CHUNK_TOKENS
+from .engine import DEFAULT_CONCURRENCY, process_files
+from .ratelimit import configure_rate_limits
+from .metrics import configure_metrics, get_metrics
+from .incremental import MANIFEST_NAME, TranslationManifest, find_previous_manifest
+from .compiler import compile_pdf, compile_preflight, warm_tectonic_cache
+from .triage import DEFAULT_REPAIR_ROUNDS, SegmentRepairer, read_compile_errors
+from .workspace import clone_tree, detach_build_outputs
 from .config import ConfigManager
-from .deepdive import DeepDiveAnalyzer
-from .logging_utils import logger, log_ipc
+from .density import DEFAULT_MIN_SCORE
+from .logging_utils import logger, log_ipc, ipc_tag
 
 try:
     from dotenv import load_dotenv
@@ -16,143 +28,375 @@ try:
 except ImportError:
     pass
 
-def strip_latex_comments(content: str) -> str:
+# Papers allowed in each stage at once in batch mode
+DEFAULT_DOWNLOAD_WORKERS = 4
+DEFAULT_TRANSLATE_WORKERS = 4
+DEFAULT_COMPILE_WORKERS = 2
+# Serve mode: listening address and papers admitted at once
+DEFAULT_SERVE_HOST = "127.0.0.1"
+DEFAULT_SERVE_PORT = 8765
+DEFAULT_MAX_JOBS = 8
+
+def parse_arxiv_id(arxiv_url: str) -> str:
+    # Extract ID
+    # heuristics: 2602.04705 or https://arxiv.org/abs/2602.04705 or https://arxiv.org/pdf/2602.04705
+    return arxiv_url.strip().rstrip("/").split("/")[-1].replace(".pdf", "")
+
+def resolve_model_name(model: str) -> str:
+    # Handle model aliases
+    if model.lower() == "flash":
+        return "gemini-3-flash-preview"
+    if model.lower() == "pro":
+        return "gemini-3-pro-preview"
+    return model
+
+def output_pdf_path(arxiv_id: str, model_name: str, output=None, batch: bool = False) -> str:
+    """Returns where the final PDF goes. In batch mode `output` is a directory."""
+    if output and not batch:
+        return output
+
+    # Suffix handling
+    suffix = "_zh"
+    if "pro" in model_name.lower():
+        suffix = "_zh_pro"
+    elif "flash" in model_name.lower():
+        suffix = "_zh_flash"
+    final_pdf = f"{arxiv_id}{suffix}.pdf"
+    if output:
+        os.makedirs(output, exist_ok=True)
+        final_pdf = os.path.join(output, final_pdf)
+    return final_pdf
+
+def read_batch_ids(batch_file: str) -> list:
+    """Reads one arXiv URL/ID per line from a file (or stdin for '-'), skipping blanks and # comments."""
+    if batch_file == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(batch_file, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    ids = []
+    for line in lines:
+        line = line.split("#", 1)[0].strip()
+        if line:
+            ids.append(parse_arxiv_id(line))
+    # Keep order, drop duplicates
+    return list(dict.fromkeys(ids))
+
+def fetch_source(arxiv_id: str, work_dir: str, store=None, stream_extract: bool = False) -> str:
     """
-    Removes lines that are strictly LaTeX comments (starting with %).
-    Retains structure but reduces token count.
+    Downloads and extracts the e-print. Returns the extracted source directory.
+
+    With `stream_extract`, a fresh download is extracted while it is being
+    received instead of being read back from disk afterwards.
     """
-    lines = content.splitlines()
-    # Keep lines that do NOT start with % (ignoring leading whitespace)
-    # We do not remove inline comments (e.g. "x = 1 % comment") to avoid breaking code with \%
-    cleaned_lines = [line for line in lines if not line.strip().startswith('%')]
-    return '\n'.join(cleaned_lines)
+    # Imported here: requests is only needed once a paper is actually fetched
+    from .downloader import download_and_extract_source, download_source
 
-def deepdive_analysis_worker(api_key, file_path, model_name="gemini-3-flash-preview"):
-    try:
-        analyzer = DeepDiveAnalyzer(api_key, model_name=model_name)
-        file_name = os.path.basename(file_path)
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        
-        analyzed = analyzer.analyze_latex(content, file_name)
-        
-        if analyzed != content:
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(analyzed)
-            return True, file_name
-        return False, file_name
-    except Exception as e:
-        logger.error(f"DeepDive worker failed for {os.path.basename(file_path)}: {e}", exc_info=True)
-        return False, os.path.basename(file_path)
+    tar_path = os.path.join(work_dir, f"{arxiv_id}.tar.gz")
+    source_dir = os.path.join(work_dir, "source")
+    if stream_extract and not os.path.exists(tar_path) and not os.path.exists(source_dir):
+        log_ipc(f"PROGRESS:DOWNLOADING:Downloading source for {arxiv_id}...")
+        log_ipc(f"PROGRESS:EXTRACTING:Extracting source files while downloading...")
+        download_and_extract_source(arxiv_id, work_dir, source_dir, store=store)
+        return source_dir
+
+    # 1. Download source
+    log_ipc(f"PROGRESS:DOWNLOADING:Downloading source for {arxiv_id}...")
+    if not os.path.exists(tar_path):
+         tar_path = download_source(arxiv_id, work_dir, store=store)
+         logger.info(f"Downloaded source to {tar_path}")
+    else:
+         logger.info("Using existing source archive.")
+
+    # 2. Extract
+    log_ipc(f"PROGRESS:EXTRACTING:Extracting source files...")
+    if not os.path.exists(source_dir):
+        extract_source(tar_path, source_dir)
+    return source_dir
+
+def prepare_translation_tree(work_dir: str, source_dir: str, all_files: bool = False):
+    """
+    Creates source_zh as a fresh clone of source and collects the files to translate.
+    Only files the pipeline rewrites are copied; figures and other assets are
+    hardlinked (see workspace.clone_tree).
+
+    Only .tex files reachable from the main file through \\input/\\include/
+    \\subfile are translated, unless `all_files` is set or the includes
+    cannot be fully resolved.
+
+    Returns:
+        tuple: (source_zh_dir, main_tex, tex_files)
+    """
+    # Clone source to source_zh (always fresh for translation)
+    source_zh_dir = os.path.join(work_dir, "source_zh")
+    clone_tree(source_dir, source_zh_dir)
+
+    main_tex = find_main_tex(source_zh_dir)
+    logger.info(f"Main TeX file found: {main_tex}")
+
+    # Tectonic writes <main>.pdf, .aux, ...; never let it write through a link into source/
+    detach_build_outputs(main_tex)
+
+    # Pre-count and collect files
+    tex_files = []
+    for root, dirs, files in os.walk(source_zh_dir):
+        for file in files:
+            if file == "math_commands.tex":
+                continue
+            if file.endswith(".tex"):
+                 tex_files.append(os.path.join(root, file))
+
+    if not all_files:
+        graph = load_dependency_graph(source_zh_dir, main_tex, os.path.join(work_dir, GRAPH_FILE))
+        if graph.is_complete:
+            reachable = graph.reachable()
+            used = [f for f in tex_files
+                    if os.path.relpath(f, source_zh_dir).replace(os.sep, '/') in reachable]
+            if len(used) < len(tex_files):
+                logger.info(f"Skipping {len(tex_files) - len(used)} TeX file(s) not included from the main file.")
+            tex_files = used
+        else:
+            logger.info("Some \\input targets are built from macros; translating every TeX file.")
+
+    logger.info(f"Found {len(tex_files)} TeX files to translate.")
+    return source_zh_dir, main_tex, tex_files
 
-def translate_file_worker(api_key, model_name, file_path, main_tex_path):
-    import re
+def load_previous_manifest(arxiv_id: str):
+    """Returns the translation manifest of an earlier version of this paper, if one was translated here."""
+    manifest_path = find_previous_manifest(arxiv_id)
+    if manifest_path is None:
+        return None
     try:
-        file_name = os.path.basename(file_path)
-        # Re-instantiate translator in worker process
-        translator = GeminiTranslator(api_key=api_key, model_name=model_name)
-        
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-            
-        # Pre-processing: Strip LaTeX comments to save tokens
-        content = strip_latex_comments(content)
-            
-        translated = translator.translate_latex(content)
-        
-        # Inject ctex if main file
-        if os.path.abspath(file_path) == os.path.abspath(main_tex_path):
-            logger.debug(f"Worker interacting with main file: {file_name}")
-            import re
-            translated = re.sub(r'\\usepackage\{CJK.*\}', '', translated)
-            translated = re.sub(r'\\usepackage\{xeCJK\}', '', translated)
-            
-            if "\\documentclass" in translated and "ctex" not in translated:
-                preamble = "\n\\usepackage[fontset=fandol]{ctex}\n\\usepackage{xspace}\n"
-                
-                if "\\begin{document}" in translated:
-                    translated = translated.replace("\\begin{document}", preamble + "\\begin{document}")
-
-            # Remove CJK* environment tags (Tectonic/ctex handles this natively)
-            # Pattern: \begin{CJK*}{UTF8}{gbsn} ... \end{CJK*}
-            translated = re.sub(r'\\begin\{CJK\*\}\{.*?\}\{.*?\}', '', translated)
-            translated = re.sub(r'\\end\{CJK\*\}', '', translated)
-
-        # Conflict Resolution: \chinese command (e.g. from 2602.02276)
-        # Apply GLOBALLY to all files to handle usage in files that don't define it
-        # Scan for usage of \chinese
-        if r"\chinese" in translated:
-            logger.debug(f"Renaming potential \\chinese conflict in {file_name}...")
-            import re
-            # Use regex to avoid replacing \chinesefont etc.
-            translated = re.sub(r'\\chinese(?![a-zA-Z])', r'\\mychinese', translated)
-            
-            # If we renamed the definition, simplify it
-            if r"\newcommand{\mychinese}" in translated or r"\def\mychinese" in translated:
-                 # Redefine to pass-through (removing CJK* dependency)
-                 # Pattern: \newcommand{\mychinese}[1]{\begin{CJK*}{UTF8}{gbsn}{#1}\end{CJK*}}
-                 translated = re.sub(
-                    r'\\newcommand\{\\mychinese\}\[1\]\{.*?\\end\{CJK\*\}\}', 
-                    r'\\newcommand{\\mychinese}[1]{#1}', 
-                    translated, 
-                    flags=re.DOTALL
-                 )
-
-        if "{minted}" in translated:
-             logger.debug(f"Fixing minted package options in {file_name}...")
-             import re
-             translated = re.sub(r'\\usepackage\[.*?\]\{minted\}', r'\\usepackage[outputdir=.]{minted}', translated)
-        
-        # Switch backend=biber to backend=bibtex to avoid external dependency issues
-        if "backend=biber" in translated:
-            import re # Ensure re is imported if not already
-            translated = translated.replace("backend=biber", "backend=bibtex")
-            
-        # Fix duplicate labels (common in translation)
-        # Scan for \label{...} and keep only first occurrence of each unique label
-        label_pattern = re.compile(r'\\label\{([^}]+)\}')
-        seen_labels = set()
-        
-        def replace_label(match):
-            lbl = match.group(1)
-            if lbl in seen_labels:
-                return f"% Duplicate label removed: {lbl}"
-            seen_labels.add(lbl)
-            return match.group(0)
-            
-        translated = label_pattern.sub(replace_label, translated)
-        
-        # General LaTeX Fixes for LLM artifacts
-        # Fix broken escapes like "\ }" -> "\}"
-        translated = translated.replace(r"\ }", r"\}")
-        translated = translated.replace(r"\ {", r"\{")
-        
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(translated)
-            
+        previous = TranslationManifest.load(manifest_path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read previous translation manifest {manifest_path}: {e}")
+        return None
+    logger.info(f"Incremental mode: reusing translations from {os.path.dirname(manifest_path)}")
+    return previous
+
+async def run_llm_stages(translator, analyzer, tex_files, main_tex, concurrency,
+                         source_root=None, manifest=None, previous=None, stream=False, memory=None,
+                         deepdive_budget=None):
+    from .deepdive import DEEPDIVE_PACKAGES
+
+    async def main_ready(main_tex_path):
+        # DeepDive boxes need tcolorbox; added before DeepDive touches the main file
+        packages = DEEPDIVE_PACKAGES if analyzer is not None else ()
+        await asyncio.to_thread(compile_preflight, main_tex_path, packages)
+
+    if analyzer is not None:
+        log_ipc(f"PROGRESS:ANALYZING:AI DeepDive Analysis starts as files are translated ({concurrency} concurrent)...")
+    # Translation and DeepDive as one task graph (asyncio, each bounded by --concurrency):
+    # a file is analyzed as soon as it is translated
+    await process_files(translator, analyzer, tex_files, main_tex, concurrency=concurrency,
+                        source_root=source_root, manifest=manifest, previous=previous, stream=stream,
+                        memory=memory, deepdive_budget=deepdive_budget, main_ready=main_ready)
+
+def write_metrics(metrics, arxiv_id: str, paper=None) -> str:
+    """
+    Writes the run's Gemini metrics to workspace_<id>.metrics.json, next to the
+    workspace (which may be deleted), and logs a one-line summary.
+    """
+    path = os.path.abspath(f"workspace_{arxiv_id}.metrics.json")
+    metrics.save(path, paper=paper)
+    total = metrics.summary(paper)["total"]
+    logger.info(f"Gemini usage for {arxiv_id}: {total['requests']} requests, "
+                f"{total['input_tokens']} input / {total['output_tokens']} output tokens, "
+                f"~${total['estimated_cost_usd']:.4f}, latency p50 {total['latency_p50']}s / p95 {total['latency_p95']}s "
+                f"(details in {path})")
+    return path
+
+def compile_state_dir(arxiv_id: str, model_name: str, deepdive: bool = False) -> str:
+    """
+    Directory holding the last build's fingerprint, PDF and .aux/.bbl, per
+    paper and per kind of output (model, DeepDive), so that builds of one
+    paper with different options do not overwrite each other's state.
+    """
+    name = f"{arxiv_id.replace('/', '_')}_{model_name}" + ("_deepdive" if deepdive else "")
+    return os.path.join(os.path.expanduser("~"), ".arxiv-translator", "builds", name)
+
+async def build_pdf(source_zh_dir: str, main_tex: str, final_pdf: str, state_dir=None, tectonic_cache_dir=None,
+                    repairer=None, repair_rounds: int = DEFAULT_REPAIR_ROUNDS) -> bool:
+    """
+    Compiles the translated tree and copies the PDF to `final_pdf`.
+    See compile_pdf for `state_dir` and `tectonic_cache_dir`.
+
+    With a `repairer` (triage.SegmentRepairer), the segments that Tectonic
+    reports errors in are repaired and the tree recompiled, at most
+    `repair_rounds` times.
+    """
+    # 4. Compile
+    log_ipc(f"PROGRESS:COMPILING:Compiling PDF with Tectonic...")
+    await asyncio.to_thread(compile_pdf, source_zh_dir, main_tex, state_dir, tectonic_cache_dir)
+
+    for round_number in range(repair_rounds if repairer else 0):
+        errors = read_compile_errors(source_zh_dir, main_tex)
+        if not errors:
+            break
+        logger.warning(f"Compilation reported {len(errors)} error(s): {errors[:5]}")
+        repaired = await repairer.repair(errors)
+        if not repaired:
+            break
+        log_ipc(f"PROGRESS:COMPILING:Repaired {repaired} segment(s), recompiling (round {round_number + 1}/{repair_rounds})...")
+        await asyncio.to_thread(compile_pdf, source_zh_dir, main_tex, state_dir, tectonic_cache_dir)
+
+    # Move PDF to root or custom output
+    pdf_name = os.path.basename(main_tex).replace(".tex", ".pdf")
+    compiled_pdf = os.path.join(source_zh_dir, pdf_name)
+
+    if os.path.exists(compiled_pdf):
+        shutil.copy(compiled_pdf, final_pdf)
+        logger.info(f"SUCCESS: Generated {final_pdf}")
+        log_ipc(f"PROGRESS:COMPLETED:Translation finished successfully.")
         return True
+    logger.error("ERROR: PDF was not generated.")
+    log_ipc(f"PROGRESS:FAILED:PDF compilation failed.")
+    return False
+
+async def process_paper(arxiv_id: str, args, translator, analyzer, final_pdf: str, stage_limits=None,
+                        store=None, memory=None) -> bool:
+    """
+    Runs one paper through download -> extract -> translate -> DeepDive -> compile.
+
+    Blocking stages run in worker threads. `stage_limits` maps a stage name
+    ('download', 'translate', 'compile') to a semaphore shared by all papers of
+    a batch, so the stages of different papers overlap. `store` is the shared
+    e-print mirror and `memory` the translation memory, if enabled.
+    """
+    stage_limits = stage_limits or {}
+
+    def stage(name):
+        return stage_limits.get(name) or contextlib.nullcontext()
+
+    work_dir = os.path.abspath(f"workspace_{arxiv_id}")
+
+    if os.path.exists(work_dir) and not args.keep:
+         shutil.rmtree(work_dir)
+
+    if not os.path.exists(work_dir):
+        os.makedirs(work_dir)
+
+    logger.info(f"Work directory: {work_dir}")
+
+    try:
+        async with stage("download"):
+            source_dir = await asyncio.to_thread(fetch_source, arxiv_id, work_dir, store, args.stream_extract)
+
+        async with stage("translate"):
+            # 3. Translate
+            source_zh_dir, main_tex, tex_files = await asyncio.to_thread(
+                prepare_translation_tree, work_dir, source_dir, args.all_tex
+            )
+            if args.context_cache:
+                # Sent with (or cached alongside) every system instruction of this paper's requests
+                current_glossary.set(await asyncio.to_thread(build_glossary, tex_files))
+            previous = None if args.no_incremental else load_previous_manifest(arxiv_id)
+            manifest = TranslationManifest()
+            log_ipc(f"PROGRESS:TRANSLATING:0:0:Starting translation with {translator.model_name}...")
+            # Translation and DeepDive share one event loop, client and rate limiter
+            await run_llm_stages(translator, analyzer, tex_files, main_tex, args.concurrency,
+                                 source_root=source_zh_dir, manifest=manifest, previous=previous,
+                                 stream=args.stream, memory=memory, deepdive_budget=args.deepdive_budget)
+            manifest.save(os.path.join(work_dir, MANIFEST_NAME))
+
+        async with stage("compile"):
+            state_dir = None if args.no_compile_cache else \
+                compile_state_dir(arxiv_id, translator.model_name, args.deepdive)
+            repairer = SegmentRepairer(translator, source_zh_dir, source_dir, main_tex, manifest)
+            ok = await build_pdf(source_zh_dir, main_tex, final_pdf, state_dir, args.tectonic_cache,
+                                 repairer=repairer, repair_rounds=args.repair_rounds)
+            if repairer.attempts:
+                manifest.save(os.path.join(work_dir, MANIFEST_NAME))
+            return ok
     except Exception as e:
-        # Worker failure logged by executor usually, but good to be explicit
-        logger.error(f"Worker failed for {file_path}: {e}")
-        raise e
+        logger.error(f"Translation FAILED for {arxiv_id}: {e}", exc_info=True)
+        print(f"FAILED: {e}") # Print to stdout for CLI visibility if logger goes to stderr only
+        return False
+
+async def run_batch(arxiv_ids, args, translator, analyzer, model_name, store=None, memory=None) -> dict:
+    """
+    Translates many papers through a staged pipeline. Each stage has its own
+    worker limit, so downloads and compiles of some papers overlap with the
+    Gemini translation of others. Progress events are tagged with the arXiv ID.
+    """
+    stage_limits = {
+        "download": asyncio.Semaphore(max(1, args.download_workers)),
+        "translate": asyncio.Semaphore(max(1, args.translate_workers)),
+        "compile": asyncio.Semaphore(max(1, args.compile_workers)),
+    }
+
+    async def run(arxiv_id):
+        # Context variables are copied into tasks and worker threads
+        ipc_tag.set(arxiv_id)
+        final_pdf = output_pdf_path(arxiv_id, model_name, args.output, batch=True)
+        ok = await process_paper(arxiv_id, args, translator, analyzer, final_pdf, stage_limits, store, memory)
+        write_metrics(get_metrics(), arxiv_id, paper=arxiv_id)
+        return arxiv_id, ok
+
+    results = {}
+    tasks = [asyncio.create_task(run(arxiv_id)) for arxiv_id in arxiv_ids]
+    for next_done in asyncio.as_completed(tasks):
+        arxiv_id, ok = await next_done
+        results[arxiv_id] = ok
+        log_ipc(f"PROGRESS:BATCH:{len(results)}:{len(arxiv_ids)}:{'Completed' if ok else 'Failed'} {arxiv_id}")
+    return results
+
+async def release_context_cache(coro, context_cache=None):
+    """Awaits `coro`, then deletes the run's cached-content handles (on the same event loop)."""
+    try:
+        return await coro
+    finally:
+        if context_cache is not None:
+            await context_cache.close()
+            if context_cache.created:
+                logger.info(f"Context cache: {context_cache.created} handle(s) created and released.")
 
 def main():
     # Force line buffering for real-time progress updates
     if hasattr(sys.stdout, 'reconfigure'):
         sys.stdout.reconfigure(line_buffering=True)
-        
+
     parser = argparse.ArgumentParser(description="arXiv LaTeX Translator - Translate arXiv papers to Chinese")
-    
+
     # Exclusive group for mutually exclusive actions (translate vs config)
     group = parser.add_mutually_exclusive_group()
-    group.add_argument("arxiv_url", nargs="?", help="URL or ID of the arXiv paper (e.g., https://arxiv.org/abs/2602.04705)")
+    group.add_argument("arxiv_url", nargs="?", help="URL or ID of the arXiv paper (e.g., https://arxiv.org/abs/2602.04705), or 'serve' to run the translation server")
     group.add_argument("--set-key", help="Save Gemini API key to configuration and exit")
-    
+    group.add_argument("--warm-tectonic-cache", action="store_true", help="Download the TeX packages and fonts translations need into the Tectonic cache and exit")
+    group.add_argument("--batch", metavar="FILE", help="Translate every arXiv URL/ID listed in FILE (one per line, '-' for stdin)")
+
     parser.add_argument("--model", default="gemini-3-flash-preview", help="Gemini model to use (flash or pro)")
-    parser.add_argument("--output", "-o", help="Custom output path for the translated PDF")
+    parser.add_argument("--output", "-o", help="Custom output path for the translated PDF (output directory with --batch)")
     parser.add_argument("--keep", action="store_true", help="Keep intermediate files for debugging")
     parser.add_argument("--deepdive", action="store_true", help="Enable AI DeepDive (Technical Analysis)")
-    
+    parser.add_argument("--deepdive-budget", type=int, metavar="TOKENS", help="DeepDive: maximum input tokens analyzed per paper, spent on the most technical sections first (default: unlimited)")
+    parser.add_argument("--deepdive-min-score", type=float, default=DEFAULT_MIN_SCORE, help="DeepDive: minimum technical-density score of an analyzed section (default: %(default)s)")
+    parser.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS, help="Token budget per chunk when a large file is split (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Maximum number of files translated concurrently (default: %(default)s)")
+    parser.add_argument("--chunk-concurrency", type=int, default=DEFAULT_CHUNK_CONCURRENCY, help="Maximum number of chunks of one large file translated concurrently (default: %(default)s)")
+    parser.add_argument("--rpm", type=int, help="Requests per minute allowed per model (default: unlimited, adapt on 429s)")
+    parser.add_argument("--tpm", type=int, help="Input tokens per minute allowed per model (default: unlimited)")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the persistent translation cache (~/.arxiv-translator/cache.db)")
+    parser.add_argument("--no-memory", action="store_true", help="Do not reuse translations of similar paragraphs from other papers (~/.arxiv-translator/memory.db)")
+    parser.add_argument("--memory-threshold", type=float, default=DEFAULT_EDIT_THRESHOLD, help="Minimum similarity (0-1) for a remembered paragraph to be reused or edited (default: %(default)s)")
+    parser.add_argument("--context-cache", action="store_true", help="Cache the system prompts and a per-paper glossary on Gemini's side and reference them from every request (falls back to inline prompts if unsupported)")
+    parser.add_argument("--context-cache-ttl", type=int, default=DEFAULT_TTL_SECONDS, help="Lifetime of a cached prompt in seconds, extended while in use (default: %(default)s)")
+    parser.add_argument("--no-eprint-cache", action="store_true", help="Do not use the shared e-print mirror (~/.arxiv-translator/eprints)")
+    parser.add_argument("--no-compile-cache", action="store_true", help="Always run Tectonic, even if the translated sources match the last build (~/.arxiv-translator/builds)")
+    parser.add_argument("--repair-rounds", type=int, default=DEFAULT_REPAIR_ROUNDS, help="Times to repair the segments Tectonic reports errors in and recompile (0 to disable, default: %(default)s)")
+    parser.add_argument("--tectonic-cache", metavar="DIR", default=os.getenv("TECTONIC_CACHE_DIR"), help="Persistent Tectonic package cache directory (default: $TECTONIC_CACHE_DIR or Tectonic's own)")
+    parser.add_argument("--stream", action="store_true", help="Stream Gemini responses: write output as it arrives, report progress and resume broken streams")
+    parser.add_argument("--stream-extract", action="store_true", help="Extract the e-print while it downloads instead of after (one pass over disk)")
+    parser.add_argument("--all-tex", action="store_true", help="Translate every .tex file, not only those included from the main file")
+    parser.add_argument("--no-incremental", action="store_true", help="Do not reuse translations from an earlier version's workspace (e.g. workspace_<id>v1)")
+    parser.add_argument("--metrics-events", action="store_true", help="Print a METRICS:{json} line for every Gemini request (tokens, latency)")
+    parser.add_argument("--download-workers", type=int, default=DEFAULT_DOWNLOAD_WORKERS, help="Batch mode: papers downloading at once (default: %(default)s)")
+    parser.add_argument("--translate-workers", type=int, default=DEFAULT_TRANSLATE_WORKERS, help="Batch mode: papers translating at once (default: %(default)s)")
+    parser.add_argument("--compile-workers", type=int, default=DEFAULT_COMPILE_WORKERS, help="Batch mode: papers compiling at once (default: %(default)s)")
+    parser.add_argument("--host", default=DEFAULT_SERVE_HOST, help="Serve mode: address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_SERVE_PORT, help="Serve mode: port to listen on (default: %(default)s)")
+    parser.add_argument("--max-jobs", type=int, default=DEFAULT_MAX_JOBS, help="Serve mode: papers admitted at once, later jobs are queued (default: %(default)s)")
+
     args = parser.parse_args()
     config_manager = ConfigManager()
 
@@ -161,8 +405,11 @@ def main():
         config_manager.set_api_key(args.set_key)
         sys.exit(0)
 
+    if args.warm_tectonic_cache:
+        sys.exit(0 if warm_tectonic_cache(args.tectonic_cache) else 1)
+
     # Check for arXiv URL/ID
-    if not args.arxiv_url:
+    if not args.arxiv_url and not args.batch:
         parser.print_help()
         sys.exit(1)
 
@@ -170,192 +417,86 @@ def main():
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         api_key = config_manager.get_api_key()
-    
+
     if not api_key:
         print("Error: Gemini API Key not found.")
         print("Please set it via environment variable GEMINI_API_KEY")
         print("OR run: arxiv-translator --set-key YOUR_API_KEY")
         sys.exit(1)
 
-    # Handle model aliases
-    model_name = args.model
-    if model_name.lower() == "flash":
-        model_name = "gemini-3-flash-preview"
-    elif model_name.lower() == "pro":
-        model_name = "gemini-3-pro-preview"
-    
-    # Extract ID
-    # heuristics: 2602.04705 or https://arxiv.org/abs/2602.04705 or https://arxiv.org/pdf/2602.04705
-    arxiv_id = args.arxiv_url.split("/")[-1].replace(".pdf", "")
+    serving = args.arxiv_url == "serve"
+
+    # Imported only now: google-genai and requests take most of the startup
+    # time, and --help, --set-key and the like never need them
+    from .translator import GeminiTranslator
+    from .deepdive import DeepDiveAnalyzer
+    from .downloader import EprintStore
+
+    configure_rate_limits(rpm=args.rpm, tpm=args.tpm)
+    # Fresh per-run recorder, picked up by the translator and analyzer below
+    metrics = configure_metrics(emit_events=args.metrics_events)
+    model_name = resolve_model_name(args.model)
 
-    arxiv_id = args.arxiv_url.split("/")[-1].replace(".pdf", "")
+    # A server keeps recently used translations in memory as well
+    cache = None if args.no_cache else TranslationCache(hot_entries=DEFAULT_HOT_ENTRIES if serving else 0)
+    cache_before = cache.stats() if cache else None
+    # Segment-level memory shared across papers, for near-duplicate boilerplate
+    memory = None if args.no_memory else TranslationMemory(edit_threshold=args.memory_threshold)
+
+    # One translator (and one genai client) shared by all concurrent requests
+    translator = GeminiTranslator(api_key=api_key, model_name=model_name, cache=cache, chunk_tokens=args.chunk_tokens,
+                                  chunk_concurrency=args.chunk_concurrency)
+    context_cache = None
+    if args.context_cache:
+        context_cache = ContextCache(translator.client, ttl_seconds=args.context_cache_ttl)
+        translator.context_cache = context_cache
+    analyzer = None
+    # A server can run DeepDive for any job that asks for it
+    if args.deepdive or serving:
+        analyzer = DeepDiveAnalyzer(api_key, model_name=model_name, client=translator.client,
+                                    context_cache=context_cache, min_score=args.deepdive_min_score)
+
+    # Shared e-print mirror (~/.arxiv-translator/eprints), one pooled HTTP session
+    store = None if args.no_eprint_cache else EprintStore()
 
-    logger.info(f"Starting translation for {arxiv_id} using model {model_name}")
     logger.info(f"DeepDive Mode: {'ENABLED' if args.deepdive else 'DISABLED'}")
-    # print(f"Using model: {model_name}") # Logged above
-        
-    work_dir = os.path.abspath(f"workspace_{arxiv_id}")
-    
-    if os.path.exists(work_dir) and not args.keep:
-         shutil.rmtree(work_dir)
-    
-    if not os.path.exists(work_dir):
-        os.makedirs(work_dir)
-    
-    logger.info(f"Work directory: {work_dir}")
-    # print(f"Work directory: {work_dir}") # Logged above
-    
-    try:
-        # 1. Download source
-        log_ipc(f"PROGRESS:DOWNLOADING:Downloading source for {arxiv_id}...")
-        tar_path = os.path.join(work_dir, f"{arxiv_id}.tar.gz")
-        if not os.path.exists(tar_path):
-             tar_path = download_source(arxiv_id, work_dir)
-             logger.info(f"Downloaded source to {tar_path}")
-        else:
-             logger.info("Using existing source archive.")
-        
-        # 2. Extract
-        # 2. Extract
-        log_ipc(f"PROGRESS:EXTRACTING:Extracting source files...")
-        source_dir = os.path.join(work_dir, "source")
-        if not os.path.exists(source_dir):
-            extract_source(tar_path, source_dir)
-        
-        # 3. Translate
-        # Copy source to source_zh
-        source_zh_dir = os.path.join(work_dir, "source_zh")
-        if os.path.exists(source_zh_dir):
-            shutil.rmtree(source_zh_dir) # Always fresh copy for translation
-        shutil.copytree(source_dir, source_zh_dir)
-        
-        main_tex = find_main_tex(source_zh_dir)
-        logger.info(f"Main TeX file found: {main_tex}")
-        # print(f"Main TeX file: {main_tex}", flush=True)
-        
-        translator = GeminiTranslator(api_key=api_key, model_name=model_name)
-        
-        # Translate all TeX files
-        # Translate all TeX files
-        log_ipc(f"PROGRESS:TRANSLATING:0:0:Starting translation with {model_name}...")
-        
-        # Pre-count and collect files
-        tex_files_to_translate = []
-        for root, dirs, files in os.walk(source_zh_dir):
-            for file in files:
-                if file == "math_commands.tex":
-                    # print(f"Skipping {file} (definitions)...")
-                    continue
-                if file.endswith(".tex"):
-                     tex_files_to_translate.append(os.path.join(root, file))
-        
-        total_files = len(tex_files_to_translate)
-        total_files = len(tex_files_to_translate)
-        logger.info(f"Found {total_files} TeX files to translate.")
-        
-        # Concurrent Translation
-        from concurrent.futures import ProcessPoolExecutor, as_completed
-        
-        # Helper to be pickled
-        # define worker inside main or import? needs to be picklable, so top level is best.
-        # But we can't move it easily with replace_file_content unless we replace whole file or use a separate file.
-        # We can define it at top of main() but better at module level.
-        # Impl note: python multiprocessing needs top-level function.
-        # I will use a separate small replace to add the worker function at the top, or just put it here if I am replacing a big chunk.
-        # Actually, I can't put it here inside main().
-        # I HAVE TO MOVE IT OUT.
-        # I will replace the whole file or add it before main().
-        # Since I am using replace_file_content on a range, I can't easily add to top.
-        # Strategy: 
-        # 1. Use `replace_file_content` to add imports and the worker function BEFORE `main`.
-        # 2. Use `replace_file_content` to rewrite the loop inside `main`.
-        
-        # Let's do step 2 (loop rewrite) here assuming step 1 (worker def) is done? 
-        # No, sequential tools. I should abort this tool call and do the worker def first.
-        # But I can't abort myself.
-        # I will use this tool call to rewrite the loop, but call the worker `translate_file_worker` which I will define in the NEXT tool call at the top of the file?
-        # Python will fail if I run it before defining. But I am editing code.
-        # I will define `translate_file_worker` in the NEXT tool call at the top.
-        # WAIT, if I edit the loop to call `translate_file_worker`, and then edit top to add it, the file is broken in between. That's fine.
-        
-        completed_count = 0
-        with ProcessPoolExecutor(max_workers=12) as executor:
-            future_to_file = {
-                executor.submit(translate_file_worker, api_key, model_name, f, main_tex): f 
-                for f in tex_files_to_translate
-            }
-            
-            for future in as_completed(future_to_file):
-                file_path = future_to_file[future]
-                file_name = os.path.basename(file_path)
-                completed_count += 1
-                try:
-                    res = future.result()
-                    # res is boolean or message?
-                    log_ipc(f"PROGRESS:TRANSLATING:{completed_count}:{total_files}:Translated {file_name}")
-                except Exception as exc:
-                    logger.error(f"Generated an exception for {file_name}: {exc}", exc_info=True)
-                    log_ipc(f"PROGRESS:TRANSLATING:{completed_count}:{total_files}:Failed {file_name}")
-
-        # 3.5. DeepDive Analysis (Optional)
-        if args.deepdive:
-            log_ipc(f"PROGRESS:ANALYZING:Starting parallel AI DeepDive Analysis (12 workers)...")
-            aux_count = 0
-            
-            with ProcessPoolExecutor(max_workers=12) as executor:
-                future_to_file = {
-                    executor.submit(deepdive_analysis_worker, api_key, f, model_name): f 
-                    for f in tex_files_to_translate
-                }
-                
-                for future in as_completed(future_to_file):
-                    f_path = future_to_file[future]
-                    fname = os.path.basename(f_path)
-                    aux_count += 1
-                    try:
-                        is_changed, _ = future.result()
-                        if is_changed:
-                            log_ipc(f"PROGRESS:ANALYZING:{aux_count}:{total_files}:Analyzed {fname}")
-                        else:
-                            log_ipc(f"PROGRESS:ANALYZING:{aux_count}:{total_files}:Skipped {fname}")
-                    except Exception as e:
-                        logger.error(f"Analysis failed for {fname}: {e}", exc_info=True)
-
-        # 4. Compile
-        log_ipc(f"PROGRESS:COMPILING:Compiling PDF with Tectonic...")
-        compile_pdf(source_zh_dir, main_tex)
-        
-        # Move PDF to root or custom output
-        pdf_name = os.path.basename(main_tex).replace(".tex", ".pdf")
-        compiled_pdf = os.path.join(source_zh_dir, pdf_name)
-        
-        # Suffix handling
-        if args.output:
-            final_pdf = args.output
-        else:
-            suffix = "_zh"
-            if "pro" in model_name.lower():
-                suffix = "_zh_pro"
-            elif "flash" in model_name.lower():
-                suffix = "_zh_flash"
-            final_pdf = f"{arxiv_id}{suffix}.pdf"
-        
-        if os.path.exists(compiled_pdf):
-            shutil.copy(compiled_pdf, final_pdf)
-            logger.info(f"SUCCESS: Generated {final_pdf}")
-            log_ipc(f"PROGRESS:COMPLETED:Translation finished successfully.")
-        else:
-            logger.error("ERROR: PDF was not generated.")
-            log_ipc(f"PROGRESS:FAILED:PDF compilation failed.")
-            
-    except Exception as e:
-        logger.error(f"Translation FAILED: {e}", exc_info=True)
-        print(f"FAILED: {e}") # Print to stdout for CLI visibility if logger goes to stderr only
-        # traceback.print_exc() # Handled by exc_info=True in logger
-    finally:
-        if not args.keep:
-            # shutil.rmtree(work_dir)
-            pass # Keep by default for debug
-            
+
+    if serving:
+        # Imported here: the server module builds on this one
+        from .server import TranslationServer
+        server = TranslationServer(args, translator, analyzer, model_name, store=store, memory=memory,
+                                   context_cache=context_cache, cache=cache, host=args.host, port=args.port,
+                                   max_jobs=args.max_jobs)
+        server.serve_forever()
+    elif args.batch:
+        arxiv_ids = read_batch_ids(args.batch)
+        logger.info(f"Starting batch translation of {len(arxiv_ids)} papers using model {model_name}")
+        results = asyncio.run(release_context_cache(
+            run_batch(arxiv_ids, args, translator, analyzer, model_name, store, memory), context_cache
+        ))
+        failed = [arxiv_id for arxiv_id, ok in results.items() if not ok]
+        logger.info(f"Batch finished: {len(results) - len(failed)} succeeded, {len(failed)} failed.")
+        if failed:
+            logger.error(f"Failed papers: {', '.join(failed)}")
+        ok = not failed
+    else:
+        arxiv_id = parse_arxiv_id(args.arxiv_url)
+        logger.info(f"Starting translation for {arxiv_id} using model {model_name}")
+        final_pdf = output_pdf_path(arxiv_id, model_name, args.output)
+        ok = asyncio.run(release_context_cache(
+            process_paper(arxiv_id, args, translator, analyzer, final_pdf, store=store, memory=memory), context_cache
+        ))
+        write_metrics(metrics, arxiv_id)
+
+    if cache is not None:
+        stats = cache.stats()
+        hits = stats["hits"] - cache_before["hits"]
+        misses = stats["misses"] - cache_before["misses"]
+        logger.info(f"Translation cache: {hits} hits, {misses} misses ({stats['entries']} entries, {stats['bytes'] // 1024} KB on disk)")
+
+    # Let scripts and CI tell that (some of the) papers failed
+    if not serving and not ok:
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,283 @@
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+from .segmenter import estimate_tokens, split_segments
+from .logging_utils import logger
+
+# MinHash signature of NUM_BANDS * ROWS_PER_BAND values; two segments share
+# a band (and become candidates) with probability ~1-(1-s^4)^16, i.e. >99%
+# at Jaccard similarity s=0.8 and <5% at s=0.3
+NUM_BANDS = 16
+ROWS_PER_BAND = 4
+NUM_PERM = NUM_BANDS * ROWS_PER_BAND
+SHINGLE_WORDS = 3
+_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % (_PRIME - 1) + 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _PRIME)
+    for i in range(NUM_PERM)
+]
+
+# Segments shorter than this (section titles, \begin lines...) are not worth a lookup
+MIN_SEGMENT_CHARS = 200
+# Identical after whitespace normalization: reuse the stored translation as is
+DEFAULT_REUSE_THRESHOLD = 1.0
+# Near-duplicates: ask the model to edit the stored translation
+DEFAULT_EDIT_THRESHOLD = 0.8
+DEFAULT_MAX_ENTRIES = 200_000
+
+WORD_PATTERN = re.compile(r'\S+')
+
+
+def normalize(text: str) -> str:
+    return ' '.join(text.split())
+
+
+def shingles(text: str) -> Set[int]:
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        words = words + [''] * (SHINGLE_WORDS - len(words))
+    return {
+        int.from_bytes(hashlib.blake2b(' '.join(words[i:i + SHINGLE_WORDS]).encode('utf-8'), digest_size=8).digest(), "big")
+        for i in range(len(words) - SHINGLE_WORDS + 1)
+    }
+
+
+def minhash(shingle_set: Set[int]) -> List[int]:
+    return [min((a * s + b) % _PRIME for s in shingle_set) for a, b in _PERMUTATIONS]
+
+
+def band_keys(signature: List[int]) -> List[int]:
+    keys = []
+    for band in range(NUM_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(repr(rows).encode(), digest_size=8).digest()
+        # Signed, so it fits an SQLite INTEGER
+        keys.append(int.from_bytes(digest, "big", signed=True))
+    return keys
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MemoryMatch:
+    """A stored segment similar to the one looked up."""
+
+    def __init__(self, source: str, translation: str, similarity: float):
+        self.source = source
+        self.translation = translation
+        self.similarity = similarity
+
+
+class TranslationMemory:
+    """
+    Segment-level translation memory shared across papers, for boilerplate
+    that recurs with small edits (acknowledgements, training setups, captions).
+
+    English segments are indexed by MinHash over word 3-grams with LSH banding
+    in SQLite (~/.arxiv-translator/memory.db by default); candidates from the
+    index are verified with the exact Jaccard similarity.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 edit_threshold: float = DEFAULT_EDIT_THRESHOLD):
+        if db_path:
+            self.db_path = Path(db_path)
+        else:
+            self.db_path = Path.home() / ".arxiv-translator" / "memory.db"
+        self.max_entries = max_entries
+        # Minimum similarity for a stored segment to be used at all
+        self.edit_threshold = edit_threshold
+        self._lock = threading.Lock()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                " id INTEGER PRIMARY KEY,"
+                " source_hash TEXT UNIQUE NOT NULL,"
+                " source TEXT NOT NULL,"
+                " translation TEXT NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_segments_last_used ON segments(last_used)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS bands (band INTEGER NOT NULL, key INTEGER NOT NULL, segment_id INTEGER NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_bands ON bands(band, key)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_bands_segment ON bands(segment_id)")
+
+    @staticmethod
+    def _hash(normalized: str) -> str:
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def add(self, source: str, translation: str):
+        """Stores one aligned (English, Chinese) segment pair."""
+        normalized = normalize(source)
+        if len(normalized) < MIN_SEGMENT_CHARS:
+            return
+        source_hash = self._hash(normalized)
+        keys = band_keys(minhash(shingles(normalized)))
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT id FROM segments WHERE source_hash = ?", (source_hash,)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE segments SET translation = ?, last_used = ? WHERE id = ?",
+                                   (translation, time.time(), row[0]))
+                return
+            cursor = self._conn.execute(
+                "INSERT INTO segments (source_hash, source, translation, last_used) VALUES (?, ?, ?, ?)",
+                (source_hash, normalized, translation, time.time())
+            )
+            self._conn.executemany("INSERT INTO bands (band, key, segment_id) VALUES (?, ?, ?)",
+                                   [(band, key, cursor.lastrowid) for band, key in enumerate(keys)])
+            self._evict()
+
+    def lookup(self, source: str, threshold: Optional[float] = None) -> Optional[MemoryMatch]:
+        """
+        Returns the most similar stored segment with Jaccard similarity >=
+        `threshold` (default: `edit_threshold`), if any.
+        """
+        if threshold is None:
+            threshold = self.edit_threshold
+        normalized = normalize(source)
+        if len(normalized) < MIN_SEGMENT_CHARS:
+            return None
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT id, source, translation FROM segments WHERE source_hash = ?",
+                                     (self._hash(normalized),)).fetchone()
+            if row is not None:
+                self._conn.execute("UPDATE segments SET last_used = ? WHERE id = ?", (time.time(), row[0]))
+                return MemoryMatch(row[1], row[2], 1.0)
+
+        query = shingles(normalized)
+        keys = band_keys(minhash(query))
+        with self._lock, self._conn:
+            clauses = " OR ".join("(band = ? AND key = ?)" for _ in keys)
+            params = [value for band, key in enumerate(keys) for value in (band, key)]
+            candidate_ids = [r[0] for r in self._conn.execute(
+                f"SELECT DISTINCT segment_id FROM bands WHERE {clauses}", params).fetchall()]
+            best = None
+            for segment_id in candidate_ids:
+                row = self._conn.execute("SELECT source, translation FROM segments WHERE id = ?",
+                                         (segment_id,)).fetchone()
+                if row is None:
+                    continue
+                similarity = jaccard(query, shingles(row[0]))
+                if similarity >= threshold and (best is None or similarity > best[0]):
+                    best = (similarity, segment_id, row)
+            if best is None:
+                return None
+            self._conn.execute("UPDATE segments SET last_used = ? WHERE id = ?", (time.time(), best[1]))
+            return MemoryMatch(best[2][0], best[2][1], best[0])
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        stale = [r[0] for r in self._conn.execute(
+            "SELECT id FROM segments ORDER BY last_used ASC LIMIT ?", (count - self.max_entries,)).fetchall()]
+        self._conn.executemany("DELETE FROM bands WHERE segment_id = ?", [(i,) for i in stale])
+        self._conn.executemany("DELETE FROM segments WHERE id = ?", [(i,) for i in stale])
+        logger.debug(f"Translation memory evicted {len(stale)} segments.")
+
+    def record(self, source: str, translation: str) -> int:
+        """
+        Adds the segment pairs of a translated file. Segments are aligned by
+        position, so nothing is stored when the structure differs. Segments
+        that came back unchanged (left in English after a failed request) are
+        skipped. Returns the number of pairs stored.
+        """
+        source_segments = split_segments(source)
+        translated_segments = split_segments(translation)
+        if len(source_segments) != len(translated_segments):
+            return 0
+        stored = 0
+        for english, chinese in zip(source_segments, translated_segments):
+            if chinese.strip() == english.strip():
+                continue
+            self.add(english, chinese.rstrip('\n'))
+            stored += 1
+        return stored
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+async def translate_with_memory(translator, memory: TranslationMemory, content: str,
+                                reuse_threshold: float = DEFAULT_REUSE_THRESHOLD,
+                                split_tokens: Optional[int] = None) -> Optional[str]:
+    """
+    Translates `content` segment by segment against the memory: segments with
+    a match >= `reuse_threshold` reuse the stored translation, matches
+    >= `memory.edit_threshold` are sent as short "edit this translation" requests,
+    and runs of the remaining segments are translated normally (as concurrent
+    chunks of about `split_tokens` tokens when they are larger than that, see
+    translate_file).
+
+    Returns None when no segment has a match, so the caller can translate the
+    file in one request as usual.
+    """
+    segments = split_segments(content)
+    # MinHash and SQLite lookups are CPU/disk work; keep them off the event loop
+    matches = await asyncio.to_thread(lambda: [memory.lookup(segment) for segment in segments])
+    if not any(matches):
+        return None
+
+    pieces: List[Optional[str]] = []
+    pending: List[Tuple[int, str, Optional[MemoryMatch]]] = []
+    run: List[str] = []
+
+    def flush_run():
+        if run:
+            pending.append((len(pieces), '\n'.join(run), None))
+            pieces.append(None)
+            run.clear()
+
+    reused = edited = 0
+    for segment, match in zip(segments, matches):
+        if match is None:
+            run.append(segment)
+            continue
+        flush_run()
+        trailing = segment[len(segment.rstrip('\n')):]
+        if match.similarity >= reuse_threshold:
+            pieces.append(match.translation.rstrip('\n') + trailing)
+            reused += 1
+        else:
+            pending.append((len(pieces), segment, match))
+            pieces.append(None)
+            edited += 1
+    flush_run()
+
+    # Requests of one file in flight at once, as for chunked files
+    semaphore = asyncio.Semaphore(max(1, translator.chunk_concurrency))
+
+    async def translate(text, match):
+        # Keep the blank line that separates the block from what follows
+        trailing = text[len(text.rstrip('\n')):]
+        async with semaphore:
+            if match is None and split_tokens and estimate_tokens(text) > split_tokens:
+                translated = await translator.translate_latex_chunked(text, split_tokens)
+            elif match is None:
+                translated = await translator.translate_latex_async(text)
+            else:
+                translated = await translator.revise_translation(match.source, match.translation, text)
+        return translated.rstrip('\n') + trailing
+
+    results = await asyncio.gather(*(translate(text, match) for _, text, match in pending))
+    for (index, _, _), translated in zip(pending, results):
+        pieces[index] = translated
+
+    logger.info(f"Translation memory: reused {reused}, edited {edited} of {len(segments)} segments.")
+    return '\n'.join(pieces)
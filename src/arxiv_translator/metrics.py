@@ -0,0 +1,203 @@
+import contextlib
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from .logging_utils import log_ipc, ipc_tag
+
+# Estimated USD per 1M tokens (input, output), matched by model-name prefix.
+# Only used for the cost estimate in the metrics file; check current pricing.
+MODEL_PRICES = {
+    "gemini-3-pro": (2.00, 12.00),
+    "gemini-3-flash": (0.50, 3.00),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+}
+
+PERCENTILES = (50, 95, 99)
+
+# What the current request is for; set by the engine around each file/stage
+current_stage = contextvars.ContextVar("metrics_stage", default=None)
+current_file = contextvars.ContextVar("metrics_file", default=None)
+
+@contextlib.contextmanager
+def metrics_context(stage: Optional[str] = None, file: Optional[str] = None):
+    """Attributes the Gemini calls made inside the block to `stage` and/or `file`."""
+    tokens = []
+    if stage is not None:
+        tokens.append((current_stage, current_stage.set(stage)))
+    if file is not None:
+        tokens.append((current_file, current_file.set(file)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+# Source left untranslated by the requests of the current block; see track_fallbacks
+current_fallbacks = contextvars.ContextVar("metrics_fallbacks", default=None)
+
+@contextlib.contextmanager
+def track_fallbacks():
+    """
+    Yields a list that gets one entry ('file' or 'chunk') for each request in
+    the block (including tasks started in it) whose source was returned
+    untranslated after it failed.
+    """
+    fallbacks = []
+    token = current_fallbacks.set(fallbacks)
+    try:
+        yield fallbacks
+    finally:
+        current_fallbacks.reset(token)
+
+def record_fallback(kind: str):
+    """Notes a fallback for the enclosing track_fallbacks block (if any)."""
+    fallbacks = current_fallbacks.get()
+    if fallbacks is not None:
+        fallbacks.append(kind)
+
+def _token_count(usage, name: str) -> int:
+    value = getattr(usage, name, None) if usage is not None else None
+    return value if isinstance(value, int) else 0
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of `values` (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> Optional[float]:
+    for prefix, (input_price, output_price) in MODEL_PRICES.items():
+        if model.startswith(prefix):
+            return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+    return None
+
+
+class MetricsRecorder:
+    """
+    Collects one record per Gemini request (tokens, latency, outcome) and
+    counts retries and fallbacks, tagged with the model, stage, file and paper
+    (the batch IPC tag) they belong to. Thread-safe.
+    """
+
+    def __init__(self, emit_events: bool = False):
+        self.emit_events = emit_events
+        self.requests: List[dict] = []
+        self.events: List[dict] = []
+        self._lock = threading.Lock()
+
+    def _context(self, model: str) -> dict:
+        return {
+            "model": model,
+            "stage": current_stage.get(),
+            "file": current_file.get(),
+            "paper": ipc_tag.get(),
+        }
+
+    @contextlib.contextmanager
+    def measure(self, model: str):
+        """
+        Times the request made in the block. Hand the response (or its final
+        chunk, whose usage_metadata covers the whole stream) to the yielded
+        callable to record its token counts.
+        """
+        record = self._context(model)
+        responses = []
+        start = time.perf_counter()
+        try:
+            yield responses.append
+        except BaseException:
+            record["ok"] = False
+            raise
+        else:
+            record["ok"] = True
+        finally:
+            record["latency"] = time.perf_counter() - start
+            usage = getattr(responses[-1], "usage_metadata", None) if responses else None
+            record["input_tokens"] = _token_count(usage, "prompt_token_count")
+            record["output_tokens"] = _token_count(usage, "candidates_token_count")
+            # Part of input_tokens served from a context cache
+            record["cached_tokens"] = _token_count(usage, "cached_content_token_count")
+            with self._lock:
+                self.requests.append(record)
+            if self.emit_events:
+                log_ipc(f"METRICS:{json.dumps(record, ensure_ascii=False)}")
+
+    def count(self, kind: str, model: str):
+        """Counts a 'retry', 'chunked' (file split after failing whole) or 'chunk_fallback' (chunk left in English)."""
+        event = self._context(model)
+        event["kind"] = kind
+        with self._lock:
+            self.events.append(event)
+
+    def _group(self, requests: List[dict], events: List[dict]) -> dict:
+        latencies = [r["latency"] for r in requests]
+        input_tokens = sum(r["input_tokens"] for r in requests)
+        output_tokens = sum(r["output_tokens"] for r in requests)
+        costs = [estimate_cost(r["model"], r["input_tokens"], r["output_tokens"]) for r in requests]
+        summary = {
+            "requests": len(requests),
+            "failures": sum(1 for r in requests if not r["ok"]),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cached_tokens": sum(r.get("cached_tokens", 0) for r in requests),
+            "estimated_cost_usd": round(sum(c for c in costs if c is not None), 6),
+            "latency_total": round(sum(latencies), 3),
+        }
+        for p in PERCENTILES:
+            value = percentile(latencies, p)
+            summary[f"latency_p{p}"] = round(value, 3) if value is not None else None
+        for event in events:
+            summary[event["kind"]] = summary.get(event["kind"], 0) + 1
+        return summary
+
+    def summary(self, paper: Optional[str] = None) -> dict:
+        """Totals and latency percentiles overall and per model, stage and file (optionally for one paper)."""
+        with self._lock:
+            requests = [r for r in self.requests if paper is None or r["paper"] == paper]
+            events = [e for e in self.events if paper is None or e["paper"] == paper]
+
+        result = {"total": self._group(requests, events)}
+        for key in ("model", "stage", "file"):
+            names = sorted({str(r[key]) for r in requests} | {str(e[key]) for e in events})
+            result[f"by_{key}"] = {
+                name: self._group([r for r in requests if str(r[key]) == name],
+                                  [e for e in events if str(e[key]) == name])
+                for name in names
+            }
+        return result
+
+    def save(self, path: str, paper: Optional[str] = None):
+        """Writes the summary and the raw request records (optionally for one paper) as JSON."""
+        with self._lock:
+            requests = [r for r in self.requests if paper is None or r["paper"] == paper]
+        data = {"summary": self.summary(paper), "requests": requests}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def discard(self, paper: str):
+        """Drops the records of one paper (once saved), so a long-running server does not accumulate them."""
+        with self._lock:
+            self.requests = [r for r in self.requests if r["paper"] != paper]
+            self.events = [e for e in self.events if e["paper"] != paper]
+
+
+_recorder = MetricsRecorder()
+
+def get_metrics() -> MetricsRecorder:
+    """Returns the process-wide recorder shared by translators and analyzers."""
+    return _recorder
+
+def configure_metrics(emit_events: bool = False) -> MetricsRecorder:
+    """Starts a fresh process-wide recorder (one per run)."""
+    global _recorder
+    _recorder = MetricsRecorder(emit_events=emit_events)
+    return _recorder
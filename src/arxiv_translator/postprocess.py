@@ -0,0 +1,148 @@
+import re
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from .logging_utils import logger
+
+# A replacement is a literal string, or a callable(match, state) -> str where
+# `state` is a dict shared by all rules for one document
+Replacement = Union[str, Callable[["RuleMatch", dict], str]]
+
+
+class RuleMatch:
+    """The part of a combined-pattern match that belongs to one rule; group numbers are the rule's own."""
+
+    def __init__(self, match: re.Match, offset: int):
+        self._match = match
+        self._offset = offset
+
+    def group(self, index: int = 0) -> Optional[str]:
+        return self._match.group(self._offset + index)
+
+
+class Rule:
+    """
+    One fix-up applied to translated LaTeX.
+
+    Args:
+        name (str): Reported when the rule fires.
+        pattern (str): Regular expression; inline flags go in a scoped group, e.g. "(?s:...)".
+        replacement: Literal text or callable(match, state) -> str.
+        main_only (bool): Only applies to the main .tex file.
+    """
+
+    def __init__(self, name: str, pattern: str, replacement: Replacement, main_only: bool = False):
+        self.name = name
+        self.pattern = pattern
+        self.replacement = replacement
+        self.main_only = main_only
+        self.groups = re.compile(pattern).groups
+
+
+class PostProcessor:
+    """
+    Applies a registry of rules in a single scan: all patterns are joined into
+    one alternation (compiled once per rule set), and each match is handed to
+    the rule that produced it. Where two rules could match at the same
+    position, the one registered first wins.
+    """
+
+    def __init__(self, rules: Optional[List[Rule]] = None):
+        self.rules: List[Rule] = list(rules or [])
+        self._compiled: Dict[bool, Tuple[re.Pattern, Dict[str, Tuple[Rule, int]]]] = {}
+
+    def register(self, rule: Rule):
+        self.rules.append(rule)
+        self._compiled.clear()
+
+    def _combined(self, is_main: bool):
+        if is_main not in self._compiled:
+            parts = []
+            by_group = {}
+            group_index = 1
+            for i, rule in enumerate(self.rules):
+                if rule.main_only and not is_main:
+                    continue
+                name = f"_rule{i}"
+                parts.append(f"(?P<{name}>{rule.pattern})")
+                by_group[name] = (rule, group_index)
+                group_index += 1 + rule.groups
+            pattern = re.compile("|".join(parts)) if parts else None
+            self._compiled[is_main] = (pattern, by_group)
+        return self._compiled[is_main]
+
+    def apply(self, text: str, is_main: bool = False) -> Tuple[str, Dict[str, int]]:
+        """
+        Returns the fixed text and how many times each rule fired (rules whose
+        replacement left the match unchanged are not counted).
+        """
+        pattern, by_group = self._combined(is_main)
+        fired: Dict[str, int] = {}
+        if pattern is None:
+            return text, fired
+        state = {"text": text, "is_main": is_main}
+
+        def dispatch(match):
+            rule, offset = by_group[match.lastgroup]
+            original = match.group(0)
+            if callable(rule.replacement):
+                result = rule.replacement(RuleMatch(match, offset), state)
+            else:
+                result = rule.replacement
+            if result != original:
+                fired[rule.name] = fired.get(rule.name, 0) + 1
+            return result
+
+        return pattern.sub(dispatch, text), fired
+
+
+CTEX_PREAMBLE = "\n\\usepackage[fontset=fandol]{ctex}\n\\usepackage{xspace}\n"
+
+def _inject_ctex(match: RuleMatch, state: dict) -> str:
+    # Only documents that have a preamble and do not load ctex already
+    if "inject_ctex" not in state:
+        text = state["text"]
+        state["inject_ctex"] = "\\documentclass" in text and "ctex" not in text
+    return CTEX_PREAMBLE + match.group(0) if state["inject_ctex"] else match.group(0)
+
+def _dedupe_label(match: RuleMatch, state: dict) -> str:
+    seen = state.setdefault("labels", set())
+    label = match.group(1)
+    if label in seen:
+        return f"% Duplicate label removed: {label}"
+    seen.add(label)
+    return match.group(0)
+
+
+DEFAULT_RULES = [
+    # Main file: ctex handles Chinese, so drop the CJK packages and environments
+    Rule("remove-cjk-package", r'\\usepackage\{CJK.*\}', "", main_only=True),
+    Rule("remove-xecjk-package", r'\\usepackage\{xeCJK\}', "", main_only=True),
+    Rule("inject-ctex", r'\\begin\{document\}', _inject_ctex, main_only=True),
+    # Conflict Resolution: \chinese command (e.g. from 2602.02276), in every file.
+    # A definition wrapping CJK* becomes a pass-through; must precede the CJK* rules.
+    Rule("simplify-chinese-definition", r'(?s:\\newcommand\{\\chinese\}\[1\]\{.*?\\end\{CJK\*\}\})',
+         r'\newcommand{\mychinese}[1]{#1}'),
+    Rule("remove-cjk-environment", r'\\begin\{CJK\*\}\{.*?\}\{.*?\}|\\end\{CJK\*\}', "", main_only=True),
+    # Avoid replacing \chinesefont etc.
+    Rule("rename-chinese", r'\\chinese(?![a-zA-Z])', r'\mychinese'),
+    Rule("minted-outputdir", r'\\usepackage\[.*?\]\{minted\}', r'\usepackage[outputdir=.]{minted}'),
+    # Switch backend=biber to backend=bibtex to avoid external dependency issues
+    Rule("biber-to-bibtex", r'backend=biber', "backend=bibtex"),
+    # Fix duplicate labels (common in translation): keep the first occurrence
+    Rule("dedupe-label", r'\\label\{([^}]+)\}', _dedupe_label),
+    # LLM artifacts: broken escapes like "\ }" -> "\}"
+    Rule("fix-brace-escape", r'\\ ([{}])', lambda match, state: "\\" + match.group(1)),
+]
+
+default_processor = PostProcessor(DEFAULT_RULES)
+
+def register_rule(rule: Rule):
+    """Adds a rule to the processor used by postprocess_translation."""
+    default_processor.register(rule)
+
+def postprocess(text: str, is_main: bool = False, file_name: str = "") -> str:
+    """Applies the default rules to one translated file, logging which ones fired."""
+    result, fired = default_processor.apply(text, is_main)
+    if fired:
+        logger.debug(f"Post-processing {file_name or 'file'}: " +
+                     ", ".join(f"{name} x{count}" for name, count in fired.items()))
+    return result
@@ -0,0 +1,198 @@
+import asyncio
+import random
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from .logging_utils import logger
+
+# Upper bound for concurrent requests per model; AIMD moves below this
+DEFAULT_MAX_CONCURRENCY = 32
+
+# HTTP status codes that mean "slow down" and shrink the concurrency window
+THROTTLE_CODES = {429, 503}
+# Transient errors worth retrying
+RETRYABLE_CODES = THROTTLE_CODES | {500, 502, 504}
+
+RETRY_DELAY_PATTERN = re.compile(r"retryDelay['\"]?\s*:\s*['\"]?([\d.]+)s")
+
+def error_code(exc: Exception) -> Optional[int]:
+    """Returns the HTTP status code of a genai APIError (or similar), if any."""
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    return code if isinstance(code, int) else None
+
+def retry_after(exc: Exception) -> Optional[float]:
+    """
+    Extracts the server's retry hint in seconds, from either a Retry-After
+    header or a google.rpc.RetryInfo `retryDelay` in the error details.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    match = RETRY_DELAY_PATTERN.search(str(getattr(exc, "details", "")) or str(exc))
+    if match:
+        return float(match.group(1))
+    return None
+
+def retry_delay(exc: Exception, attempt: int, base: float = 2.0, cap: float = 60.0) -> Optional[float]:
+    """
+    Returns how long to wait before retrying after `exc`, or None if the error
+    is not worth retrying (e.g. 400 invalid request, 403 bad key).
+    """
+    code = error_code(exc)
+    if code is not None and code not in RETRYABLE_CODES:
+        return None
+    hint = retry_after(exc)
+    if hint is not None:
+        return hint
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class AdaptiveRateLimiter:
+    """
+    Per-model limiter for Gemini requests.
+
+    Enforces optional requests/min and tokens/min budgets over a sliding
+    60 second window, honors retry-after hints, and adapts the number of
+    concurrent requests with AIMD: the window grows by one after a full
+    window of successful requests and is halved on every 429/503.
+    """
+
+    WINDOW = 60.0
+
+    def __init__(self, model_name: str, rpm: Optional[int] = None, tpm: Optional[int] = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, min_concurrency: int = 1):
+        self.model_name = model_name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.concurrency = float(self.max_concurrency)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self._window = deque()  # (timestamp, tokens)
+        self._successes = 0
+        self._cond = None
+        self._loop = None
+
+    def _condition(self) -> asyncio.Condition:
+        # asyncio primitives are bound to one loop; the synchronous wrappers
+        # (asyncio.run per call) would otherwise trip over a stale one.
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._loop is not loop:
+            self._cond = asyncio.Condition()
+            self._loop = loop
+            self.in_flight = 0
+        return self._cond
+
+    def _prune(self, now: float):
+        while self._window and now - self._window[0][0] >= self.WINDOW:
+            self._window.popleft()
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        """Seconds until a request of `tokens` may start (0 if it may start now)."""
+        waits = [self.blocked_until - now]
+        if self.in_flight >= int(self.concurrency):
+            # Woken up by release(); the timeout only guards against lost wakeups
+            waits.append(1.0)
+        self._prune(now)
+        if self.rpm and len(self._window) >= self.rpm:
+            waits.append(self._window[0][0] + self.WINDOW - now)
+        if self.tpm and self._window:
+            used = sum(t for _, t in self._window)
+            if used + tokens > self.tpm:
+                # Wait until enough old requests leave the window
+                freed = 0
+                for ts, t in self._window:
+                    freed += t
+                    if used - freed + tokens <= self.tpm:
+                        waits.append(ts + self.WINDOW - now)
+                        break
+                else:
+                    waits.append(self._window[-1][0] + self.WINDOW - now)
+        return max(waits)
+
+    async def acquire(self, tokens: int = 0):
+        cond = self._condition()
+        async with cond:
+            while True:
+                now = time.monotonic()
+                wait = self._wait_time(tokens, now)
+                if wait <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(cond.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+            self.in_flight += 1
+            self._window.append((time.monotonic(), tokens))
+
+    async def release(self, exc: Optional[BaseException] = None):
+        cond = self._condition()
+        async with cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            if exc is None:
+                self._on_success()
+            elif error_code(exc) in THROTTLE_CODES:
+                self._on_throttle(exc)
+            cond.notify_all()
+
+    def _on_success(self):
+        # Additive increase: +1 slot per window of successful requests
+        self._successes += 1
+        if self._successes >= int(self.concurrency) and self.concurrency < self.max_concurrency:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self._successes = 0
+
+    def _on_throttle(self, exc: BaseException):
+        # Multiplicative decrease, plus a pause for everyone if the server asked for one
+        self.throttled += 1
+        self._successes = 0
+        self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+        hint = retry_after(exc)
+        if hint:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + hint)
+        logger.warning(
+            f"Rate limited on {self.model_name} ({error_code(exc)}); "
+            f"concurrency now {int(self.concurrency)}"
+            + (f", pausing {hint:.1f}s" if hint else "")
+        )
+
+    @asynccontextmanager
+    async def slot(self, tokens: int = 0):
+        """Holds one request slot for the duration of the block."""
+        await self.acquire(tokens)
+        try:
+            yield
+        except BaseException as e:
+            await self.release(e)
+            raise
+        else:
+            await self.release()
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limits: Dict[str, Optional[int]] = {"rpm": None, "tpm": None, "max_concurrency": DEFAULT_MAX_CONCURRENCY}
+
+def configure_rate_limits(rpm: Optional[int] = None, tpm: Optional[int] = None,
+                          max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+    """Sets the limits used for limiters created from now on (and resets existing ones)."""
+    _limits.update(rpm=rpm, tpm=tpm, max_concurrency=max_concurrency)
+    _limiters.clear()
+
+def get_rate_limiter(model_name: str) -> AdaptiveRateLimiter:
+    """Returns the process-wide limiter for `model_name`, shared by all callers."""
+    limiter = _limiters.get(model_name)
+    if limiter is None:
+        limiter = AdaptiveRateLimiter(model_name, **_limits)
+        _limiters[model_name] = limiter
+    return limiter
@@ -0,0 +1,101 @@
+import heapq
+import os
+from typing import Dict, List, Optional
+from .segmenter import estimate_tokens
+from .logging_utils import logger
+
+# Files above this share of the paper's tokens are split into chunks that are
+# translated concurrently, so one huge appendix does not decide the makespan
+DEFAULT_MAX_UNIT_FRACTION = 0.25
+# ...but never split below this size (tokens)
+MIN_SPLIT_TOKENS = 2000
+
+# Rough request cost model for the makespan prediction: fixed overhead plus
+# generation time per 1000 tokens (output is about as long as the input)
+REQUEST_OVERHEAD_SECONDS = 2.0
+SECONDS_PER_1K_TOKENS = 5.0
+
+
+def estimate_request_seconds(tokens: int) -> float:
+    return REQUEST_OVERHEAD_SECONDS + tokens / 1000 * SECONDS_PER_1K_TOKENS
+
+
+def simulate_makespan(durations: List[float], workers: int) -> float:
+    """Finish time of `durations` run in the given order on `workers` parallel slots."""
+    if not durations:
+        return 0.0
+    finish_times = [0.0] * max(1, min(workers, len(durations)))
+    for duration in durations:
+        start = heapq.heappop(finish_times)
+        heapq.heappush(finish_times, start + duration)
+    return max(finish_times)
+
+
+class TranslationPlan:
+    """
+    Largest-first (LPT) order of the files of one paper, with the files to
+    split, built from token estimates before any request is made.
+
+    Attributes:
+        order (List[str]): File paths, most expensive first.
+        costs (Dict[str, int]): Estimated tokens per file.
+        split_threshold (int): Files above this many tokens (a share of the paper)
+            are split.
+        split_tokens (int): Chunk budget for files in `split`.
+        split (set): Files translated as concurrent chunks.
+        predicted_makespan (float): Seconds, from the cost model above.
+    """
+
+    def __init__(self, costs: Dict[str, int], concurrency: int, chunk_tokens: int,
+                 chunk_concurrency: int = 1, max_unit_fraction: float = DEFAULT_MAX_UNIT_FRACTION):
+        self.costs = costs
+        self.order = sorted(costs, key=lambda path: costs[path], reverse=True)
+        total = sum(costs.values())
+        # Only the files that dominate the paper are split (and only if they
+        # make more than one chunk); many mid-sized files already run in parallel
+        self.split_threshold = max(MIN_SPLIT_TOKENS, int(total * max_unit_fraction))
+        self.split_tokens = chunk_tokens
+        self.split = {path for path, tokens in costs.items()
+                      if tokens > self.split_threshold and tokens > chunk_tokens}
+
+        durations = []
+        for path in self.order:
+            tokens = costs[path]
+            if path in self.split:
+                # Chunks run chunk_concurrency at a time inside the file's slot
+                chunks = -(-tokens // self.split_tokens)
+                per_chunk = estimate_request_seconds(tokens // chunks)
+                durations.append(per_chunk * -(-chunks // max(1, chunk_concurrency)))
+            else:
+                durations.append(estimate_request_seconds(tokens))
+        self.predicted_makespan = simulate_makespan(durations, concurrency)
+
+    def describe(self) -> str:
+        if not self.order:
+            return "nothing to translate"
+        largest = self.order[0]
+        return (f"{len(self.order)} files, ~{sum(self.costs.values())} tokens, largest "
+                f"{os.path.basename(largest)} (~{self.costs[largest]} tokens), "
+                f"{len(self.split)} split into <= {self.split_tokens}-token chunks; "
+                f"predicted makespan ~{self.predicted_makespan:.0f}s")
+
+
+def estimate_file_tokens(path: str) -> int:
+    """Token estimate of a file as sent to Gemini (comment lines are stripped first)."""
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return estimate_tokens(''.join(line for line in f if not line.lstrip().startswith('%')))
+
+
+def plan_translation(files: List[str], concurrency: int, chunk_tokens: int,
+                     chunk_concurrency: int = 1,
+                     max_unit_fraction: float = DEFAULT_MAX_UNIT_FRACTION) -> TranslationPlan:
+    costs = {}
+    for path in files:
+        try:
+            costs[path] = estimate_file_tokens(path)
+        except OSError:
+            # Let the translation itself report the problem
+            costs[path] = 0
+    plan = TranslationPlan(costs, concurrency, chunk_tokens, chunk_concurrency, max_unit_fraction)
+    logger.info(f"Translation plan: {plan.describe()}")
+    return plan
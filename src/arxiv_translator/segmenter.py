@@ -0,0 +1,149 @@
+import re
+from typing import List, Tuple
+
+# Roughly 150 lines of typical LaTeX prose
+DEFAULT_CHUNK_TOKENS = 4000
+# Chunks of a single large file in flight at once (on top of the file-level limit)
+DEFAULT_CHUNK_CONCURRENCY = 8
+
+SECTION_PATTERN = re.compile(r'^\s*\\(part|chapter|section|subsection|subsubsection|paragraph)\*?[\[{]')
+BEGIN_END_PATTERN = re.compile(r'\\(begin|end)\{([^}]+)\}')
+COMMENT_PATTERN = re.compile(r'(?<!\\)%.*$')
+# Brace characters that are not escaped as \{ or \}
+BRACE_PATTERN = re.compile(r'(?<!\\)[{}]')
+DISPLAY_MATH_PATTERN = re.compile(r'\\\[|\\\]')
+# CJK ideographs, kana and full-width punctuation: about one token per character
+CJK_PATTERN = re.compile(r'[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+# Markup a translation carries over unchanged: environments, labels, references,
+# citations and sectioning commands (whose titles are translated, so only the name counts)
+MARKUP_PATTERN = re.compile(
+    r'\\(?:begin|end|label|[a-z]*ref|cite[a-z]*)\{[^}]*\}'
+    r'|\\(?:part|chapter|section|subsection|subsubsection|paragraph)\*?(?![a-zA-Z])'
+)
+# Inline/display math delimiters that are not escaped as \$
+DOLLAR_PATTERN = re.compile(r'(?<!\\)\$')
+
+# Environments whose body is not LaTeX, so braces inside must not be counted
+VERBATIM_ENVS = {"verbatim", "verbatim*", "Verbatim", "lstlisting", "minted", "comment"}
+
+
+def markup_signature(segment: str) -> Tuple[str, ...]:
+    """
+    The markup of a segment that its translation must keep (see
+    MARKUP_PATTERN), plus its math delimiters. A source segment and its
+    translation have the same signature unless the model dropped, merged or
+    split segments.
+    """
+    return tuple(MARKUP_PATTERN.findall(segment)) + ('$',) * len(DOLLAR_PATTERN.findall(segment))
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate: ~4 characters per token for English LaTeX source,
+    one token per CJK character (translated text, as read by DeepDive).
+    """
+    cjk = len(CJK_PATTERN.findall(text))
+    return max(1, cjk + (len(text) - cjk) // 4)
+
+
+def split_segments(content: str) -> List[str]:
+    r"""
+    Splits LaTeX source into the smallest segments that are safe to translate
+    independently.
+
+    Boundaries are placed before sectioning commands (\section, \subsection, ...)
+    and after blank lines, but never inside an environment (other than
+    `document`), a brace group or display math. Segments are whole lines, so
+    '\n'.join(segments) == content.
+    """
+    lines = content.split('\n')
+    segments = []
+    current = []
+    env_stack = []
+    brace_depth = 0
+    math_depth = 0
+    verbatim_env = None
+
+    for line in lines:
+        at_top_level = not env_stack and brace_depth == 0 and math_depth == 0 and verbatim_env is None
+        if current and at_top_level:
+            starts_section = SECTION_PATTERN.match(line) is not None
+            after_blank = current[-1].strip() == "" and line.strip() != ""
+            if starts_section or after_blank:
+                segments.append('\n'.join(current))
+                current = []
+        current.append(line)
+
+        if verbatim_env is not None:
+            if f"\\end{{{verbatim_env}}}" in line:
+                verbatim_env = None
+            continue
+
+        code = COMMENT_PATTERN.sub('', line)
+        for kind, name in BEGIN_END_PATTERN.findall(code):
+            if name == "document":
+                continue
+            if kind == "begin":
+                if name in VERBATIM_ENVS:
+                    # Same-line \end (e.g. \begin{verbatim}x\end{verbatim}) closes it again
+                    rest = line.split(f"\\begin{{{name}}}", 1)[-1]
+                    if f"\\end{{{name}}}" not in rest:
+                        verbatim_env = name
+                        break
+                    continue
+                env_stack.append(name)
+            elif name in env_stack:
+                # Pop up to the matching \begin so one stray \end cannot lock the segmenter
+                while env_stack and env_stack.pop() != name:
+                    pass
+        if verbatim_env is not None:
+            continue
+
+        for brace in BRACE_PATTERN.findall(code):
+            brace_depth += 1 if brace == '{' else -1
+        brace_depth = max(brace_depth, 0)
+
+        for delim in DISPLAY_MATH_PATTERN.findall(code):
+            math_depth += 1 if delim == '\\[' else -1
+        math_depth = max(math_depth, 0)
+
+    if current:
+        segments.append('\n'.join(current))
+    return segments
+
+
+def pack_ranges(segments: List[str], max_tokens: int = DEFAULT_CHUNK_TOKENS) -> List[Tuple[int, int]]:
+    """
+    Greedily packs consecutive segments into chunks of at most `max_tokens`,
+    returning the [start, end) segment index range of each chunk.
+
+    A new chunk is preferably started at a sectioning command once the current
+    chunk is half full, so chunk boundaries follow the document structure.
+    Segments larger than the budget are never split and become their own chunk.
+    """
+    ranges = []
+    start = 0
+    current_tokens = 0
+
+    for index, segment in enumerate(segments):
+        tokens = estimate_tokens(segment)
+        over_budget = current_tokens + tokens > max_tokens
+        section_break = SECTION_PATTERN.match(segment) is not None and current_tokens >= max_tokens // 2
+        if index > start and (over_budget or section_break):
+            ranges.append((start, index))
+            start = index
+            current_tokens = 0
+        current_tokens += tokens
+
+    if start < len(segments):
+        ranges.append((start, len(segments)))
+    return ranges
+
+
+def pack_segments(segments: List[str], max_tokens: int = DEFAULT_CHUNK_TOKENS) -> List[str]:
+    """Greedily packs consecutive segments into chunks of at most `max_tokens` (see pack_ranges)."""
+    return ['\n'.join(segments[start:end]) for start, end in pack_ranges(segments, max_tokens)]
+
+
+def segment_latex(content: str, max_tokens: int = DEFAULT_CHUNK_TOKENS) -> List[str]:
+    """Splits LaTeX content into structure-aware chunks within a token budget."""
+    return pack_segments(split_segments(content), max_tokens)
@@ -0,0 +1,392 @@
+"""
+Long-running translation server (`arxiv-translator serve`).
+
+One process keeps the Gemini client, rate limiter, caches, translation memory
+and e-print mirror warm and runs every submitted paper on one asyncio event
+loop, under the same stage limits as batch mode, so concurrency is bounded
+across all clients. Progress is published per job in the `log_ipc` format
+(`PROGRESS:...` lines), over Server-Sent Events or long-polling.
+
+    POST /jobs                 {"arxiv_id": "2602.04705", "deepdive": true}  -> 202 job
+    GET  /jobs                 all jobs
+    GET  /jobs/<id>            job status
+    GET  /jobs/<id>/events     SSE stream of the job's IPC lines (resumes from Last-Event-ID)
+    GET  /jobs/<id>/poll       ?since=N&timeout=S, long-polling: {"events": [...], "next": N, ...}
+    GET  /jobs/<id>/pdf        the translated PDF once completed
+    GET  /health               server and cache status
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from .main import (DEFAULT_MAX_JOBS, DEFAULT_SERVE_HOST, DEFAULT_SERVE_PORT, output_pdf_path, parse_arxiv_id,
+                   process_paper, write_metrics)
+from .metrics import get_metrics
+from .logging_utils import logger, ipc_sink, ipc_tag
+
+# Finished jobs kept for status queries
+MAX_FINISHED_JOBS = 1000
+# SSE comment sent when a job has been quiet this long, so proxies keep the stream open
+KEEPALIVE_SECONDS = 15.0
+MAX_POLL_SECONDS = 60.0
+
+# Per-job overrides of the server's command-line options, with their types
+JOB_OPTIONS = {
+    "deepdive": bool,
+    "deepdive_budget": int,
+    "all_tex": bool,
+    "no_incremental": bool,
+    "repair_rounds": int,
+    "keep": bool,
+}
+
+
+def parse_job_options(payload: dict) -> dict:
+    """Validates the per-job options of a submission. Raises ValueError on unknown or mistyped options."""
+    options = {}
+    for name, value in payload.items():
+        if name in ("arxiv_id", "url"):
+            continue
+        kind = JOB_OPTIONS.get(name)
+        if kind is None:
+            raise ValueError(f"Unknown option {name!r}")
+        # bool is an int subclass; do not accept true as a token budget
+        if value is not None and (not isinstance(value, kind) or (kind is int and isinstance(value, bool))):
+            raise ValueError(f"Option {name!r} must be {kind.__name__}")
+        options[name] = value
+    return options
+
+
+class Job:
+    """
+    One submitted paper: its state ('queued', 'running', 'completed', 'failed')
+    and the IPC lines it emitted. Thread-safe; HTTP handlers wait on it while
+    the event loop thread appends to it.
+    """
+
+    def __init__(self, arxiv_id: str, options: dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.arxiv_id = arxiv_id
+        self.options = options
+        self.state = "queued"
+        self.events: List[str] = []
+        self.pdf: Optional[str] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("completed", "failed")
+
+    def emit(self, message: str):
+        with self._changed:
+            self.events.append(message)
+            self._changed.notify_all()
+
+    def start(self):
+        with self._changed:
+            self.state = "running"
+            self.started = time.time()
+            self._changed.notify_all()
+
+    def finish(self, ok: bool, pdf: Optional[str] = None):
+        with self._changed:
+            self.state = "completed" if ok else "failed"
+            self.pdf = pdf if ok else None
+            self.finished = time.time()
+            self._changed.notify_all()
+
+    def wait_events(self, since: int, timeout: float) -> Tuple[List[str], bool]:
+        """Waits up to `timeout` seconds for events after the first `since`. Returns them and whether the job is done."""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > since or self.done, timeout)
+            return self.events[since:], self.done
+
+    def to_dict(self) -> dict:
+        with self._changed:
+            return {
+                "id": self.id,
+                "arxiv_id": self.arxiv_id,
+                "options": self.options,
+                "state": self.state,
+                "events": len(self.events),
+                "last_event": self.events[-1] if self.events else None,
+                "submitted": self.submitted,
+                "started": self.started,
+                "finished": self.finished,
+                "pdf": self.pdf,
+            }
+
+
+class TranslationServer:
+    """
+    HTTP front end and job queue around process_paper.
+
+    Args:
+        args: The parsed command-line options; jobs run with a copy updated with their own options.
+        translator: The shared GeminiTranslator.
+        analyzer: The shared DeepDiveAnalyzer, used by jobs with deepdive set (None to refuse them).
+        model_name: Model of the translator (used for output file names).
+        store: Shared e-print mirror, if enabled.
+        memory: Shared translation memory, if enabled.
+        context_cache: Shared ContextCache, released when the server stops.
+        cache: The TranslationCache, reported by /health.
+        max_jobs (int): Papers admitted at once; later submissions are queued. Each
+            stage is further limited by the batch worker options.
+    """
+
+    def __init__(self, args, translator, analyzer, model_name: str, store=None, memory=None, context_cache=None,
+                 cache=None, host: str = DEFAULT_SERVE_HOST, port: int = DEFAULT_SERVE_PORT,
+                 max_jobs: int = DEFAULT_MAX_JOBS):
+        self.args = args
+        self.translator = translator
+        self.analyzer = analyzer
+        self.model_name = model_name
+        self.store = store
+        self.memory = memory
+        self.context_cache = context_cache
+        self.cache = cache
+        self.jobs: Dict[str, Job] = {}
+        self._jobs_lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = None
+        self._http_thread = None
+        # Created here but only used on the loop thread
+        self._job_slots = asyncio.Semaphore(max(1, max_jobs))
+        self._stage_limits = {
+            "download": asyncio.Semaphore(max(1, args.download_workers)),
+            "translate": asyncio.Semaphore(max(1, args.translate_workers)),
+            "compile": asyncio.Semaphore(max(1, args.compile_workers)),
+        }
+        # Jobs for the same paper share a workspace, so they run one after another
+        self._paper_locks: Dict[str, asyncio.Lock] = {}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "TranslationServer":
+        """Starts the event loop and the HTTP server in background threads."""
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="jobs", daemon=True)
+        self._loop_thread.start()
+        self._http_thread = threading.Thread(target=self._httpd.serve_forever, name="http", daemon=True)
+        self._http_thread.start()
+        logger.info(f"Serving on {self.url} (model {self.model_name})")
+        return self
+
+    def serve_forever(self):
+        """Runs until interrupted (Ctrl-C), then stops."""
+        self.start()
+        try:
+            self._http_thread.join()
+        except KeyboardInterrupt:
+            logger.info("Shutting down.")
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self.context_cache is not None:
+            # Handles belong to the loop's client sessions; delete them there
+            asyncio.run_coroutine_threadsafe(self.context_cache.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def submit(self, arxiv_id: str, options: dict) -> Tuple[Job, bool]:
+        """
+        Queues a paper. A paper already queued or running with the same options
+        is not translated twice: its job is returned instead.
+
+        Returns:
+            The job, and whether it was newly created.
+        """
+        if options.get("deepdive") and self.analyzer is None:
+            raise ValueError("DeepDive is not available on this server")
+        with self._jobs_lock:
+            for job in self.jobs.values():
+                if job.arxiv_id == arxiv_id and job.options == options and not job.done:
+                    return job, False
+            job = Job(arxiv_id, options)
+            self.jobs[job.id] = job
+            self._forget_finished_jobs()
+        asyncio.run_coroutine_threadsafe(self._run(job), self._loop)
+        return job, True
+
+    def _forget_finished_jobs(self):
+        finished = [job for job in self.jobs.values() if job.done]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id]
+            # Each job has its own PDF; nobody can ask for it any more
+            if job.pdf and os.path.exists(job.pdf):
+                os.remove(job.pdf)
+
+    def job_args(self, job: Job) -> argparse.Namespace:
+        """The server's options with the job's overrides applied."""
+        return argparse.Namespace(**{**vars(self.args), **job.options})
+
+    async def _run(self, job: Job):
+        lock = self._paper_locks.setdefault(job.arxiv_id, asyncio.Lock())
+        # The paper lock first: a job waiting for an earlier one of the same
+        # paper must not hold one of the max_jobs slots meanwhile
+        async with lock, self._job_slots:
+            # Context variables are copied into this job's tasks and worker threads
+            ipc_tag.set(job.arxiv_id)
+            ipc_sink.set(job.emit)
+            job.start()
+            args = self.job_args(job)
+            analyzer = self.analyzer if args.deepdive else None
+            # Jobs for one paper may differ in options; each keeps its own PDF
+            stem, ext = os.path.splitext(output_pdf_path(job.arxiv_id, self.model_name, args.output, batch=True))
+            final_pdf = f"{stem}_{job.id}{ext}"
+            ok = False
+            try:
+                ok = await process_paper(job.arxiv_id, args, self.translator, analyzer, final_pdf,
+                                         self._stage_limits, self.store, self.memory)
+                metrics = get_metrics()
+                write_metrics(metrics, job.arxiv_id, paper=job.arxiv_id)
+                metrics.discard(job.arxiv_id)
+            except Exception as e:
+                logger.error(f"Job {job.id} ({job.arxiv_id}) failed: {e}", exc_info=True)
+            finally:
+                if not ok and os.path.exists(final_pdf):
+                    os.remove(final_pdf)
+                job.finish(ok, os.path.abspath(final_pdf))
+        with self._jobs_lock:
+            waiting = any(other.arxiv_id == job.arxiv_id and not other.done for other in self.jobs.values())
+        if not waiting:
+            self._paper_locks.pop(job.arxiv_id, None)
+
+    def health(self) -> dict:
+        with self._jobs_lock:
+            jobs = list(self.jobs.values())
+        states = {}
+        for job in jobs:
+            states[job.state] = states.get(job.state, 0) + 1
+        return {
+            "status": "ok",
+            "model": self.model_name,
+            "deepdive": self.analyzer is not None,
+            "jobs": states,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                logger.debug(f"{self.address_string()} {format % args}")
+
+            def do_POST(self):
+                if urlsplit(self.path).path.rstrip("/") != "/jobs":
+                    return self._send_json(404, {"error": "Not found"})
+                try:
+                    payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                    source = payload.get("arxiv_id") or payload.get("url") if isinstance(payload, dict) else None
+                    if not source:
+                        raise ValueError("Missing arxiv_id")
+                    job, created = server.submit(parse_arxiv_id(source), parse_job_options(payload))
+                except ValueError as e:
+                    return self._send_json(400, {"error": str(e)})
+                self._send_json(202 if created else 200, job.to_dict())
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                parts = [p for p in url.path.split("/") if p]
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                if parts == ["health"]:
+                    return self._send_json(200, server.health())
+                if parts == ["jobs"]:
+                    with server._jobs_lock:
+                        jobs = list(server.jobs.values())
+                    return self._send_json(200, {"jobs": [job.to_dict() for job in jobs]})
+                if len(parts) not in (2, 3) or parts[0] != "jobs":
+                    return self._send_json(404, {"error": "Not found"})
+                job = server.jobs.get(parts[1])
+                if job is None:
+                    return self._send_json(404, {"error": f"Unknown job {parts[1]}"})
+                action = parts[2] if len(parts) == 3 else None
+                try:
+                    if action is None:
+                        return self._send_json(200, job.to_dict())
+                    if action == "events":
+                        return self._send_events(job)
+                    if action == "poll":
+                        return self._poll(job, int(query.get("since", 0)), float(query.get("timeout", 30)))
+                    if action == "pdf":
+                        return self._send_pdf(job)
+                except ValueError as e:
+                    return self._send_json(400, {"error": str(e)})
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+                self._send_json(404, {"error": "Not found"})
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=UTF-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _poll(self, job, since, timeout):
+                events, done = job.wait_events(max(0, since), min(max(0.0, timeout), MAX_POLL_SECONDS))
+                self._send_json(200, {"events": events, "next": max(0, since) + len(events),
+                                      "state": job.state, "done": done})
+
+            def _send_events(self, job):
+                # Event ids are positions, so a reconnecting EventSource resumes where it stopped
+                last_id = self.headers.get("Last-Event-ID")
+                position = int(last_id) + 1 if last_id and last_id.isdigit() else 0
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream; charset=UTF-8")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                while True:
+                    events, done = job.wait_events(position, KEEPALIVE_SECONDS)
+                    lines = []
+                    for message in events:
+                        data = "".join(f"data: {line}\n" for line in message.splitlines() or [""])
+                        lines.append(f"id: {position}\n{data}\n")
+                        position += 1
+                    if done and not events:
+                        state = json.dumps(job.to_dict(), ensure_ascii=False)
+                        lines.append(f"event: end\ndata: {state}\n\n")
+                    elif not events:
+                        lines.append(": keepalive\n\n")
+                    self.wfile.write("".join(lines).encode("utf-8"))
+                    self.wfile.flush()
+                    if done and not events:
+                        return
+
+            def _send_pdf(self, job):
+                if job.state != "completed" or not job.pdf or not os.path.exists(job.pdf):
+                    return self._send_json(409, {"error": f"No PDF for job in state {job.state}"})
+                with open(job.pdf, "rb") as f:
+                    data = f.read()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/pdf")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(job.pdf)}"')
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
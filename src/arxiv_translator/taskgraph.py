@@ -0,0 +1,48 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Tuple
+
+
+class TaskGraph:
+    """
+    Runs async jobs as soon as the jobs they depend on have finished, instead
+    of stage by stage (e.g. a file's DeepDive right after its translation,
+    while other files are still being translated).
+
+    Jobs are started in the order they were added, so jobs without pending
+    dependencies reach shared semaphores in that order. A job whose dependency
+    raised is not run and fails with the same exception.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[Hashable, Tuple[Callable[[], Awaitable[Any]], List[Hashable]]] = {}
+
+    def add(self, name: Hashable, job: Callable[[], Awaitable[Any]], deps: Iterable[Hashable] = ()):
+        """Adds `job` (a coroutine function) to run after `deps`, which must have been added before."""
+        deps = list(deps)
+        for dep in deps:
+            if dep not in self._jobs:
+                raise ValueError(f"Unknown dependency {dep!r} of {name!r}")
+        if name in self._jobs:
+            raise ValueError(f"Duplicate job {name!r}")
+        self._jobs[name] = (job, deps)
+
+    async def run(self) -> Tuple[Dict[Hashable, Any], Dict[Hashable, BaseException]]:
+        """Runs every job. Returns the results of the jobs that succeeded and the errors of the others."""
+        tasks: Dict[Hashable, asyncio.Task] = {}
+
+        async def run_job(job, deps):
+            for dep in deps:
+                await tasks[dep]
+            return await job()
+
+        for name, (job, deps) in self._jobs.items():
+            tasks[name] = asyncio.create_task(run_job(job, deps))
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        results, errors = {}, {}
+        for name, task in tasks.items():
+            if task.exception() is not None:
+                errors[name] = task.exception()
+            else:
+                results[name] = task.result()
+        return results, errors
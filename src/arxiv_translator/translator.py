@@ -1,16 +1,42 @@
 from google import genai
 from google.genai import types
+import asyncio
 import os
 import re
-import time
+from typing import AsyncIterator, List, Optional
+from .cache import TranslationCache
+from .context_cache import ContextCache
+from .glossary import current_glossary
+from .segmenter import DEFAULT_CHUNK_CONCURRENCY, DEFAULT_CHUNK_TOKENS, estimate_tokens, markup_signature, segment_latex, split_segments
+from .ratelimit import AdaptiveRateLimiter, get_rate_limiter, retry_delay
+from .metrics import MetricsRecorder, get_metrics, record_fallback
 from .logging_utils import logger
 
 class GeminiTranslator:
-    def __init__(self, api_key: str, model_name: str = "gemini-3-flash-preview"): 
+    def __init__(self, api_key: str, model_name: str = "gemini-3-flash-preview", cache: Optional[TranslationCache] = None,
+                 chunk_tokens: int = DEFAULT_CHUNK_TOKENS, client: Optional[genai.Client] = None,
+                 rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 chunk_concurrency: int = DEFAULT_CHUNK_CONCURRENCY,
+                 metrics: Optional[MetricsRecorder] = None,
+                 context_cache: Optional[ContextCache] = None):
         self.api_key = api_key
         # Default to Gemini 3 Flash Preview as per docs
         self.model_name = model_name
-        self.client = genai.Client(api_key=self.api_key, http_options={'api_version': 'v1beta', 'timeout': 600000})
+        self.temperature = 0.1
+        # Optional persistent cache, consulted before every generate_content call
+        self.cache = cache
+        # Token budget per chunk when a file has to be split
+        self.chunk_tokens = chunk_tokens
+        # Chunks of one file translated at the same time
+        self.chunk_concurrency = chunk_concurrency
+        # Requests/min, tokens/min and AIMD concurrency, shared per model with DeepDive
+        self.rate_limiter = rate_limiter or get_rate_limiter(model_name)
+        # Tokens, latency, retries and fallbacks of every request
+        self.metrics = metrics or get_metrics()
+        # Optional Gemini cached-content handles for the system instruction
+        self.context_cache = context_cache
+        # A single client can be shared by many concurrent requests (see engine.py)
+        self.client = client or genai.Client(api_key=self.api_key, http_options={'api_version': 'v1beta', 'timeout': 600000})
 
     @property
     def _system_prompt(self) -> str:
@@ -31,91 +57,309 @@ CRITICAL RULES:
 """
 
     def translate_latex(self, latex_content: str) -> str:
+        """
+        Synchronous wrapper around translate_latex_async for one-off use.
+        Must not be called from a running event loop.
+        """
+        return asyncio.run(self.translate_latex_async(latex_content))
+
+    async def translate_latex_async(self, latex_content: str, refresh: bool = False) -> str:
         """
         Translates LaTeX content from English to Chinese using Gemini.
         Preserves LaTeX structure.
+
+        With `refresh`, a cached translation is ignored (and replaced), e.g.
+        when it turned out not to compile.
         """
         # Gemini Flash has 1M context, so we can probably send the whole file or large chunks.
         # But for valid JSON/Request limits, maybe chunking is safer? 
         # 1M context is huge. We can sending whole files usually.
         
+        cached = None if refresh else await self._cache_lookup(latex_content)
+        if cached is not None:
+            return cached
+
         try:
             max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    response = self.client.models.generate_content(
-                        model=self.model_name,
-                        config=types.GenerateContentConfig(
-                            system_instruction=self._system_prompt,
-                            temperature=0.1, 
-                        ),
-                        contents=[latex_content]
-                    )
+                    response = await self._generate(latex_content)
                     
                     if response.text:
                         cleaned = self._clean_output(response.text)
+                        await self._cache_store(latex_content, cleaned)
                         return cleaned
                 except Exception as e:
                     logger.warning(f"Translation attempt {attempt+1} failed: {e}")
-                    if attempt < max_retries - 1:
-                        time.sleep(2 * (attempt + 1))
+                    delay = retry_delay(e, attempt)
+                    if delay is not None and attempt < max_retries - 1:
+                        self.metrics.count("retry", self.model_name)
+                        await asyncio.sleep(delay)
                     else:
-                        logger.warning("Max retries reached. Attempting to chunk...")
-                        return self._translate_large_latex(latex_content)
+                        # Non-retryable errors (e.g. request too large) go straight to chunking
+                        logger.warning("Giving up on single request. Attempting to chunk...")
+                        self.metrics.count("chunked", self.model_name)
+                        return await self._translate_large_latex(latex_content, refresh=refresh)
             
+            record_fallback("file")
             return latex_content
             
         except Exception as e:
             logger.error(f"Translation error after retries: {e}")
+            record_fallback("file")
             return latex_content
 
-    def _translate_large_latex(self, content: str, chunk_size=150) -> str:
-        """Splits content into chunks of ~chunk_size lines and translates them."""
-        lines = content.split('\n')
-        chunks = []
-        current_chunk = []
-        
-        for line in lines:
-            current_chunk.append(line)
-            if len(current_chunk) >= chunk_size:
-                chunks.append('\n'.join(current_chunk))
-                current_chunk = []
-        if current_chunk:
-            chunks.append('\n'.join(current_chunk))
-            
-        translated_chunks = []
-        logger.info(f"Split content into {len(chunks)} chunks for translation.")
-        
-        for i, chunk in enumerate(chunks):
-            logger.debug(f"Translating chunk {i+1}/{len(chunks)}...")
+    async def translate_latex_chunked(self, latex_content: str, max_tokens: Optional[int] = None) -> str:
+        """
+        Translates a large file as chunks of at most ~max_tokens tokens sent
+        concurrently, instead of one long request (see scheduler.py).
+        """
+        cached = await self._cache_lookup(latex_content)
+        if cached is not None:
+            return cached
+        return await self._translate_large_latex(latex_content, max_tokens)
+
+    async def revise_translation(self, old_source: str, old_translation: str, new_source: str,
+                                 max_retries: int = 3) -> str:
+        """
+        Translates `new_source` by editing the translation of a near-identical
+        segment (see memory.py); the model only has to carry over the edits.
+        Falls back to a regular translation if the request fails.
+        """
+        request = (
+            "The following LaTeX segment was translated before:\n"
+            f"<previous_source>\n{old_source}\n</previous_source>\n"
+            f"<previous_translation>\n{old_translation}\n</previous_translation>\n\n"
+            "Below is a slightly different version of the segment. Edit the previous translation "
+            "so that it matches the new version exactly, changing as little as possible. "
+            "Output ONLY the translated LaTeX of the new version.\n"
+            f"<source>\n{new_source}\n</source>"
+        )
+        cached = await self._cache_lookup(request)
+        if cached is not None:
+            return cached
+
+        for attempt in range(max_retries):
             try:
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    config=types.GenerateContentConfig(
-                        system_instruction=self._system_prompt,
-                        temperature=0.1, 
-                    ),
-                    contents=[chunk]
-                )
+                response = await self._generate(request)
                 if response.text:
                     cleaned = self._clean_output(response.text)
-                    translated_chunks.append(cleaned)
-                else:
-                    # Fallback: Use original chunk but still clean comments
-                    cleaned_fallback = self._clean_output(chunk)
-                    translated_chunks.append(cleaned_fallback)
+                    await self._cache_store(request, cleaned)
+                    return cleaned
+                break
             except Exception as e:
-                logger.error(f"Chunk {i+1} failed: {e}")
-                # Fallback: Use original chunk but still clean comments
-                cleaned_fallback = self._clean_output(chunk)
-                translated_chunks.append(cleaned_fallback)
+                logger.warning(f"Revision attempt {attempt+1} failed: {e}")
+                delay = retry_delay(e, attempt)
+                if delay is None or attempt == max_retries - 1:
+                    break
+                self.metrics.count("retry", self.model_name)
+                await asyncio.sleep(delay)
+
+        return await self.translate_latex_async(new_source)
+
+    async def translate_latex_stream(self, latex_content: str, sink=None, max_retries: int = 3) -> str:
+        """
+        Streaming variant of translate_latex_async.
+
+        `sink` (optional) receives the output as it arrives: `sink.write(text)`
+        for each new piece and `sink.reset(text)` when a broken stream is
+        resumed and the output so far is replaced by its complete part.
+
+        If the stream breaks, the translated segments received in full are kept
+        and only the remaining source segments are sent again. This assumes the
+        model keeps the paragraph/section structure, as the prompt requires;
+        if the received segments do not line up with the source (see
+        _stream_aligned), the whole file is sent again instead.
+        """
+        cached = await self._cache_lookup(latex_content)
+        if cached is not None:
+            if sink is not None:
+                sink.write(cached)
+            return cached
+
+        segments = split_segments(latex_content)
+        start = 0
+        done = []
+
+        for attempt in range(max_retries):
+            received = []
+            try:
+                async for piece in self._generate_stream('\n'.join(segments[start:])):
+                    received.append(piece)
+                    if sink is not None:
+                        sink.write(piece)
+                text = self._clean_output(''.join(received))
+                if not text:
+                    break
+                translated = '\n'.join(done + [text])
+                await self._cache_store(latex_content, translated)
+                return translated
+            except Exception as e:
+                partial = re.sub(r"^```(?:latex)?[ \t]*\n", "", ''.join(received))
+                # The last segment may have been cut off mid-sentence
+                complete = split_segments(partial)[:-1]
+                if complete and not self._stream_aligned(segments[start:], complete):
+                    # Splicing would duplicate or drop content, so start over
+                    logger.warning(f"Stream broke ({e}) and its output does not line up with the source "
+                                   "segments; restarting the file.")
+                    done, start = [], 0
+                elif complete:
+                    done.extend(complete)
+                    start += len(complete)
+                    logger.warning(f"Stream broke after {start}/{len(segments)} segments ({e}); resuming from there.")
+                else:
+                    logger.warning(f"Stream attempt {attempt+1} failed: {e}")
+                if sink is not None:
+                    sink.reset('\n'.join(done) + '\n' if done else '')
+                if start >= len(segments):
+                    return '\n'.join(done)
+                delay = retry_delay(e, attempt)
+                if delay is None or attempt == max_retries - 1:
+                    break
+                self.metrics.count("retry", self.model_name)
+                await asyncio.sleep(delay)
+
+        logger.warning("Streaming did not complete. Translating the rest in chunks...")
+        self.metrics.count("chunked", self.model_name)
+        rest = await self._translate_large_latex('\n'.join(segments[start:]))
+        return '\n'.join(done + [rest])
+
+    @staticmethod
+    def _stream_aligned(sources: List[str], translated: List[str]) -> bool:
+        """
+        Whether the complete segments of a broken stream translate the first
+        len(translated) source segments one to one: no more of them than were
+        sent, and the same markup in each pair (see markup_signature). Merged
+        or split segments of plain prose without markup go unnoticed.
+        """
+        if len(translated) > len(sources):
+            return False
+        return all(markup_signature(source) == markup_signature(text)
+                   for source, text in zip(sources, translated))
+
+    async def _translate_large_latex(self, content: str, max_tokens: Optional[int] = None,
+                                     refresh: bool = False) -> str:
+        """
+        Splits content at section/paragraph boundaries into chunks of at most
+        ~max_tokens tokens and translates them (ignoring cached chunks with
+        `refresh`).
+        """
+        chunks = segment_latex(content, max_tokens or self.chunk_tokens)
             
-            # Rate limiting for Pro model to avoid overloading
-            if "pro" in self.model_name.lower():
-                time.sleep(2)  # 2 seconds delay between chunks
+        logger.info(f"Split content into {len(chunks)} chunks for translation.")
+
+        # Chunks are independent, so translate them concurrently; gather keeps their order
+        semaphore = asyncio.Semaphore(max(1, self.chunk_concurrency))
+
+        async def run(i, chunk):
+            async with semaphore:
+                logger.debug(f"Translating chunk {i+1}/{len(chunks)}...")
+                return await self._translate_chunk(chunk, i, refresh=refresh)
+
+        translated_chunks = await asyncio.gather(*(run(i, chunk) for i, chunk in enumerate(chunks)))
                 
         return '\n'.join(translated_chunks)
 
+    async def _translate_chunk(self, chunk: str, index: int, max_retries: int = 3, refresh: bool = False) -> str:
+        """Translates one chunk, falling back to the (cleaned) original on failure."""
+        # Chunks usually end with the blank line that separates them from the next
+        # paragraph; the model (and _clean_output) drop it, so put it back.
+        trailing = chunk[len(chunk.rstrip('\n')):]
+
+        cached = None if refresh else await self._cache_lookup(chunk)
+        if cached is not None:
+            return cached.rstrip('\n') + trailing
+
+        for attempt in range(max_retries):
+            try:
+                response = await self._generate(chunk)
+                if response.text:
+                    cleaned = self._clean_output(response.text)
+                    await self._cache_store(chunk, cleaned)
+                    return cleaned.rstrip('\n') + trailing
+                break
+            except Exception as e:
+                logger.error(f"Chunk {index+1} failed: {e}")
+                delay = retry_delay(e, attempt)
+                if delay is None or attempt == max_retries - 1:
+                    break
+                self.metrics.count("retry", self.model_name)
+                await asyncio.sleep(delay)
+
+        # Fallback: Use original chunk but still clean comments
+        self.metrics.count("chunk_fallback", self.model_name)
+        record_fallback("chunk")
+        return self._clean_output(chunk).rstrip('\n') + trailing
+
+    async def _config(self) -> types.GenerateContentConfig:
+        # The paper's glossary (if any) rides along with the system prompt; it is
+        # left out of the translation cache key, as it only steers terminology
+        instruction = self._system_prompt + current_glossary.get()
+        if self.context_cache is not None:
+            cached_content = await self.context_cache.get(self.model_name, instruction)
+            if cached_content is not None:
+                return types.GenerateContentConfig(cached_content=cached_content, temperature=self.temperature)
+        return types.GenerateContentConfig(
+            system_instruction=instruction,
+            temperature=self.temperature, 
+        )
+
+    def _invalidate_context(self, config: types.GenerateContentConfig, exc: Exception):
+        # An expired or deleted handle fails for good; recreate it on the next attempt
+        if config.cached_content and self.context_cache is not None:
+            self.context_cache.invalidate(config.cached_content, exc)
+
+    async def _generate(self, text: str):
+        """Sends one generate_content request through the model's rate limiter."""
+        config = await self._config()
+        async with self.rate_limiter.slot(estimate_tokens(text)):
+            with self.metrics.measure(self.model_name) as record:
+                try:
+                    response = await self.client.aio.models.generate_content(
+                        model=self.model_name,
+                        config=config,
+                        contents=[text]
+                    )
+                except Exception as e:
+                    self._invalidate_context(config, e)
+                    raise
+                record(response)
+                return response
+
+    async def _generate_stream(self, text: str) -> AsyncIterator[str]:
+        """Streams the response text for one request; holds a rate limiter slot until done."""
+        config = await self._config()
+        async with self.rate_limiter.slot(estimate_tokens(text)):
+            with self.metrics.measure(self.model_name) as record:
+                try:
+                    stream = await self.client.aio.models.generate_content_stream(
+                        model=self.model_name,
+                        config=config,
+                        contents=[text]
+                    )
+                except Exception as e:
+                    self._invalidate_context(config, e)
+                    raise
+                async for chunk in stream:
+                    # The last chunk's usage_metadata covers the whole response
+                    record(chunk)
+                    if chunk.text:
+                        yield chunk.text
+
+    async def _cache_lookup(self, text: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        key = TranslationCache.make_key(text, self.model_name, self._system_prompt, self.temperature)
+        # SQLite I/O off the event loop, so other requests keep streaming meanwhile
+        return await asyncio.to_thread(self.cache.get, key)
+
+    async def _cache_store(self, text: str, translated: str):
+        # Only successful model outputs are cached, never the English fallbacks
+        if self.cache is None:
+            return
+        key = TranslationCache.make_key(text, self.model_name, self._system_prompt, self.temperature)
+        await asyncio.to_thread(self.cache.put, key, translated)
+
     def _clean_output(self, text: str) -> str:
         # Remove ```latex ... ``` or ``` ... ```
         pattern = r"^```(?:latex)?\s*(.*?)\s*```$"
@@ -0,0 +1,172 @@
+import difflib
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from .compiler import TECTONIC_LOG_SUFFIX
+from .engine import strip_latex_comments, postprocess_translation
+from .incremental import TranslationManifest
+from .metrics import metrics_context
+from .segmenter import split_segments
+from .logging_utils import logger
+
+# Tectonic reports errors as "error: intro.tex:42: Undefined control sequence";
+# TeX's -file-line-error style is "./intro.tex:42: Undefined control sequence"
+ERROR_PATTERN = re.compile(r'^(?:error: )?(?:\./)?(?P<file>[^\s:][^:\n]*\.tex):(?P<line>\d+): (?P<message>.+)$', re.MULTILINE)
+
+# LaTeX commands and environments survive translation, so they line up the
+# segments of a translated file with those of its English source
+SIGNATURE_PATTERN = re.compile(r'\\(?:begin|end)\{[^}]*\}|\\[a-zA-Z@]+')
+
+DEFAULT_REPAIR_ROUNDS = 2
+
+
+class CompileError:
+    """One error from the Tectonic output: file (relative to the build dir), line and message."""
+
+    def __init__(self, file: str, line: int, message: str):
+        self.file = file
+        self.line = line
+        self.message = message
+
+    def __repr__(self):
+        return f"CompileError({self.file}:{self.line}: {self.message})"
+
+
+def parse_compile_errors(output: str) -> List[CompileError]:
+    """Extracts the file:line errors from Tectonic's output, without duplicates, in order."""
+    errors = []
+    seen = set()
+    for match in ERROR_PATTERN.finditer(output):
+        key = (os.path.normpath(match.group("file")), int(match.group("line")))
+        if key not in seen:
+            seen.add(key)
+            errors.append(CompileError(key[0], key[1], match.group("message").strip()))
+    return errors
+
+
+def read_compile_errors(source_dir: str, main_tex_file: str) -> List[CompileError]:
+    """Parses the log compile_pdf kept for the last build of `main_tex_file`."""
+    stem = os.path.splitext(os.path.basename(main_tex_file))[0]
+    try:
+        with open(os.path.join(source_dir, stem + TECTONIC_LOG_SUFFIX), "r", encoding="utf-8", errors="replace") as f:
+            return parse_compile_errors(f.read())
+    except OSError:
+        return []
+
+
+def segment_at_line(segments: List[str], line: int) -> Optional[int]:
+    """Index of the segment containing 1-based `line` of '\\n'.join(segments)."""
+    start = 1
+    for index, segment in enumerate(segments):
+        end = start + segment.count('\n')
+        if start <= line <= end:
+            return index
+        start = end + 1
+    return None
+
+
+def align_segments(translated: List[str], source: List[str]) -> Dict[int, int]:
+    """
+    Maps segment indices of a translated file to those of its English source.
+    Positional when the counts agree, otherwise by matching the LaTeX commands
+    each segment contains.
+    """
+    if len(translated) == len(source):
+        return {i: i for i in range(len(translated))}
+
+    def signature(segment):
+        return tuple(SIGNATURE_PATTERN.findall(segment))
+
+    matcher = difflib.SequenceMatcher(None, [signature(s) for s in translated],
+                                      [signature(s) for s in source], autojunk=False)
+    mapping = {}
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal" or (tag == "replace" and i2 - i1 == j2 - j1):
+            for offset in range(i2 - i1):
+                mapping[i1 + offset] = j1 + offset
+    return mapping
+
+
+class SegmentRepairer:
+    """
+    Fixes the translated segments that break compilation, one segment at a time:
+    the first time a segment fails it is re-translated (bypassing the cache),
+    the second time the original English is put back.
+    """
+
+    def __init__(self, translator, build_root: str, source_root: str, main_tex_path: str,
+                 manifest: Optional[TranslationManifest] = None):
+        self.translator = translator
+        self.build_root = build_root
+        self.source_root = source_root
+        self.main_tex_path = main_tex_path
+        self.manifest = manifest
+        # (file, English segment) -> number of repairs so far
+        self.attempts: Dict[Tuple[str, str], int] = {}
+
+    async def repair(self, errors: List[CompileError]) -> int:
+        """Repairs the segments behind `errors`. Returns how many segments were changed."""
+        by_file: Dict[str, List[CompileError]] = {}
+        for error in errors:
+            by_file.setdefault(error.file, []).append(error)
+
+        repaired = 0
+        for rel_path, file_errors in by_file.items():
+            repaired += await self._repair_file(rel_path, file_errors)
+        return repaired
+
+    async def _repair_file(self, rel_path: str, errors: List[CompileError]) -> int:
+        file_path = os.path.join(self.build_root, rel_path)
+        source_path = os.path.join(self.source_root, rel_path)
+        if not os.path.exists(file_path) or not os.path.exists(source_path):
+            logger.warning(f"Cannot repair {rel_path}: not a translated file.")
+            return 0
+
+        with open(file_path, "r", encoding="utf-8") as f:
+            segments = split_segments(f.read())
+        with open(source_path, "r", encoding="utf-8") as f:
+            english = split_segments(strip_latex_comments(f.read()))
+        mapping = align_segments(segments, english)
+
+        repaired = 0
+        for index in sorted({segment_at_line(segments, e.line) for e in errors} - {None}):
+            if index not in mapping:
+                logger.warning(f"Cannot map {rel_path} segment {index + 1} back to its English source.")
+                continue
+            original = english[mapping[index]]
+            if segments[index] == original:
+                continue
+            key = (rel_path, original)
+            attempt = self.attempts.get(key, 0)
+            self.attempts[key] = attempt + 1
+            if attempt == 0:
+                logger.info(f"Re-translating segment {index + 1} of {rel_path} that broke compilation.")
+                with metrics_context(stage="repair", file=rel_path):
+                    translated = await self.translator.translate_latex_async(original, refresh=True)
+                trailing = original[len(original.rstrip('\n')):]
+                replacement = translated.rstrip('\n') + trailing
+            elif attempt == 1:
+                logger.info(f"Reverting segment {index + 1} of {rel_path} to the English original.")
+                replacement = original
+            else:
+                continue
+            if replacement == segments[index]:
+                continue
+            segments[index] = replacement
+            repaired += 1
+
+        if repaired:
+            # Post-process the whole file, not just the new segments: replacing
+            # main.tex's \begin{document} segment drops the ctex injection,
+            # which only fires with the \documentclass of another segment in view
+            text = postprocess_translation('\n'.join(segments), file_path, self.main_tex_path)
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            self._update_manifest(rel_path)
+        return repaired
+
+    def _update_manifest(self, rel_path: str):
+        # The manifest feeds the next version's incremental translation; drop
+        # the entry rather than keep a translation known not to compile
+        if self.manifest is not None and rel_path in self.manifest.entries:
+            del self.manifest.entries[rel_path]
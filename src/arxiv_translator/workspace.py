@@ -0,0 +1,108 @@
+import os
+import shutil
+from typing import Iterable
+from .compiler import BUILD_OUTPUT_SUFFIXES
+from .logging_utils import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl that makes a copy-on-write clone of a file (btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+# Files the pipeline (translation, DeepDive, Tectonic) may rewrite in place.
+# They get private copies; everything else (figures, data, styles) is linked.
+WRITABLE_SUFFIXES = (".tex",) + BUILD_OUTPUT_SUFFIXES
+
+def _reflink(src: str, dst: str) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        shutil.copystat(src, dst)
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+def copy_file(src: str, dst: str):
+    """Private copy of `src`: a reflink where the filesystem supports it, else a real copy."""
+    if not _reflink(src, dst):
+        shutil.copy2(src, dst)
+
+def link_file(src: str, dst: str):
+    """Shares `src` at `dst` with a hardlink, falling back to a symlink, then a copy."""
+    try:
+        os.link(src, dst)
+        return
+    except OSError:
+        pass
+    try:
+        os.symlink(os.path.abspath(src), dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def make_private(path: str):
+    """Replaces a linked file with its own copy so that writing it leaves the source intact."""
+    if not os.path.islink(path) and os.stat(path).st_nlink == 1:
+        return
+    tmp_path = path + ".tmp"
+    copy_file(os.path.realpath(path), tmp_path)
+    os.replace(tmp_path, path)
+
+def clone_tree(src_dir: str, dst_dir: str, writable_suffixes: Iterable[str] = WRITABLE_SUFFIXES):
+    """
+    Recreates `src_dir` at `dst_dir`, copying only the files whose name ends in
+    one of `writable_suffixes` and linking the rest.
+
+    Returns:
+        tuple: (copied, linked) file counts.
+    """
+    writable_suffixes = tuple(writable_suffixes)
+    if os.path.exists(dst_dir):
+        shutil.rmtree(dst_dir)
+
+    copied = linked = 0
+    for root, dirs, files in os.walk(src_dir):
+        target_root = os.path.join(dst_dir, os.path.relpath(root, src_dir))
+        os.makedirs(target_root, exist_ok=True)
+        for file in files:
+            src = os.path.join(root, file)
+            dst = os.path.join(target_root, file)
+            if os.path.islink(src):
+                # Keep symlinks shipped in the e-print as they are
+                os.symlink(os.readlink(src), dst)
+            elif file.lower().endswith(writable_suffixes):
+                copy_file(src, dst)
+                copied += 1
+            else:
+                link_file(src, dst)
+                linked += 1
+
+    logger.debug(f"Cloned {src_dir} to {dst_dir}: {copied} copied, {linked} linked.")
+    return copied, linked
+
+def detach_build_outputs(main_tex_path: str) -> int:
+    """
+    Makes every `<main stem>.*` file next to the main file private (see
+    make_private). The build names its outputs after the main file, so this
+    covers the ones WRITABLE_SUFFIXES does not know about, and the compile
+    can never write through a link into the original sources.
+
+    Returns:
+        int: The number of files that were detached.
+    """
+    directory = os.path.dirname(main_tex_path) or "."
+    prefix = os.path.splitext(os.path.basename(main_tex_path))[0] + "."
+    detached = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith(prefix) and os.path.isfile(path) and \
+                (os.path.islink(path) or os.stat(path).st_nlink > 1):
+            make_private(path)
+            detached += 1
+    return detached
@@ -0,0 +1,19 @@
+import os
+import tempfile
+import pytest
+
+# Logs of the test run go to a temporary directory instead of ./logs of the
+# checkout; set before any test module imports arxiv_translator.logging_utils
+os.environ.setdefault("ARXIV_TRANSLATOR_LOG_DIR", tempfile.mkdtemp(prefix="arxiv_translator_test_logs_"))
+
+@pytest.fixture(autouse=True)
+def isolated_home(tmp_path_factory, monkeypatch):
+    """
+    Points HOME at an empty directory, so tests that run main() never read or
+    write the real ~/.arxiv-translator (translation cache and memory, e-print
+    mirror, builds, API key).
+    """
+    home = tmp_path_factory.mktemp("home")
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.delenv("USERPROFILE", raising=False)
+    return home
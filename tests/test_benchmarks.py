@@ -0,0 +1,10 @@
+from benchmarks.run import run_benchmark
+
+def test_offline_benchmark_runs_pipeline():
+    result = run_benchmark(papers=2, files=2, paragraphs=2, figure_kb=1, latency=0.0, jitter=0.0,
+                           throttle_rate=0.0, tectonic_seconds=0.0)
+    assert result["exit_code"] == 0
+    assert result["succeeded"] == 2
+    # One request per .tex file: main.tex plus two sections, per paper
+    assert result["requests"] == 6
+    assert result["peak_rss_mb"] > 0
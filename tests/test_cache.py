@@ -0,0 +1,102 @@
+import asyncio
+import itertools
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+from arxiv_translator.cache import TranslationCache
+from arxiv_translator.translator import GeminiTranslator
+
+def test_cache_roundtrip(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.db"))
+    key = TranslationCache.make_key("Hello", "model", "prompt", 0.1)
+
+    assert cache.get(key) is None
+    cache.put(key, "你好")
+    assert cache.get(key) == "你好"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+def test_cache_key_depends_on_all_inputs():
+    base = TranslationCache.make_key("text", "model", "prompt", 0.1)
+    assert base != TranslationCache.make_key("text", "other-model", "prompt", 0.1)
+    assert base != TranslationCache.make_key("text", "model", "other prompt", 0.1)
+    assert base != TranslationCache.make_key("text", "model", "prompt", 0.2)
+    assert base != TranslationCache.make_key("text2", "model", "prompt", 0.1)
+
+def test_cache_lru_eviction(tmp_path):
+    # A counter instead of the wall clock, so consecutive accesses never tie
+    cache = TranslationCache(str(tmp_path / "cache.db"), max_bytes=20, clock=itertools.count().__next__)
+    cache.put("a", "x" * 10)
+    cache.put("b", "y" * 10)
+    # Touch "a" so "b" becomes the least recently used entry
+    assert cache.get("a") is not None
+    cache.put("c", "z" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "x" * 10
+    assert cache.get("c") == "z" * 10
+
+def test_size_is_tracked_without_scanning(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = TranslationCache(path, max_bytes=24, clock=itertools.count().__next__)
+    cache.put("a", "x" * 10)
+    cache.put("a", "x" * 5)
+    cache.put("b", "y" * 10)
+    cache.put("c", "z" * 10)
+
+    def table_size():
+        return cache._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    # Replacing "a" counted only its new size; "c" evicted "a" to stay within 24 bytes
+    assert cache.stats()["bytes"] == table_size() == 20
+    assert cache.get("a") is None
+
+    # A database written before the running total existed gets it computed once
+    with cache._conn:
+        cache._conn.execute("DELETE FROM counters WHERE name = 'bytes'")
+    cache.close()
+    assert TranslationCache(path, max_bytes=24).stats()["bytes"] == 20
+
+def test_hot_entries_are_served_from_memory(tmp_path):
+    cache = TranslationCache(str(tmp_path / "cache.db"), hot_entries=1)
+    cache.put("a", "x")
+    cache.put("b", "y")
+    cache._conn.execute("DELETE FROM entries WHERE key = 'b'")
+
+    # "b" is still in memory, "a" fell out and is read from disk again
+    assert cache.get("b") == "y"
+    assert cache.get("a") == "x"
+    assert cache.get("b") is None
+    assert cache.stats()["hits"] == 2
+
+@patch('arxiv_translator.translator.genai.Client')
+def test_translator_uses_cache(mock_client, tmp_path):
+    mock_response = MagicMock()
+    mock_response.text = "Translated Content"
+    mock_model = MagicMock()
+    mock_model.generate_content = AsyncMock(return_value=mock_response)
+    mock_client.return_value.aio.models = mock_model
+
+    cache = TranslationCache(str(tmp_path / "cache.db"))
+    translator = GeminiTranslator("fake_key", cache=cache)
+
+    assert translator.translate_latex("Original Content") == "Translated Content"
+    assert translator.translate_latex("Original Content") == "Translated Content"
+    mock_model.generate_content.assert_called_once()
+
+@patch('arxiv_translator.translator.genai.Client')
+def test_refresh_skips_cached_chunks(mock_client, tmp_path):
+    # The whole-file request is rejected (400), so the file falls back to chunks
+    rejected = Exception("request too large")
+    rejected.code = 400
+    fixed = MagicMock()
+    fixed.text = "Fixed"
+    mock_client.return_value.aio.models.generate_content = AsyncMock(side_effect=[rejected, fixed])
+
+    cache = TranslationCache(str(tmp_path / "cache.db"))
+    translator = GeminiTranslator("fake_key", cache=cache)
+    asyncio.run(translator._cache_store("Original", "Broken"))
+
+    assert asyncio.run(translator.translate_latex_async("Original", refresh=True)) == "Fixed"
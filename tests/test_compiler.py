@@ -0,0 +1,100 @@
+import os
+from unittest.mock import patch, MagicMock
+from arxiv_translator.compiler import compile_pdf, compile_preflight, compute_fingerprint
+
+def fake_tectonic(cmd, cwd, **kwargs):
+    with open(os.path.join(cwd, "main.pdf"), "w") as f:
+        f.write("pdf")
+    with open(os.path.join(cwd, "main.aux"), "w") as f:
+        f.write("aux")
+    return MagicMock(returncode=0, stdout="", stderr="")
+
+def make_tree(path, text):
+    path.mkdir(exist_ok=True)
+    (path / "main.tex").write_text(text)
+    (path / "fig.png").write_bytes(b"png")
+
+def test_compile_skipped_when_sources_unchanged(tmp_path):
+    state_dir = str(tmp_path / "state")
+    make_tree(tmp_path / "build1", "你好")
+    with patch("arxiv_translator.compiler.subprocess.run", side_effect=fake_tectonic) as run:
+        compile_pdf(str(tmp_path / "build1"), "main.tex", state_dir=state_dir)
+        assert run.call_count == 1
+
+        # Fresh tree with identical inputs: the kept PDF is reused
+        make_tree(tmp_path / "build2", "你好")
+        os.utime(tmp_path / "build2" / "fig.png", ns=(0, os.stat(tmp_path / "build1" / "fig.png").st_mtime_ns))
+        compile_pdf(str(tmp_path / "build2"), "main.tex", state_dir=state_dir)
+        assert run.call_count == 1
+        assert (tmp_path / "build2" / "main.pdf").read_text() == "pdf"
+
+        # Changed translation: Tectonic runs, seeded with the previous .aux
+        make_tree(tmp_path / "build3", "您好")
+        seeded = []
+        def check_seeded(cmd, cwd, **kwargs):
+            seeded.append(os.path.exists(os.path.join(cwd, "main.aux")))
+            return fake_tectonic(cmd, cwd)
+        run.side_effect = check_seeded
+        compile_pdf(str(tmp_path / "build3"), "main.tex", state_dir=state_dir)
+        assert seeded == [True]
+
+def test_fingerprint_ignores_outputs(tmp_path):
+    make_tree(tmp_path, "text")
+    before = compute_fingerprint(str(tmp_path), "main.tex")
+    (tmp_path / "main.pdf").write_text("pdf")
+    assert compute_fingerprint(str(tmp_path), "main.tex") == before
+    (tmp_path / "main.tex").write_text("changed")
+    assert compute_fingerprint(str(tmp_path), "main.tex") != before
+
+def test_fingerprint_ignores_intermediates_of_earlier_rounds(tmp_path):
+    make_tree(tmp_path, "text")
+    (tmp_path / "refs.bib").write_text("@article{a, title={A}}")
+    before = compute_fingerprint(str(tmp_path), "main.tex")
+    for name in ("main.aux", "main.bbl", "main.toc", "main.log", "main.tectonic.log"):
+        (tmp_path / name).write_text("generated")
+    assert compute_fingerprint(str(tmp_path), "main.tex") == before
+
+    # Without a .bib, a shipped .bbl is an input
+    (tmp_path / "refs.bib").unlink()
+    shipped = compute_fingerprint(str(tmp_path), "main.tex")
+    (tmp_path / "main.bbl").write_text("updated bibliography")
+    assert compute_fingerprint(str(tmp_path), "main.tex") != shipped
+
+def test_tectonic_cache_dir_is_passed(tmp_path):
+    make_tree(tmp_path / "src", "text")
+    with patch("arxiv_translator.compiler.subprocess.run", side_effect=fake_tectonic) as run:
+        compile_pdf(str(tmp_path / "src"), "main.tex", tectonic_cache_dir=str(tmp_path / "tcache"))
+    assert run.call_args.kwargs["env"]["TECTONIC_CACHE_DIR"] == str(tmp_path / "tcache")
+
+def test_compile_preflight_adds_missing_packages(tmp_path):
+    main = tmp_path / "main.tex"
+    main.write_text("\\documentclass{article}\n\\usepackage[most]{tcolorbox}\n\\begin{document}\nx\n\\end{document}\n")
+    with patch("arxiv_translator.compiler.shutil.which", return_value="/usr/bin/tectonic"):
+        assert compile_preflight(str(main), ("tcolorbox",))
+    assert main.read_text().count("tcolorbox") == 1
+
+    main.write_text("\\documentclass{article}\n\\begin{document}\nx\n\\end{document}\n")
+    with patch("arxiv_translator.compiler.shutil.which", return_value=None):
+        assert not compile_preflight(str(main), ("tcolorbox",))
+    assert main.read_text() == "\\documentclass{article}\n\\usepackage{tcolorbox}\n\\begin{document}\nx\n\\end{document}\n"
+
+def test_failed_build_is_not_cached(tmp_path):
+    state_dir = str(tmp_path / "state")
+    make_tree(tmp_path / "build", "你好")
+
+    def broken_tectonic(cmd, cwd, **kwargs):
+        # Tectonic can leave a PDF behind even when the build fails
+        fake_tectonic(cmd, cwd)
+        return MagicMock(returncode=1, stdout="", stderr="error: main.tex:1: Undefined control sequence")
+
+    with patch("arxiv_translator.compiler.subprocess.run", side_effect=broken_tectonic) as run:
+        compile_pdf(str(tmp_path / "build"), "main.tex", state_dir=state_dir)
+        compile_pdf(str(tmp_path / "build"), "main.tex", state_dir=state_dir)
+    assert run.call_count == 2
+    assert not os.path.exists(os.path.join(state_dir, "main.pdf"))
+
+def test_compile_state_dir_depends_on_options():
+    from arxiv_translator.main import compile_state_dir
+    plain = compile_state_dir("2602.04705", "gemini-3-flash-preview")
+    assert plain != compile_state_dir("2602.04705", "gemini-3-flash-preview", deepdive=True)
+    assert plain != compile_state_dir("2602.04705", "gemini-3-pro-preview")
@@ -0,0 +1,134 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock, AsyncMock
+from arxiv_translator.context_cache import ContextCache
+from arxiv_translator.glossary import current_glossary, extract_glossary, format_glossary
+from arxiv_translator.translator import GeminiTranslator
+
+LONG_INSTRUCTION = "Translate carefully. " * 400
+
+class ApiError(Exception):
+    def __init__(self, code, message=""):
+        super().__init__(f"error {code} {message}")
+        self.code = code
+
+def fake_client(create=None):
+    client = MagicMock()
+    client.aio.caches.create = create or AsyncMock(side_effect=lambda **kw: SimpleNamespace(name="cachedContents/1"))
+    client.aio.caches.update = AsyncMock()
+    client.aio.caches.delete = AsyncMock()
+    return client
+
+def test_handle_is_created_once_and_released():
+    client = fake_client()
+    cache = ContextCache(client)
+
+    async def run():
+        names = await asyncio.gather(*(cache.get("gemini-3-flash-preview", LONG_INSTRUCTION) for _ in range(5)))
+        await cache.close()
+        return names
+
+    assert asyncio.run(run()) == ["cachedContents/1"] * 5
+    assert client.aio.caches.create.await_count == 1
+    client.aio.caches.delete.assert_awaited_once_with(name="cachedContents/1")
+
+def test_handle_is_extended_before_expiry():
+    client = fake_client()
+    cache = ContextCache(client, ttl_seconds=60)
+
+    async def run():
+        await cache.get("gemini-3-flash-preview", LONG_INSTRUCTION)
+        return await cache.get("gemini-3-flash-preview", LONG_INSTRUCTION)
+
+    assert asyncio.run(run()) == "cachedContents/1"
+    assert client.aio.caches.create.await_count == 1
+    assert client.aio.caches.update.await_args.kwargs["config"].ttl == "60s"
+
+def test_falls_back_when_unsupported_or_too_small():
+    unsupported = ApiError(400, "models/gemini-x is not found for API version v1beta, "
+                                "or is not supported for createCachedContent.")
+    client = fake_client(create=AsyncMock(side_effect=unsupported))
+    cache = ContextCache(client)
+
+    async def run():
+        return [await cache.get("gemini-3-flash-preview", "Short prompt."),
+                await cache.get("gemini-3-flash-preview", LONG_INSTRUCTION),
+                await cache.get("gemini-3-flash-preview", LONG_INSTRUCTION + "x")]
+
+    assert asyncio.run(run()) == [None, None, None]
+    # Too small: no request at all; unsupported: only tried once
+    assert client.aio.caches.create.await_count == 1
+
+def test_rejected_instruction_does_not_disable_the_model():
+    client = fake_client(create=AsyncMock(side_effect=[ApiError(400, "Invalid argument"),
+                                                       SimpleNamespace(name="cachedContents/2")]))
+    cache = ContextCache(client)
+
+    async def run():
+        return [await cache.get("gemini-3-flash-preview", LONG_INSTRUCTION),
+                await cache.get("gemini-3-flash-preview", LONG_INSTRUCTION),
+                await cache.get("gemini-3-flash-preview", LONG_INSTRUCTION + "x")]
+
+    # The refused instruction is not tried again; other instructions still are
+    assert asyncio.run(run()) == [None, None, "cachedContents/2"]
+    assert client.aio.caches.create.await_count == 2
+
+def test_locks_work_across_event_loops():
+    async def slow_request(**kwargs):
+        # Long enough for the other gets to wait on the lock
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(name="cachedContents/1")
+
+    client = fake_client(create=slow_request)
+    client.aio.caches.update = slow_request
+    # Below the refresh margin, so every loop extends the handle under the lock
+    cache = ContextCache(client, ttl_seconds=60)
+    # Like the sync wrappers: each asyncio.run has its own loop
+    for _ in range(2):
+        async def run():
+            return await asyncio.gather(*(cache.get("gemini-3-flash-preview", LONG_INSTRUCTION + "y")
+                                          for _ in range(3)))
+        assert asyncio.run(run()) == ["cachedContents/1"] * 3
+
+def test_stale_handle_is_recreated():
+    client = fake_client()
+    cache = ContextCache(client)
+
+    async def run():
+        name = await cache.get("gemini-3-flash-preview", LONG_INSTRUCTION)
+        assert not cache.invalidate(name, ApiError(429))
+        assert cache.invalidate(name, ApiError(403))
+        return await cache.get("gemini-3-flash-preview", LONG_INSTRUCTION)
+
+    assert asyncio.run(run()) == "cachedContents/1"
+    assert client.aio.caches.create.await_count == 2
+
+@patch('arxiv_translator.translator.genai.Client')
+def test_translator_references_cached_instruction(mock_client):
+    response = MagicMock()
+    response.text = "译文"
+    mock_client.return_value.aio.models.generate_content = AsyncMock(return_value=response)
+    client = fake_client()
+    translator = GeminiTranslator("fake_key", context_cache=ContextCache(client))
+
+    current_glossary.set(format_glossary({f"T{i}X": f"Term number {i} expanded" for i in range(150)}))
+    try:
+        assert translator.translate_latex("Original") == "译文"
+    finally:
+        current_glossary.set("")
+
+    config = mock_client.return_value.aio.models.generate_content.call_args.kwargs["config"]
+    assert config.cached_content == "cachedContents/1"
+    assert config.system_instruction is None
+    instruction = client.aio.caches.create.await_args.kwargs["config"].system_instruction
+    assert "T42X: Term number 42 expanded" in instruction
+
+def test_extract_glossary():
+    text = (r"We fine-tune large language models (LLMs) with a \textbf{Mixture of Experts} (MoE). "
+            r"Reinforcement Learning from Human Feedback (RLHF) follows; see Table (A) and (CI). "
+            "% Commented Out Term (COT)\n")
+    assert extract_glossary([text]) == {
+        "LLMs": "large language models",
+        "MoE": "Mixture of Experts",
+        "RLHF": "Reinforcement Learning from Human Feedback",
+    }
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import re
+from unittest.mock import MagicMock, patch
+from arxiv_translator.deepdive import DeepDiveAnalyzer, render_box
+from arxiv_translator.engine import process_files
+
+PARAGRAPH = "The model minimizes a contrastive loss over every layer of the encoder. " * 6
+
+def make_analyzer(answer, **kwargs):
+    """Analyzer whose fake model explains the first numbered paragraph of each request."""
+    requests = []
+
+    async def generate_content(model, config, contents):
+        requests.append(contents[0])
+        numbers = [int(n) for n in re.findall(r'^\[P(\d+)\]$', contents[0], re.MULTILINE)]
+        response = MagicMock()
+        response.text = answer(numbers)
+        response.usage_metadata = None
+        return response
+
+    client = MagicMock()
+    client.aio.models.generate_content = generate_content
+    analyzer = DeepDiveAnalyzer("fake_key", model_name="gemini-3-flash-preview", client=client, **kwargs)
+    return analyzer, requests
+
+def first_paragraph(numbers):
+    return "```json\n" + json.dumps([{"after": numbers[0], "concept": "对比损失",
+                                      "explanation": "解释", "why": "重要"}]) + "\n```"
+
+def test_boxes_are_inserted_after_their_paragraph():
+    content = ("\\documentclass{article}\n\n\\begin{document}\n\n\\section{Method}\n"
+               f"{PARAGRAPH}\n\nSecond paragraph about training.\n\n\\end{{document}}\n")
+    analyzer, requests = make_analyzer(first_paragraph)
+    result = asyncio.run(analyzer.analyze_latex_async(content, "paper.tex"))
+
+    assert len(requests) == 1
+    # Neither the preamble nor \end{document} is offered as an anchor
+    assert "documentclass" not in requests[0] and "end{document}" not in requests[0]
+    box = render_box("对比损失", "解释", "重要")
+    assert result == content.replace(f"{PARAGRAPH}\n\n", f"{PARAGRAPH}\n{box}\n\n", 1)
+
+def test_large_files_are_analyzed_by_section():
+    sections = "".join(f"\\section{{Part {i}}}\n" + (PARAGRAPH + "\n\n") * 20 for i in range(40))
+    assert len(sections) > 131072
+    analyzer, requests = make_analyzer(first_paragraph, chunk_tokens=6000)
+    result = asyncio.run(analyzer.analyze_latex_async(sections, "big.tex"))
+
+    assert len(requests) > 1
+    assert max(len(r) for r in requests) < 6000 * 4 + len(PARAGRAPH) + 100
+    assert result.count("\\begin{tcolorbox}") == len(requests)
+    # Only boxes were added
+    assert re.sub(r'\\begin\{tcolorbox\}.*?\\end\{tcolorbox\}\n', '', result, flags=re.DOTALL) == sections
+
+def test_invalid_answers_leave_the_file_unchanged():
+    content = f"\\section{{Method}}\n{PARAGRAPH}\n"
+    for answer in ("not json", json.dumps([{"after": 99, "explanation": "x"}]), "[]"):
+        analyzer, _ = make_analyzer(lambda numbers: answer)
+        assert asyncio.run(analyzer.analyze_latex_async(content, "method.tex")) == content
+
+def test_paper_budget_goes_to_the_densest_sections(tmp_path):
+    dense = tmp_path / "method.tex"
+    dense.write_text("\\section{Method}\n" + "We derive the loss $\\mathcal{L} = \\sum_i \\ell_i$.\n\n" * 10)
+    prose = tmp_path / "intro.tex"
+    prose.write_text(f"\\section{{Setup}}\n{PARAGRAPH}\n")
+    analyzer, requests = make_analyzer(first_paragraph)
+
+    class IdentityTranslator:
+        chunk_tokens = 4000
+        chunk_concurrency = 1
+
+        async def translate_latex_async(self, content):
+            return content
+
+    budget = len(dense.read_text()) // 4 + 10
+    files = [str(prose), str(dense)]
+    with patch('arxiv_translator.engine.log_ipc'):
+        results = asyncio.run(process_files(IdentityTranslator(), analyzer, files, str(dense),
+                                            concurrency=2, deepdive_budget=budget))
+
+    assert results == {str(prose): True, str(dense): True}
+    assert len(requests) == 1 and "mathcal" in requests[0]
+    assert "tcolorbox" in dense.read_text() and "tcolorbox" not in prose.read_text()
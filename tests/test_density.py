@@ -0,0 +1,48 @@
+from arxiv_translator.density import DEFAULT_MIN_SCORE, score_section, select_sections
+from arxiv_translator.segmenter import estimate_tokens
+
+METHOD = r"""\section{方法}
+我们提出一种新的注意力机制。给定输入 $x \in \mathbb{R}^{n \times d}$，目标函数为
+\begin{equation}
+\mathcal{L}(\theta) = \sum_{i=1}^{n} \log p_\theta(y_i \mid x_i) + \lambda \|\theta\|_2^2 ,
+\end{equation}
+其梯度可以推导为 $\nabla_\theta \mathcal{L}$。
+\begin{theorem}
+若学习率 $\eta \leq 1/L$，则算法收敛。
+\end{theorem}
+"""
+
+RELATED_WORK = r"""\section{相关工作}
+大型语言模型近年来取得了显著进展 \cite{brown2020}。许多工作研究了模型的训练和评估方法，
+包括指令微调 \cite{wei2022} 和基于人类反馈的强化学习 \cite{ouyang2022}。
+我们的工作与这些方法互补，并在多个基准上进行了比较。
+"""
+
+def test_scores_rank_derivations_above_prose():
+    assert score_section(METHOD) >= DEFAULT_MIN_SCORE
+    assert score_section(RELATED_WORK) < DEFAULT_MIN_SCORE
+    # The same text under a low-value heading scores lower
+    assert score_section(METHOD.replace("方法", "结论")) < score_section(METHOD)
+
+def test_select_sections_respects_threshold_and_budget():
+    sections = {"method": METHOD, "method2": METHOD + "\n" + METHOD, "related": RELATED_WORK}
+    selected, scored = select_sections(sections)
+    assert selected == {"method", "method2"}
+    assert [key for key, _ in scored][-1] == "related"
+
+    # Densest first; a section that does not fit is skipped, smaller ones still can be
+    budget = estimate_tokens(METHOD) + 10
+    selected, _ = select_sections(sections, budget_tokens=budget)
+    assert selected == {"method"}
+    assert select_sections(sections, budget_tokens=10)[0] == set()
+
+def test_budget_counts_chinese_characters_as_tokens():
+    # Translated sections are mostly CJK: about one token per character, not four
+    chinese = "我们提出一种新的注意力机制。" * 100
+    assert estimate_tokens(chinese) == len(chinese)
+    assert estimate_tokens("x" * 400 + chinese) == 100 + len(chinese)
+
+    # ~1800 tokens (not ~1100 as a characters/4 estimate would say): over a 1500-token budget
+    section = "\\section{方法}\n" + "我们推导损失 $\\mathcal{L} = \\sum_i \\ell_i$ 的梯度。\n\n" * 100
+    assert select_sections({"method": section})[0] == {"method"}
+    assert select_sections({"method": section}, budget_tokens=1500)[0] == set()
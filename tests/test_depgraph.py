@@ -0,0 +1,48 @@
+from arxiv_translator.depgraph import DependencyGraph, load_dependency_graph
+from arxiv_translator.extractor import find_main_tex
+
+def make_project(root):
+    (root / "sections" / "appendix").mkdir(parents=True)
+    (root / "main.tex").write_text(
+        "\\documentclass{article}\n\\begin{document}\n"
+        "\\input{sections/intro}\n"
+        "\\include{sections/method.tex}\n"
+        "% \\input{sections/old_intro}\n"
+        "\\subimport{sections/appendix/}{proofs}\n"
+        "\\end{document}\n")
+    (root / "sections" / "intro.tex").write_text("Intro \\input sections/table\n")
+    (root / "sections" / "table.tex").write_text("table")
+    (root / "sections" / "method.tex").write_text("Method")
+    (root / "sections" / "old_intro.tex").write_text("Old draft")
+    (root / "sections" / "appendix" / "proofs.tex").write_text("\\subimport{./}{lemma}")
+    (root / "sections" / "appendix" / "lemma.tex").write_text("Lemma")
+    (root / "draft_v1.tex").write_text("\\documentclass{article} unused")
+
+def test_reachable_files(tmp_path):
+    make_project(tmp_path)
+    graph = DependencyGraph.build(str(tmp_path), str(tmp_path / "main.tex"))
+    assert graph.reachable() == {
+        "main.tex", "sections/intro.tex", "sections/table.tex", "sections/method.tex",
+        "sections/appendix/proofs.tex", "sections/appendix/lemma.tex",
+    }
+    assert graph.is_complete
+
+def test_macro_includes_make_graph_incomplete(tmp_path):
+    (tmp_path / "main.tex").write_text("\\input{\\sectiondir/intro}")
+    graph = DependencyGraph.build(str(tmp_path), str(tmp_path / "main.tex"))
+    assert not graph.is_complete
+
+def test_graph_is_cached_until_tex_files_change(tmp_path):
+    make_project(tmp_path)
+    cache = str(tmp_path / "graph.json")
+    first = load_dependency_graph(str(tmp_path), str(tmp_path / "main.tex"), cache)
+    (tmp_path / "cache_marker").write_text("not a tex file")
+    assert load_dependency_graph(str(tmp_path), str(tmp_path / "main.tex"), cache).edges == first.edges
+
+    (tmp_path / "sections" / "method.tex").write_text("Method \\input{sections/old_intro}")
+    assert "sections/old_intro.tex" in load_dependency_graph(str(tmp_path), str(tmp_path / "main.tex"), cache).reachable()
+
+def test_find_main_tex_prefers_priority_name(tmp_path):
+    make_project(tmp_path)
+    (tmp_path / "notes.tex").write_text("% \\documentclass{article}\n")
+    assert find_main_tex(str(tmp_path)).endswith("main.tex")
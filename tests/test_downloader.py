@@ -1,23 +1,155 @@
 import os
 import pytest
 from unittest.mock import patch, MagicMock
-from arxiv_translator.downloader import download_source
+from arxiv_translator.downloader import download_source, fetch_url, EprintStore
 
-@patch('arxiv_translator.downloader.requests.get')
-def test_download_source(mock_get, tmp_path):
+def make_response(status_code=200, chunks=(), headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.iter_content.return_value = list(chunks)
+    response.__enter__.return_value = response
+    return response
+
+@patch('arxiv_translator.downloader.get_session')
+def test_download_source(mock_get_session, tmp_path):
     # Mock response
-    mock_response = MagicMock()
-    mock_response.iter_content.return_value = [b'chunk1', b'chunk2']
-    mock_response.status_code = 200
-    mock_get.return_value = mock_response
-    
+    mock_session = MagicMock()
+    mock_session.get.return_value = make_response(200, [b'chunk1', b'chunk2'])
+    mock_get_session.return_value = mock_session
+
     output_dir = tmp_path / "output"
     arxiv_id = "1234.5678"
-    
+
     path = download_source(arxiv_id, str(output_dir))
-    
+
     assert os.path.exists(path)
     assert path.endswith("1234.5678.tar.gz")
     with open(path, 'rb') as f:
         content = f.read()
         assert content == b'chunk1chunk2'
+
+def test_fetch_url_revalidates_with_etag(tmp_path):
+    session = MagicMock()
+    session.get.return_value = make_response(200, [b'data'], {"ETag": '"v1"'})
+    path = str(tmp_path / "paper.tar.gz")
+
+    assert fetch_url("https://example.org/x", path, session) is True
+
+    session.get.return_value = make_response(304)
+    assert fetch_url("https://example.org/x", path, session) is False
+    assert session.get.call_args.kwargs["headers"]["If-None-Match"] == '"v1"'
+    assert open(path, "rb").read() == b'data'
+
+def test_fetch_url_resumes_partial_download(tmp_path):
+    path = str(tmp_path / "paper.tar.gz")
+    session = MagicMock()
+
+    broken = make_response(200, [], {"ETag": '"v1"'})
+    broken.iter_content.side_effect = lambda chunk_size: iter_then_fail([b'first-'])
+    resumed = make_response(206, [b'second'], {"ETag": '"v1"'})
+    session.get.side_effect = [broken, resumed]
+
+    assert fetch_url("https://example.org/x", path, session) is True
+    headers = session.get.call_args_list[1].kwargs["headers"]
+    assert headers["Range"] == "bytes=6-"
+    assert headers["If-Range"] == '"v1"'
+    assert open(path, "rb").read() == b'first-second'
+
+def iter_then_fail(chunks):
+    import requests
+    yield from chunks
+    raise requests.ConnectionError("connection reset")
+
+def test_eprint_store_skips_versioned_refetch(tmp_path):
+    session = MagicMock()
+    session.get.return_value = make_response(200, [b'tarball'])
+    store = EprintStore(str(tmp_path / "mirror"), session=session)
+
+    first = store.fetch("2602.04705v2")
+    second = store.fetch("2602.04705v2")
+
+    assert first == second
+    assert first.endswith(os.path.join("2602.04705", "2602.04705v2.tar.gz"))
+    session.get.assert_called_once()
+
+    workspace = tmp_path / "workspace"
+    with patch('arxiv_translator.downloader.get_session', return_value=session):
+        path = download_source("2602.04705v2", str(workspace), store=store)
+    assert open(path, "rb").read() == b'tarball'
+
+def test_download_and_extract_source_keeps_archive(tmp_path):
+    import gzip
+    from arxiv_translator.downloader import download_and_extract_source
+    payload = gzip.compress(b"\\documentclass{article}")
+    session = MagicMock()
+    session.get.return_value = make_response(200, [payload[:10], payload[10:]], {"ETag": '"v1"'})
+    store = EprintStore(str(tmp_path / "mirror"), session=session)
+
+    path = download_and_extract_source("2602.04705v1", str(tmp_path / "ws"), str(tmp_path / "ws" / "source"), store=store)
+
+    assert open(path, "rb").read() == payload
+    assert open(store.path_for("2602.04705v1"), "rb").read() == payload
+    assert (tmp_path / "ws" / "source" / "main.tex").read_text() == "\\documentclass{article}"
+
+def test_download_and_extract_source_falls_back_when_stream_breaks(tmp_path):
+    import io
+    import requests
+    import tarfile
+    from arxiv_translator.downloader import download_and_extract_source
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name, data in (("a.tex", b"A" * 600), ("b.tex", b"B" * 600)):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    payload = buffer.getvalue()
+
+    def broken_body(chunk_size):
+        # a.tex arrives in full, then the connection drops
+        yield payload[:2048]
+        raise requests.ConnectionError("connection reset")
+
+    broken = make_response(200, headers={"ETag": '"v1"'})
+    broken.iter_content.side_effect = broken_body
+    session = MagicMock()
+    session.get.side_effect = [broken, make_response(200, [payload], {"ETag": '"v1"'})]
+    store = EprintStore(str(tmp_path / "mirror"), session=session)
+    source = tmp_path / "ws" / "source"
+
+    path = download_and_extract_source("2602.04705v1", str(tmp_path / "ws"), str(source), store=store)
+
+    assert session.get.call_count == 2
+    assert open(path, "rb").read() == payload
+    assert not os.path.exists(store.path_for("2602.04705v1") + ".part")
+    assert sorted(os.listdir(source)) == ["a.tex", "b.tex"]
+    assert (source / "b.tex").read_bytes() == b"B" * 600
+
+def test_eprint_store_serializes_fetches_of_one_paper(tmp_path):
+    import threading
+    import time
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def slow_get(url, headers=None, stream=False, timeout=None):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.05)
+        with lock:
+            in_flight -= 1
+        return make_response(200, [b"tarball"], {"ETag": '"v1"'})
+
+    session = MagicMock()
+    session.get.side_effect = slow_get
+    store = EprintStore(str(tmp_path / "mirror"), session=session)
+    threads = [threading.Thread(target=store.fetch, args=("2602.04705",)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak == 1
+    assert open(store.path_for("2602.04705"), "rb").read() == b"tarball"
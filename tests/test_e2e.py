@@ -1,11 +1,11 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import os
 import shutil
 from arxiv_translator.main import main
-@patch('arxiv_translator.main.download_source')
+@patch('arxiv_translator.downloader.download_source')
 @patch('arxiv_translator.main.extract_source')
-@patch('arxiv_translator.main.GeminiTranslator')
+@patch('arxiv_translator.translator.GeminiTranslator')
 @patch('arxiv_translator.main.compile_pdf')
 @patch('arxiv_translator.main.find_main_tex')
 def test_e2e_mocked(mock_find, mock_compile, mock_translator, mock_extract, mock_download, tmp_path):
@@ -36,9 +36,9 @@ def test_e2e_real_structure(tmp_path):
     (tmp_path / "source").mkdir()
     (tmp_path / "source" / "main.tex").write_text("\\documentclass{article}\\begin{document}Hello\\end{document}")
     
-    with patch('arxiv_translator.main.download_source') as mock_dl, \
+    with patch('arxiv_translator.downloader.download_source') as mock_dl, \
          patch('arxiv_translator.main.extract_source') as mock_ext, \
-         patch('arxiv_translator.main.GeminiTranslator') as mock_trans, \
+         patch('arxiv_translator.translator.GeminiTranslator') as mock_trans, \
          patch('arxiv_translator.main.compile_pdf') as mock_comp:
          
         mock_dl.return_value = str(tmp_path / "fake.tar.gz")
@@ -50,7 +50,9 @@ def test_e2e_real_structure(tmp_path):
         mock_ext.side_effect = side_effect_extract
         
         mock_trans_instance = MagicMock()
-        mock_trans_instance.translate_latex.return_value = "Translated"
+        mock_trans_instance.chunk_tokens = 4000
+        mock_trans_instance.chunk_concurrency = 4
+        mock_trans_instance.translate_latex_async = AsyncMock(return_value="Translated")
         mock_trans.return_value = mock_trans_instance
         
         # Run main
@@ -79,3 +81,55 @@ def test_e2e_real_structure(tmp_path):
                     content = f.read()
                     assert "Translated" in content
                 shutil.rmtree(work_dir)
+
+def test_read_batch_ids(tmp_path):
+    from arxiv_translator.main import read_batch_ids
+    batch = tmp_path / "ids.txt"
+    batch.write_text("https://arxiv.org/abs/2602.04705\n\n# comment\n2602.00001  # inline\n2602.04705\n")
+    assert read_batch_ids(str(batch)) == ["2602.04705", "2602.00001"]
+
+def test_e2e_batch(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "ids.txt").write_text("1111.1111\n2222.2222\n")
+
+    def side_effect_extract(tar, dest):
+        os.makedirs(dest, exist_ok=True)
+        with open(os.path.join(dest, "main.tex"), "w") as f:
+            f.write("\\documentclass{article}\\begin{document}Hello\\end{document}")
+
+    def fake_compile(source_dir, main_tex, *args):
+        # The second paper does not compile
+        if "1111.1111" in source_dir:
+            with open(os.path.join(source_dir, "main.pdf"), "w") as f:
+                f.write("pdf")
+
+    with patch('arxiv_translator.downloader.download_source') as mock_dl, \
+         patch('arxiv_translator.main.extract_source', side_effect=side_effect_extract), \
+         patch('arxiv_translator.translator.GeminiTranslator') as mock_trans, \
+         patch('arxiv_translator.main.compile_pdf', side_effect=fake_compile):
+
+        mock_dl.return_value = str(tmp_path / "fake.tar.gz")
+        mock_trans_instance = MagicMock()
+        mock_trans_instance.chunk_tokens = 4000
+        mock_trans_instance.chunk_concurrency = 4
+        mock_trans_instance.model_name = "gemini-3-flash-preview"
+        mock_trans_instance.translate_latex_async = AsyncMock(return_value="Translated")
+        mock_trans.return_value = mock_trans_instance
+
+        with patch('sys.argv', ['main.py', '--batch', 'ids.txt', '--no-cache']), \
+             patch.dict(os.environ, {"GEMINI_API_KEY": "fake"}), \
+             pytest.raises(SystemExit) as exit_info:
+            main()
+
+    # One paper failed, so the batch exits non-zero
+    assert exit_info.value.code == 1
+    assert (tmp_path / "1111.1111_zh_flash.pdf").exists()
+    assert not (tmp_path / "2222.2222_zh_flash.pdf").exists()
+
+    for arxiv_id in ["1111.1111", "2222.2222"]:
+        content = (tmp_path / f"workspace_{arxiv_id}" / "source_zh" / "main.tex").read_text()
+        assert "Translated" in content
+
+    out = capsys.readouterr().out
+    assert "[1111.1111] PROGRESS:TRANSLATING:1:1:Translated main.tex" in out
+    assert "[2222.2222] PROGRESS:DOWNLOADING:" in out
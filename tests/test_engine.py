@@ -0,0 +1,180 @@
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock
+from arxiv_translator.engine import process_files, translate_files, strip_latex_comments
+
+class FakeTranslator:
+    chunk_tokens = 4000
+    chunk_concurrency = 4
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def translate_latex_async(self, content):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if "boom" in content:
+            raise RuntimeError("boom")
+        return content.upper()
+
+def test_strip_latex_comments():
+    assert strip_latex_comments("a\n  % comment\nb % keep") == "a\nb % keep"
+
+def test_translate_files_bounded_concurrency(tmp_path):
+    files = []
+    for i in range(8):
+        path = tmp_path / f"f{i}.tex"
+        path.write_text("boom" if i == 3 else f"text {i}")
+        files.append(str(path))
+
+    translator = FakeTranslator()
+    with patch('arxiv_translator.engine.log_ipc') as mock_ipc:
+        results = asyncio.run(translate_files(translator, files, str(tmp_path / "main.tex"), concurrency=3))
+
+    assert translator.max_in_flight == 3
+    assert results[files[3]] is False
+    assert sum(results.values()) == 7
+    assert (tmp_path / "f0.tex").read_text() == "TEXT 0"
+    events = [c.args[0] for c in mock_ipc.call_args_list]
+    assert len(events) == 8
+    assert events[-1].startswith("PROGRESS:TRANSLATING:8:8:")
+
+def test_streaming_file_writer(tmp_path):
+    from arxiv_translator.engine import StreamingFileWriter
+    reports = []
+    path = tmp_path / "a.tex.partial"
+    writer = StreamingFileWriter(str(path), expected_chars=100, on_progress=lambda r, e: reports.append(r))
+    writer.write("x" * 30)
+    writer.write("y" * 5)
+    writer.reset("z" * 20)
+    assert path.read_text() == "z" * 20
+    assert reports == [30, 20]
+    writer.close()
+    assert not path.exists()
+
+class RecordingTranslator(FakeTranslator):
+    def __init__(self):
+        super().__init__()
+        self.started = []
+        self.chunked = []
+
+    async def translate_latex_async(self, content):
+        self.started.append(len(content))
+        return await super().translate_latex_async(content)
+
+    async def translate_latex_chunked(self, content, max_tokens):
+        self.chunked.append((len(content), max_tokens))
+        return content.upper()
+
+def test_translate_files_largest_first_and_splits_dominant_file(tmp_path):
+    sizes = [400, 40000, 4000, 800, 12000]
+    files = []
+    for i, size in enumerate(sizes):
+        path = tmp_path / f"f{i}.tex"
+        path.write_text("x" * size)
+        files.append(str(path))
+
+    translator = RecordingTranslator()
+    with patch('arxiv_translator.engine.log_ipc'):
+        results = asyncio.run(translate_files(translator, files, str(tmp_path / "main.tex"), concurrency=1))
+
+    assert all(results.values())
+    # 10000 of 14300 tokens is above a quarter of the paper: split into chunk_tokens chunks;
+    # the rest start largest first
+    assert translator.chunked == [(40000, 4000)]
+    assert translator.started == [12000, 4000, 800, 400]
+
+def test_equal_files_are_not_split():
+    from arxiv_translator.scheduler import TranslationPlan
+    # Ten 5000-token files, each a tenth of the paper and above the chunk budget
+    costs = {f"f{i}.tex": 5000 for i in range(10)}
+    plan = TranslationPlan(costs, concurrency=4, chunk_tokens=4000, chunk_concurrency=4)
+    assert plan.split == set()
+
+    costs["appendix.tex"] = 60000
+    plan = TranslationPlan(costs, concurrency=4, chunk_tokens=4000, chunk_concurrency=4)
+    assert plan.split == {"appendix.tex"} and plan.split_tokens == 4000
+
+def test_simulate_makespan_lpt():
+    from arxiv_translator.scheduler import simulate_makespan
+    assert simulate_makespan([10, 1, 1, 1], workers=2) == 10
+    assert simulate_makespan([1, 1, 1, 10], workers=2) == 11
+
+def test_process_files_analyzes_each_file_once_translated(tmp_path):
+    events = []
+
+    class SlowTranslator(FakeTranslator):
+        async def translate_latex_async(self, content):
+            await asyncio.sleep(0.2 if "slow" in content else 0.01)
+            events.append(("translated", content.split()[0]))
+            return content
+
+    class RecordingAnalyzer:
+        async def analyze_latex_async(self, content, file_name, selected=None):
+            events.append(("analyzed", content.split()[0]))
+            return content
+
+    main = tmp_path / "main.tex"
+    main.write_text("main text")
+    slow = tmp_path / "slow.tex"
+    slow.write_text("slow text")
+
+    async def main_ready(path):
+        events.append(("main_ready", path))
+
+    with patch('arxiv_translator.engine.log_ipc'):
+        results = asyncio.run(process_files(SlowTranslator(), RecordingAnalyzer(), [str(slow), str(main)],
+                                            str(main), concurrency=2, main_ready=main_ready))
+
+    assert results == {str(slow): True, str(main): True}
+    # The main file is ready and analyzed while the slow file is still translating
+    assert events == [("translated", "main"), ("main_ready", str(main)), ("analyzed", "main"),
+                      ("translated", "slow"), ("analyzed", "slow")]
+
+def test_partially_translated_files_are_not_recorded(tmp_path):
+    from arxiv_translator.engine import translate_file
+    from arxiv_translator.incremental import TranslationManifest
+    from arxiv_translator.metrics import record_fallback
+
+    class ChunkFailingTranslator(FakeTranslator):
+        async def translate_latex_async(self, content):
+            # Chunks run as separate tasks, like GeminiTranslator._translate_large_latex
+            async def chunk(text):
+                if "boom" in text:
+                    record_fallback("chunk")
+                    return text
+                return text.upper()
+            return '\n\n'.join(await asyncio.gather(*(chunk(c) for c in content.split('\n\n'))))
+
+    manifest = TranslationManifest()
+    good, bad = tmp_path / "good.tex", tmp_path / "bad.tex"
+    good.write_text("first\n\nsecond")
+    bad.write_text("first\n\nboom")
+    for path in (good, bad):
+        asyncio.run(translate_file(ChunkFailingTranslator(), str(path), str(tmp_path / "main.tex"),
+                                   str(tmp_path), manifest))
+
+    assert bad.read_text() == "FIRST\n\nboom"
+    assert manifest.get("good.tex") is not None
+    assert manifest.get("bad.tex") is None
+
+def test_translate_file_does_file_work_off_the_event_loop(tmp_path):
+    import threading
+    from arxiv_translator import engine
+    threads = []
+    real_postprocess = engine.postprocess_translation
+
+    def recording_postprocess(*args):
+        threads.append(threading.current_thread())
+        return real_postprocess(*args)
+
+    path = tmp_path / "main.tex"
+    path.write_text("% comment\ntext")
+    with patch("arxiv_translator.engine.postprocess_translation", recording_postprocess):
+        asyncio.run(engine.translate_file(FakeTranslator(), str(path), str(path)))
+
+    assert path.read_text() == "TEXT"
+    assert threads and threads[0] is not threading.main_thread()
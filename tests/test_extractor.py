@@ -0,0 +1,50 @@
+import gzip
+import io
+import tarfile
+import pytest
+from arxiv_translator.extractor import extract_source, extract_stream
+
+class UnseekableStream(io.RawIOBase):
+    """Hands out a few bytes per read, like a network response."""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._data.read(min(len(buffer), 100))
+        buffer[:len(data)] = data
+        return len(data)
+
+def make_tarball(files):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+def test_extract_stream_tarball(tmp_path):
+    tarball = make_tarball({"paper.tex": b"\\documentclass{article}", "sec/intro.tex": b"Intro"})
+    extract_stream(UnseekableStream(tarball), str(tmp_path / "source"))
+    assert (tmp_path / "source" / "paper.tex").read_bytes() == b"\\documentclass{article}"
+    assert (tmp_path / "source" / "sec" / "intro.tex").read_bytes() == b"Intro"
+
+def test_extract_stream_rejects_unsafe_paths(tmp_path):
+    tarball = make_tarball({"../escape.tex": b"x"})
+    with pytest.raises(tarfile.TarError):
+        extract_stream(UnseekableStream(tarball), str(tmp_path / "source"))
+    assert not (tmp_path / "escape.tex").exists()
+
+def test_extract_source_single_file_gzip(tmp_path):
+    archive = tmp_path / "1234.5678.tar.gz"
+    archive.write_bytes(gzip.compress(b"\\documentclass{article}\n\\begin{document}\\end{document}"))
+    extract_source(str(archive), str(tmp_path / "source"))
+    assert (tmp_path / "source" / "main.tex").read_text().startswith("\\documentclass")
+
+def test_extract_stream_rejects_pdf(tmp_path):
+    with pytest.raises(ValueError):
+        extract_stream(io.BytesIO(b"%PDF-1.5\n..."), str(tmp_path / "source"))
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import pytest
+from arxiv_translator.incremental import (
+    TranslationManifest, find_previous_manifest, split_version, translate_incrementally, MANIFEST_NAME
+)
+
+class FakeTranslator:
+    chunk_concurrency = 2
+
+    def __init__(self):
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def translate_latex_async(self, content):
+        self.calls.append(content)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return content.upper()
+
+def test_split_version():
+    assert split_version("2602.04705v2") == ("2602.04705", 2)
+    assert split_version("2602.04705") == ("2602.04705", None)
+
+def test_find_previous_manifest(tmp_path):
+    for arxiv_id in ["2602.04705v1", "2602.04705v2", "2602.04705v3", "2602.99999v1"]:
+        (tmp_path / f"workspace_{arxiv_id}").mkdir()
+        TranslationManifest().save(str(tmp_path / f"workspace_{arxiv_id}" / MANIFEST_NAME))
+
+    found = find_previous_manifest("2602.04705v3", str(tmp_path))
+    assert found == str(tmp_path / "workspace_2602.04705v2" / MANIFEST_NAME)
+    assert find_previous_manifest("2602.04705v1", str(tmp_path)) is None
+    assert find_previous_manifest("2602.12345v2", str(tmp_path)) is None
+
+def test_translate_incrementally_only_sends_changes():
+    old_source = "\\section{Intro}\nFirst.\n\nSecond.\n\nThird."
+    old_translation = "\\section{引言}\n第一。\n\n第二。\n\n第三。"
+    new_source = "\\section{Intro}\nFirst.\n\nSecond, revised.\n\nThird."
+
+    translator = FakeTranslator()
+    result = asyncio.run(translate_incrementally(translator, old_source, old_translation, new_source))
+
+    assert translator.calls == ["Second, revised.\n"]
+    assert result == "\\section{引言}\n第一。\n\nSECOND, REVISED.\n\n第三。"
+
+def test_translate_incrementally_rejects_misaligned_translation():
+    translator = FakeTranslator()
+    result = asyncio.run(translate_incrementally(translator, "A.\n\nB.", "甲乙。", "A.\n\nC."))
+    assert result is None
+    assert translator.calls == []
+
+def test_translate_incrementally_rejects_merged_segments():
+    # Same number of segments, but the model merged the first two and split the last
+    old_source = "A \\cite{a}.\n\nB \\cite{b}.\n\nC.\n\nD."
+    old_translation = "甲 \\cite{a}，乙 \\cite{b}。\n\n丙。\n\n丁\n\n戊。"
+    translator = FakeTranslator()
+    result = asyncio.run(translate_incrementally(translator, old_source, old_translation,
+                                                 old_source.replace("D.", "E.")))
+    assert result is None
+    assert translator.calls == []
+
+def test_translate_incrementally_bounds_concurrent_requests():
+    old_source = "\n\n".join(f"P{i}." for i in range(8))
+    old_translation = "\n\n".join(f"段{i}。" for i in range(8))
+    new_source = "\n\n".join(f"P{i}, revised." if i % 2 else f"P{i}." for i in range(8))
+    translator = FakeTranslator()
+    asyncio.run(translate_incrementally(translator, old_source, old_translation, new_source))
+    assert len(translator.calls) == 4
+    assert translator.max_in_flight == 2
@@ -0,0 +1,111 @@
+import asyncio
+from arxiv_translator.memory import TranslationMemory, jaccard, shingles, translate_with_memory
+
+ACK = ("We thank the anonymous reviewers for their helpful comments and suggestions. "
+       "This work was supported in part by the National Science Foundation under grants "
+       "1234567 and 7654321, and by a research gift from an industrial partner. "
+       "Any opinions expressed are those of the authors.")
+ACK_EDITED = ACK.replace("1234567 and 7654321", "2345678 and 7654321")
+SETUP = ("All models are trained for 100 epochs with the AdamW optimizer, a cosine learning rate "
+         "schedule with linear warmup over the first 5 epochs, a batch size of 256 and weight decay "
+         "of 0.05 on eight GPUs using mixed precision.")
+
+class FakeTranslator:
+    chunk_concurrency = 2
+
+    def __init__(self):
+        self.translated = []
+        self.revised = []
+        self.chunked = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def translate_latex_async(self, content):
+        self.translated.append(content)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return content.upper()
+
+    async def translate_latex_chunked(self, content, max_tokens):
+        self.chunked.append((content, max_tokens))
+        return content.upper()
+
+    async def revise_translation(self, old_source, old_translation, new_source):
+        self.revised.append((old_translation, new_source))
+        return "EDITED " + old_translation
+
+def test_lookup_finds_exact_and_near_duplicates(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.db"))
+    memory.add(ACK, "致谢")
+
+    exact = memory.lookup("  " + ACK.replace(" ", "\n", 3))
+    assert exact.translation == "致谢" and exact.similarity == 1.0
+
+    near = memory.lookup(ACK_EDITED)
+    assert near.translation == "致谢"
+    assert near.similarity == jaccard(shingles(ACK), shingles(ACK_EDITED))
+    assert 0.8 <= near.similarity < 1.0
+
+    assert memory.lookup(SETUP) is None
+    assert memory.lookup("Too short to index.") is None
+
+def test_record_requires_aligned_segments(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.db"))
+    assert memory.record(f"{ACK}\n\n{SETUP}", "只有一段") == 0
+    assert memory.lookup(ACK) is None
+    assert memory.record(f"{ACK}\n\n{SETUP}", "致谢\n\n训练设置") == 2
+    assert memory.lookup(SETUP).translation == "训练设置"
+
+def test_record_skips_segments_left_in_english(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.db"))
+    # The second segment fell back to English after a failed request
+    assert memory.record(f"{ACK}\n\n{SETUP}", f"致谢\n\n{SETUP}\n") == 1
+    assert memory.lookup(SETUP) is None
+
+def test_eviction_keeps_recently_used(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.db"), max_entries=1)
+    memory.add(ACK, "致谢")
+    memory.add(SETUP, "训练设置")
+    assert memory.lookup(ACK) is None
+    assert memory.lookup(SETUP) is not None
+
+def test_translate_with_memory_reuses_edits_and_translates(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.db"))
+    memory.record(f"{ACK}\n\n{SETUP}", "致谢\n\n训练设置")
+
+    translator = FakeTranslator()
+    content = f"\\section{{Intro}}\nNew text.\n\n{SETUP}\n\n{ACK_EDITED}\n"
+    result = asyncio.run(translate_with_memory(translator, memory, content))
+
+    assert translator.translated == ["\\section{Intro}\nNew text.\n"]
+    assert translator.revised == [("致谢", ACK_EDITED + "\n")]
+    assert result == "\\SECTION{INTRO}\nNEW TEXT.\n\n训练设置\n\nEDITED 致谢\n"
+
+def test_translate_with_memory_bounds_concurrent_requests(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.db"))
+    memory.add(ACK, "致谢")
+    translator = FakeTranslator()
+    # Matched segments separate the unmatched runs into six requests
+    content = "\n\n".join(f"Paragraph {i}.\n\n{ACK}" for i in range(6)) + "\n"
+    asyncio.run(translate_with_memory(translator, memory, content))
+    assert len(translator.translated) == 6
+    assert translator.max_in_flight == 2
+
+def test_translate_with_memory_chunks_large_runs(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.db"))
+    memory.add(ACK, "致谢")
+    translator = FakeTranslator()
+    large = "\n\n".join(f"Paragraph {i} " + "word " * 50 for i in range(4))
+    content = f"Short.\n\n{ACK}\n\n{large}\n"
+    asyncio.run(translate_with_memory(translator, memory, content, split_tokens=100))
+    # The large run follows the file's split plan; the short one is a single request
+    assert translator.translated == ["Short.\n"]
+    assert translator.chunked == [(large + "\n", 100)]
+
+def test_translate_with_memory_without_matches(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.db"))
+    translator = FakeTranslator()
+    assert asyncio.run(translate_with_memory(translator, memory, SETUP)) is None
+    assert translator.translated == []
@@ -0,0 +1,48 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock, AsyncMock
+import pytest
+from arxiv_translator.metrics import MetricsRecorder, metrics_context, percentile
+from arxiv_translator.translator import GeminiTranslator
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) is None
+
+def test_translator_records_usage_per_file(tmp_path):
+    response = MagicMock()
+    response.text = "译文"
+    response.usage_metadata = SimpleNamespace(prompt_token_count=120, candidates_token_count=80)
+    client = MagicMock()
+    client.aio.models.generate_content = AsyncMock(return_value=response)
+    metrics = MetricsRecorder()
+    translator = GeminiTranslator("fake_key", model_name="gemini-3-flash-preview", client=client, metrics=metrics)
+
+    with metrics_context(stage="translate", file="intro.tex"):
+        translator.translate_latex("Text")
+
+    summary = metrics.summary()
+    assert summary["total"]["input_tokens"] == 120
+    assert summary["total"]["output_tokens"] == 80
+    assert summary["total"]["estimated_cost_usd"] == pytest.approx((120 * 0.5 + 80 * 3.0) / 1e6)
+    assert summary["by_file"]["intro.tex"]["requests"] == 1
+    assert summary["by_stage"]["translate"]["latency_p95"] is not None
+
+    path = tmp_path / "metrics.json"
+    metrics.save(str(path))
+    assert json.loads(path.read_text())["requests"][0]["file"] == "intro.tex"
+
+def test_failed_requests_and_retries_are_counted(capsys):
+    metrics = MetricsRecorder(emit_events=True)
+    with pytest.raises(RuntimeError):
+        with metrics.measure("gemini-3-pro-preview"):
+            raise RuntimeError("503")
+    metrics.count("retry", "gemini-3-pro-preview")
+
+    total = metrics.summary()["total"]
+    assert total["failures"] == 1
+    assert total["retry"] == 1
+    assert capsys.readouterr().out.startswith("METRICS:{")
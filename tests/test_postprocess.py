@@ -0,0 +1,40 @@
+from arxiv_translator.postprocess import PostProcessor, Rule, default_processor
+
+MAIN = r"""\documentclass{article}
+\usepackage{CJKutf8}
+\usepackage[cache=false]{minted}
+\begin{document}
+\begin{CJK*}{UTF8}{gbsn}
+\section{引言}\label{sec:a}\label{sec:a} \chinese{x} \chinesefont a\ }b
+\end{CJK*}
+\end{document}"""
+
+def test_default_rules_main_file():
+    result, fired = default_processor.apply(MAIN, is_main=True)
+    assert "CJK" not in result
+    assert "\\usepackage[fontset=fandol]{ctex}\n\\usepackage{xspace}\n\\begin{document}" in result
+    assert "\\usepackage[outputdir=.]{minted}" in result
+    assert "\\mychinese{x} \\chinesefont" in result
+    assert "% Duplicate label removed: sec:a" in result
+    assert "a\\}b" in result
+    assert fired["remove-cjk-environment"] == 2
+    assert fired["dedupe-label"] == 1
+
+def test_main_only_rules_skip_other_files():
+    text = "\\begin{CJK*}{UTF8}{gbsn}\\label{a} backend=biber"
+    result, fired = default_processor.apply(text, is_main=False)
+    assert result == "\\begin{CJK*}{UTF8}{gbsn}\\label{a} backend=bibtex"
+    assert fired == {"biber-to-bibtex": 1}
+
+def test_ctex_not_injected_twice():
+    text = "\\documentclass{ctexart}\n\\begin{document}\n\\end{document}"
+    result, fired = default_processor.apply(text, is_main=True)
+    assert result == text
+    assert fired == {}
+
+def test_registered_rules_use_their_own_groups():
+    processor = PostProcessor([Rule("first", r'\\label\{([^}]+)\}', lambda m, state: f"<{m.group(1)}>")])
+    processor.register(Rule("second", r'\\ref\{([^}]+)\}', lambda m, state: f"[{m.group(1)}]"))
+    result, fired = processor.apply("\\label{a} \\ref{b} \\ref{c}")
+    assert result == "<a> [b] [c]"
+    assert fired == {"first": 1, "second": 2}
@@ -0,0 +1,73 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import MagicMock
+from arxiv_translator.ratelimit import AdaptiveRateLimiter, retry_after, retry_delay
+
+class FakeAPIError(Exception):
+    def __init__(self, code, details=None, headers=None):
+        super().__init__(f"{code}")
+        self.code = code
+        self.details = details or {}
+        self.response = MagicMock(headers=headers or {})
+
+def test_retry_after_from_retry_info():
+    exc = FakeAPIError(429, {"error": {"details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "17s"}]}})
+    assert retry_after(exc) == 17.0
+
+def test_retry_after_from_header():
+    assert retry_after(FakeAPIError(503, headers={"retry-after": "3"})) == 3.0
+
+def test_retry_delay_skips_non_retryable():
+    assert retry_delay(FakeAPIError(400), 0) is None
+    assert retry_delay(FakeAPIError(429, headers={"retry-after": "5"}), 0) == 5.0
+    assert 0 <= retry_delay(ConnectionError("reset"), 2) <= 8
+
+def test_aimd_concurrency():
+    limiter = AdaptiveRateLimiter("m", max_concurrency=8)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(FakeAPIError):
+                async with limiter.slot():
+                    raise FakeAPIError(429)
+        assert limiter.concurrency == 2
+        # A full window of successes adds one slot
+        for _ in range(2):
+            async with limiter.slot():
+                pass
+        assert limiter.concurrency == 3
+
+    asyncio.run(scenario())
+
+def test_concurrency_window_is_enforced():
+    limiter = AdaptiveRateLimiter("m", max_concurrency=2)
+    in_flight = 0
+    peak = 0
+
+    async def request():
+        nonlocal in_flight, peak
+        async with limiter.slot():
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    async def scenario():
+        await asyncio.gather(*(request() for _ in range(6)))
+
+    asyncio.run(scenario())
+    assert peak == 2
+
+def test_rpm_window_blocks():
+    limiter = AdaptiveRateLimiter("m", rpm=2)
+    limiter.WINDOW = 0.2
+
+    async def scenario():
+        start = time.monotonic()
+        for _ in range(3):
+            async with limiter.slot():
+                pass
+        return time.monotonic() - start
+
+    assert asyncio.run(scenario()) >= 0.15
@@ -0,0 +1,54 @@
+import pytest
+from arxiv_translator.segmenter import markup_signature, split_segments, pack_segments, segment_latex
+
+SAMPLE = r"""\section{Introduction}
+First paragraph of the introduction.
+
+Second paragraph.
+\begin{equation}
+a = b
+
++ c
+\end{equation}
+Still the second paragraph.
+
+\subsection{Details}
+\caption{A caption {with
+
+nested braces}}
+Last paragraph."""
+
+def test_split_segments_is_lossless():
+    segments = split_segments(SAMPLE)
+    assert '\n'.join(segments) == SAMPLE
+
+def test_split_segments_respects_environments_and_braces():
+    segments = split_segments(SAMPLE)
+    # No segment boundary inside the equation or the brace group
+    for seg in segments:
+        assert seg.count(r"\begin{equation}") == seg.count(r"\end{equation}")
+        assert seg.count("{") == seg.count("}")
+    assert any(seg.startswith(r"\subsection{Details}") for seg in segments)
+    assert segments[0].startswith(r"\section{Introduction}")
+
+def test_split_segments_ignores_verbatim_braces():
+    content = "\\begin{verbatim}\n{ unbalanced\n\\end{verbatim}\n\nNext paragraph."
+    segments = split_segments(content)
+    assert segments[-1] == "Next paragraph."
+
+def test_pack_segments_respects_budget():
+    segments = [("word " * 40).strip() for _ in range(10)]  # ~50 tokens each
+    chunks = pack_segments(segments, max_tokens=120)
+    assert len(chunks) == 5
+    assert '\n'.join(chunks) == '\n'.join(segments)
+
+def test_oversized_segment_is_not_split():
+    big = "\\begin{table}\n" + ("x" * 1000) + "\n\\end{table}"
+    chunks = segment_latex(big, max_tokens=10)
+    assert chunks == [big]
+
+def test_markup_signature_ignores_translated_text():
+    source = "\\section{Results} As shown in \\cref{fig:a}, $x \\$ y$ holds \\cite{b}."
+    translated = "\\section{结果} 如\\cref{fig:a}所示，$x \\$ y$ 成立\\cite{b}。"
+    assert markup_signature(source) == markup_signature(translated)
+    assert markup_signature(source) != markup_signature("\\section{结果} 成立\\cite{b}。")
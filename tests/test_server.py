@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+import pytest
+from arxiv_translator.logging_utils import log_ipc
+from arxiv_translator.server import TranslationServer, parse_job_options
+
+def make_args(**overrides):
+    values = dict(output=None, deepdive=False, download_workers=2, translate_workers=2, compile_workers=1)
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+def request(url, payload=None):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    with urllib.request.urlopen(urllib.request.Request(url, data=data), timeout=10) as response:
+        return response.status, response.read().decode("utf-8")
+
+@pytest.fixture
+def serve(tmp_path, monkeypatch):
+    """Starts a server whose papers 'translate' until the test releases them."""
+    yield from start_server(tmp_path, monkeypatch)
+
+def start_server(tmp_path, monkeypatch, max_jobs=4):
+    monkeypatch.chdir(tmp_path)
+    release = threading.Event()
+    calls = []
+
+    async def fake_process_paper(arxiv_id, args, translator, analyzer, final_pdf, stage_limits=None,
+                                 store=None, memory=None):
+        calls.append((arxiv_id, args, analyzer))
+        log_ipc(f"PROGRESS:DOWNLOADING:Downloading source for {arxiv_id}...")
+        await asyncio.to_thread(release.wait, 10)
+        log_ipc("PROGRESS:TRANSLATING:1:1:Translated main.tex")
+        with open(final_pdf, "wb") as f:
+            f.write(b"%PDF-1.5" + (b" deepdive" if args.deepdive else b""))
+        log_ipc("PROGRESS:COMPLETED:Translation finished successfully.")
+        return True
+
+    with patch("arxiv_translator.server.process_paper", fake_process_paper), \
+         TranslationServer(make_args(), translator=None, analyzer="analyzer", model_name="gemini-3-flash-preview",
+                           port=0, max_jobs=max_jobs) as server:
+        yield server, release, calls
+        release.set()
+
+def test_jobs_report_progress_over_sse_and_polling(serve):
+    server, release, calls = serve
+    status, body = request(f"{server.url}/jobs", {"url": "https://arxiv.org/abs/2602.04705", "deepdive": True})
+    job = json.loads(body)
+    assert status == 202 and job["arxiv_id"] == "2602.04705"
+
+    # The same paper with the same options is not queued twice
+    status, body = request(f"{server.url}/jobs", {"arxiv_id": "2602.04705", "deepdive": True})
+    assert status == 200 and json.loads(body)["id"] == job["id"]
+
+    _, body = request(f"{server.url}/jobs/{job['id']}/poll?since=0&timeout=5")
+    poll = json.loads(body)
+    assert poll["events"] == ["PROGRESS:DOWNLOADING:Downloading source for 2602.04705..."]
+    assert poll["next"] == 1 and poll["state"] == "running"
+
+    release.set()
+    _, stream = request(f"{server.url}/jobs/{job['id']}/events")
+    assert "id: 0\ndata: PROGRESS:DOWNLOADING:" in stream
+    assert "id: 2\ndata: PROGRESS:COMPLETED:Translation finished successfully.\n\n" in stream
+    assert "event: end\n" in stream
+
+    assert json.loads(request(f"{server.url}/jobs/{job['id']}")[1])["state"] == "completed"
+    assert request(f"{server.url}/jobs/{job['id']}/pdf")[1] == "%PDF-1.5 deepdive"
+    # Jobs run with the server's options plus their own, on the shared analyzer
+    assert len(calls) == 1 and calls[0][1].deepdive and calls[0][2] == "analyzer"
+    assert json.loads(request(f"{server.url}/health")[1])["jobs"] == {"completed": 1}
+
+def test_jobs_with_different_options_keep_their_own_pdf(serve):
+    server, release, calls = serve
+    plain = json.loads(request(f"{server.url}/jobs", {"arxiv_id": "2602.04705"})[1])
+    deep = json.loads(request(f"{server.url}/jobs", {"arxiv_id": "2602.04705", "deepdive": True})[1])
+    assert plain["id"] != deep["id"]
+
+    release.set()
+    for job in (plain, deep):
+        request(f"{server.url}/jobs/{job['id']}/events")
+    plain, deep = (json.loads(request(f"{server.url}/jobs/{job['id']}")[1]) for job in (plain, deep))
+
+    assert plain["pdf"] != deep["pdf"]
+    assert request(f"{server.url}/jobs/{plain['id']}/pdf")[1] == "%PDF-1.5"
+    assert request(f"{server.url}/jobs/{deep['id']}/pdf")[1] == "%PDF-1.5 deepdive"
+
+def test_finished_jobs_take_their_pdf_with_them(serve, monkeypatch):
+    server, release, calls = serve
+    monkeypatch.setattr("arxiv_translator.server.MAX_FINISHED_JOBS", 1)
+    release.set()
+    pdfs = []
+    for options in ({}, {"deepdive": True}, {"keep": True}):
+        job = json.loads(request(f"{server.url}/jobs", {"arxiv_id": "2602.04705", **options})[1])
+        request(f"{server.url}/jobs/{job['id']}/events")
+        pdfs.append(json.loads(request(f"{server.url}/jobs/{job['id']}")[1])["pdf"])
+        assert os.path.exists(pdfs[-1])
+
+    # The third submission evicted the first job, and its PDF
+    assert not os.path.exists(pdfs[0])
+    assert os.path.exists(pdfs[1]) and os.path.exists(pdfs[2])
+
+def test_jobs_waiting_for_their_paper_do_not_take_a_slot(tmp_path, monkeypatch):
+    for server, release, calls in start_server(tmp_path, monkeypatch, max_jobs=2):
+        request(f"{server.url}/jobs", {"arxiv_id": "2602.04705"})
+        request(f"{server.url}/jobs", {"arxiv_id": "2602.04705", "deepdive": True})
+        other = json.loads(request(f"{server.url}/jobs", {"arxiv_id": "2602.99999"})[1])
+
+        # The second job of 2602.04705 waits for the first without holding the other slot
+        poll = json.loads(request(f"{server.url}/jobs/{other['id']}/poll?since=0&timeout=5")[1])
+        assert poll["state"] == "running"
+        release.set()
+
+def test_invalid_submissions_are_rejected(serve):
+    server, _, _ = serve
+    for payload in ({}, {"arxiv_id": "2602.04705", "model": "pro"}, {"arxiv_id": "2602.04705", "deepdive_budget": True}):
+        with pytest.raises(urllib.error.HTTPError) as error:
+            request(f"{server.url}/jobs", payload)
+        assert error.value.code == 400
+    with pytest.raises(urllib.error.HTTPError) as error:
+        request(f"{server.url}/jobs/unknown")
+    assert error.value.code == 404
+
+def test_parse_job_options():
+    assert parse_job_options({"arxiv_id": "x", "deepdive": True, "deepdive_budget": 30000}) == {
+        "deepdive": True, "deepdive_budget": 30000}
+    with pytest.raises(ValueError):
+        parse_job_options({"repair_rounds": "2"})
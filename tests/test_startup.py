@@ -0,0 +1,60 @@
+import json
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ("google.genai", "requests")
+# Import time of arxiv_translator.main allowed for light commands (--help,
+# --set-key), as a multiple of importing asyncio (which it needs anyway) in the
+# same interpreter, so the budget scales with the machine; about 1.5 today,
+# while importing google-genai alone would take it past 10
+STARTUP_BUDGET_RATIO = 5
+
+def run_python(args, tmp_path):
+    env = dict(os.environ, ARXIV_TRANSLATOR_LOG_DIR=str(tmp_path / "logs"))
+    return subprocess.run([sys.executable] + args, cwd=tmp_path, env=env, capture_output=True, text=True, check=True)
+
+def top_level_import_times(stderr):
+    """Parses `python -X importtime` output into {top-level module: cumulative microseconds}."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented by two more spaces per level
+        if not name.startswith("  "):
+            times[name.strip()] = int(cumulative)
+    return times
+
+def test_startup_stays_within_budget(tmp_path):
+    ratios = []
+    for _ in range(3):
+        stderr = run_python(["-X", "importtime", "-c", "import asyncio; import arxiv_translator.main"],
+                            tmp_path).stderr
+        times = top_level_import_times(stderr)
+        ratios.append(times["arxiv_translator.main"] / times["asyncio"])
+    # Best of three, so one run disturbed by other load does not fail the test
+    assert min(ratios) < STARTUP_BUDGET_RATIO
+
+def test_light_commands_skip_heavy_imports(tmp_path):
+    # A fresh interpreter: this one has imported everything already
+    code = ("import json, sys, arxiv_translator.main; "
+            f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))")
+    assert json.loads(run_python(["-c", code], tmp_path).stdout) == []
+
+def test_help_creates_no_log_files(tmp_path):
+    result = run_python(["-m", "arxiv_translator.main", "--help"], tmp_path)
+    assert "serve" in result.stdout
+    assert not (tmp_path / "logs").exists()
+
+def test_fetch_source_imports_the_downloader_itself(tmp_path, monkeypatch):
+    # Library callers (e.g. the server) reach fetch_source without going through main()
+    from arxiv_translator import downloader
+    from arxiv_translator.main import fetch_source
+
+    def fake_download(arxiv_id, work_dir, source_dir, store=None):
+        os.makedirs(source_dir)
+
+    monkeypatch.setattr(downloader, "download_and_extract_source", fake_download)
+    source_dir = fetch_source("2602.04705", str(tmp_path), stream_extract=True)
+    assert os.path.isdir(source_dir)
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from arxiv_translator.translator import GeminiTranslator
 
 @patch('arxiv_translator.translator.genai.Client')
@@ -13,8 +13,8 @@ def test_translate_latex(mock_client):
     mock_response = MagicMock()
     mock_response.text = "Translated Content"
     mock_model = MagicMock()
-    mock_model.generate_content.return_value = mock_response
-    mock_client.return_value.models = mock_model
+    mock_model.generate_content = AsyncMock(return_value=mock_response)
+    mock_client.return_value.aio.models = mock_model
     
     translator = GeminiTranslator("fake_key")
     result = translator.translate_latex("Original Content")
@@ -32,10 +32,104 @@ def test_translate_latex_markdown_cleanup(mock_client):
     mock_response = MagicMock()
     mock_response.text = "```latex\nClean Content\n```"
     mock_model = MagicMock()
-    mock_model.generate_content.return_value = mock_response
-    mock_client.return_value.models = mock_model
+    mock_model.generate_content = AsyncMock(return_value=mock_response)
+    mock_client.return_value.aio.models = mock_model
     
     translator = GeminiTranslator("fake_key")
     result = translator.translate_latex("Original")
     
     assert result == "Clean Content"
+
+@patch('arxiv_translator.translator.genai.Client')
+def test_large_latex_chunks_run_concurrently_in_order(mock_client):
+    import asyncio
+    in_flight = 0
+    peak = 0
+
+    async def fake_generate(model, config, contents):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        # Later chunks finish first to check that order is restored
+        await asyncio.sleep(0.05 - 0.01 * int(contents[0].strip()[-1]))
+        in_flight -= 1
+        response = MagicMock()
+        response.text = contents[0].upper()
+        return response
+
+    mock_client.return_value.aio.models.generate_content = fake_generate
+
+    translator = GeminiTranslator("fake_key", chunk_tokens=5, chunk_concurrency=3)
+    content = "\n\n".join(f"paragraph number {i}" for i in range(5))
+    result = asyncio.run(translator._translate_large_latex(content))
+
+    assert result.split("\n\n") == [f"PARAGRAPH NUMBER {i}" for i in range(5)]
+    assert peak == 3
+
+@patch('arxiv_translator.translator.genai.Client')
+def test_translate_latex_stream_resumes_after_break(mock_client):
+    import asyncio
+    requests_sent = []
+
+    async def fake_stream(model, config, contents):
+        requests_sent.append(contents[0])
+        first = len(requests_sent) == 1
+
+        async def gen():
+            if first:
+                # Two complete paragraphs, then the connection drops mid-paragraph
+                for piece in ["甲。\n\n", "乙。\n\n", "丙"]:
+                    yield MagicMock(text=piece)
+                raise ConnectionError("stream reset")
+            for piece in ["丙。\n\n", "丁。"]:
+                yield MagicMock(text=piece)
+        return gen()
+
+    mock_client.return_value.aio.models.generate_content_stream = fake_stream
+
+    class Sink:
+        def __init__(self):
+            self.text = ""
+        def write(self, text):
+            self.text += text
+        def reset(self, text):
+            self.text = text
+
+    sink = Sink()
+    translator = GeminiTranslator("fake_key")
+    with patch('arxiv_translator.translator.retry_delay', return_value=0):
+        result = asyncio.run(translator.translate_latex_stream("A.\n\nB.\n\nC.\n\nD.", sink=sink))
+
+    assert result == "甲。\n\n乙。\n\n丙。\n\n丁。"
+    # The retry only carries the segments that were not complete yet
+    assert requests_sent[1] == "C.\n\nD."
+    assert sink.text == result
+
+@patch('arxiv_translator.translator.genai.Client')
+def test_translate_latex_stream_restarts_when_segments_do_not_line_up(mock_client):
+    import asyncio
+    requests_sent = []
+
+    async def fake_stream(model, config, contents):
+        requests_sent.append(contents[0])
+        first = len(requests_sent) == 1
+
+        async def gen():
+            if first:
+                # The model merged the first two paragraphs into one
+                for piece in ["甲\\label{a}，乙\\label{b}。\n\n", "丙"]:
+                    yield MagicMock(text=piece)
+                raise ConnectionError("stream reset")
+            for piece in ["甲\\label{a}。\n\n", "乙\\label{b}。\n\n", "丙。"]:
+                yield MagicMock(text=piece)
+        return gen()
+
+    mock_client.return_value.aio.models.generate_content_stream = fake_stream
+
+    translator = GeminiTranslator("fake_key")
+    source = "A\\label{a}.\n\nB\\label{b}.\n\nC."
+    with patch('arxiv_translator.translator.retry_delay', return_value=0):
+        result = asyncio.run(translator.translate_latex_stream(source))
+
+    assert requests_sent == [source, source]
+    assert result == "甲\\label{a}。\n\n乙\\label{b}。\n\n丙。"
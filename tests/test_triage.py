@@ -0,0 +1,80 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+from arxiv_translator.incremental import TranslationManifest
+from arxiv_translator.triage import parse_compile_errors, segment_at_line, align_segments, SegmentRepairer
+
+TECTONIC_OUTPUT = """note: Running TeX ...
+error: sections/intro.tex:5: Missing } inserted
+error: sections/intro.tex:5: Missing } inserted
+error: main.tex:12: Undefined control sequence
+error: halted on potentially-recoverable error as specified
+"""
+
+def test_parse_compile_errors():
+    errors = parse_compile_errors(TECTONIC_OUTPUT)
+    assert [(e.file, e.line) for e in errors] == [("sections/intro.tex", 5), ("main.tex", 12)]
+    assert errors[0].message == "Missing } inserted"
+
+def test_segment_at_line():
+    segments = ["\\section{A}\nline2\n", "para\n", "\\section{B}"]
+    assert segment_at_line(segments, 1) == 0
+    assert segment_at_line(segments, 3) == 0
+    assert segment_at_line(segments, 4) == 1
+    assert segment_at_line(segments, 6) == 2
+    assert segment_at_line(segments, 99) is None
+
+def test_align_segments_by_commands():
+    translated = ["\\usepackage{ctex}\n", "\\section{引言}\n", "文本 \\cite{x}\n"]
+    source = ["\\section{Intro}\n", "Text \\cite{x}\n"]
+    assert align_segments(translated, source) == {1: 0, 2: 1}
+
+def test_repairer_retranslates_then_reverts(tmp_path):
+    (tmp_path / "source").mkdir()
+    (tmp_path / "source_zh").mkdir()
+    (tmp_path / "source" / "intro.tex").write_text("\\section{Intro}\n\nGood text.\n\nBroken {text}.")
+    (tmp_path / "source_zh" / "intro.tex").write_text("\\section{引言}\n\n好文本。\n\n坏的 {文本。")
+
+    translator = MagicMock()
+    translator.translate_latex_async = AsyncMock(return_value="还是坏的 {文本。")
+    manifest = TranslationManifest({"intro.tex": {"source": "...", "translation": "..."}})
+    repairer = SegmentRepairer(translator, str(tmp_path / "source_zh"), str(tmp_path / "source"),
+                               str(tmp_path / "source_zh" / "main.tex"), manifest)
+
+    errors = parse_compile_errors("error: intro.tex:5: Missing } inserted")
+    assert asyncio.run(repairer.repair(errors)) == 1
+    translator.translate_latex_async.assert_awaited_once_with("Broken {text}.", refresh=True)
+    assert (tmp_path / "source_zh" / "intro.tex").read_text().endswith("还是坏的 {文本。")
+    assert manifest.get("intro.tex") is None
+
+    assert asyncio.run(repairer.repair(errors)) == 1
+    assert (tmp_path / "source_zh" / "intro.tex").read_text() == "\\section{引言}\n\n好文本。\n\nBroken {text}."
+
+    # Already English: nothing left to try
+    assert asyncio.run(repairer.repair(errors)) == 0
+
+def test_reverting_main_preamble_keeps_ctex(tmp_path):
+    from arxiv_translator.engine import postprocess_translation
+    (tmp_path / "source").mkdir()
+    (tmp_path / "source_zh").mkdir()
+    main_zh = tmp_path / "source_zh" / "main.tex"
+    (tmp_path / "source" / "main.tex").write_text(
+        "\\documentclass{article}\n\\usepackage{CJK}\n\n\\begin{document}\nBroken {text}.\n\\end{document}")
+    main_zh.write_text(postprocess_translation(
+        "\\documentclass{article}\n\\usepackage{CJK}\n\n\\begin{document}\n坏的 {文本。\n\\end{document}",
+        str(main_zh), str(main_zh)))
+    line = main_zh.read_text().split("\n").index("坏的 {文本。") + 1
+
+    translator = MagicMock()
+    translator.translate_latex_async = AsyncMock(return_value="\\begin{document}\n还是坏的 {文本。\n\\end{document}")
+    repairer = SegmentRepairer(translator, str(tmp_path / "source_zh"), str(tmp_path / "source"), str(main_zh))
+
+    errors = parse_compile_errors(f"error: main.tex:{line}: Missing }} inserted")
+    assert asyncio.run(repairer.repair(errors)) == 1
+    assert "还是坏的" in main_zh.read_text() and "{ctex}" in main_zh.read_text()
+
+    line = main_zh.read_text().split("\n").index("还是坏的 {文本。") + 1
+    errors = parse_compile_errors(f"error: main.tex:{line}: Missing }} inserted")
+    assert asyncio.run(repairer.repair(errors)) == 1
+    text = main_zh.read_text()
+    assert "Broken {text}." in text
+    assert "\\usepackage[fontset=fandol]{ctex}" in text and "{CJK}" not in text
@@ -0,0 +1,61 @@
+import os
+from arxiv_translator.workspace import clone_tree, make_private
+
+def test_clone_tree_links_assets_and_copies_tex(tmp_path):
+    src = tmp_path / "source"
+    (src / "figures").mkdir(parents=True)
+    (src / "main.tex").write_text("Hello")
+    (src / "figures" / "plot.png").write_bytes(b"\x89PNG")
+
+    copied, linked = clone_tree(str(src), str(tmp_path / "source_zh"))
+    assert (copied, linked) == (1, 1)
+
+    zh = tmp_path / "source_zh"
+    assert os.path.samefile(zh / "figures" / "plot.png", src / "figures" / "plot.png")
+    assert not os.path.samefile(zh / "main.tex", src / "main.tex")
+
+    (zh / "main.tex").write_text("你好")
+    assert (src / "main.tex").read_text() == "Hello"
+
+def test_clone_tree_replaces_existing_tree(tmp_path):
+    src = tmp_path / "source"
+    src.mkdir()
+    (src / "main.tex").write_text("Hello")
+    zh = tmp_path / "source_zh"
+    zh.mkdir()
+    (zh / "stale.tex").write_text("old")
+
+    clone_tree(str(src), str(zh))
+    assert sorted(os.listdir(zh)) == ["main.tex"]
+
+def test_make_private_detaches_link(tmp_path):
+    original = tmp_path / "main.pdf"
+    original.write_bytes(b"shipped")
+    linked = tmp_path / "linked.pdf"
+    os.link(original, linked)
+
+    make_private(str(linked))
+    linked.write_bytes(b"compiled")
+    assert original.read_bytes() == b"shipped"
+
+def test_writable_suffixes_cover_build_intermediates():
+    from arxiv_translator.compiler import INTERMEDIATE_SUFFIXES
+    from arxiv_translator.workspace import WRITABLE_SUFFIXES
+    assert set(INTERMEDIATE_SUFFIXES) <= set(WRITABLE_SUFFIXES)
+
+def test_detach_build_outputs(tmp_path):
+    from arxiv_translator.workspace import detach_build_outputs
+    src = tmp_path / "source"
+    src.mkdir()
+    (src / "main.tex").write_text("Hello")
+    (src / "main.pdf").write_bytes(b"shipped")
+    (src / "main.foo").write_text("unknown output")
+    (src / "other.png").write_bytes(b"\x89PNG")
+    clone_tree(str(src), str(tmp_path / "source_zh"))
+    zh = tmp_path / "source_zh"
+
+    assert detach_build_outputs(str(zh / "main.tex")) == 1
+    (zh / "main.foo").write_text("rewritten")
+    assert (src / "main.foo").read_text() == "unknown output"
+    assert not os.path.samefile(zh / "main.pdf", src / "main.pdf")
+    assert os.path.samefile(zh / "other.png", src / "other.png")